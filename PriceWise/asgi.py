@@ -3,6 +3,20 @@ ASGI config for PriceWise project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The results, menu and optimize views are async (see feastfairapp/views.py
+and feastfairapp/offload.py), and the CSV export and JSON API stream their
+responses here too (views.streamed). Serve them with uvicorn workers under
+gunicorn, as Procfile.asgi does:
+
+    PRICEWISE_SQLITE_TUNING=1 PRICEWISE_CONN_MAX_AGE=0 gunicorn PriceWise.asgi -k uvicorn.workers.UvicornWorker
+
+or with uvicorn alone (``uvicorn PriceWise.asgi:application --workers 2``).
+Requests under ASGI do not reuse a thread, so persistent connections
+would pile up: PRICEWISE_CONN_MAX_AGE=0 opens one per request. On
+PostgreSQL the connection pool (PRICEWISE_DATABASE_URL) reuses them
+instead. ``manage.py http_load_test`` compares this setup with the WSGI
+one in Procfile.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os 
+import tempfile
+
+from .database import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -77,14 +80,36 @@ WSGI_APPLICATION = 'PriceWise.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Tuned SQLite by default, PostgreSQL when PRICEWISE_DATABASE_URL is set;
+# see PriceWise/database.py for the environment variables
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR / 'db.sqlite3'),
 }
 
 
+# Cache
+# Rendered table fragments; shared by every worker process so writes in one
+# invalidate them for all. Redis when PRICEWISE_CACHE_URL is set (needs
+# ``pip install redis``), else files under PRICEWISE_CACHE_DIR.
+
+PRICEWISE_CACHE_URL = os.environ.get('PRICEWISE_CACHE_URL', '')
+if PRICEWISE_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': PRICEWISE_CACHE_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('PRICEWISE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pricewise-cache')),
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -129,6 +154,47 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Menu optimizer
+# Rows per INSERT when saving optimization results
+PRICEWISE_BULK_BATCH_SIZE = int(os.environ.get('PRICEWISE_BULK_BATCH_SIZE', 1000))
+# How runs store their items: 'rows' (one OptimizedMenuItem each) or 'packed' (one blob, see packed.py)
+PRICEWISE_RESULT_STORAGE = os.environ.get('PRICEWISE_RESULT_STORAGE', 'rows')
+# Fingerprint -> result entries kept in each process's result cache
+PRICEWISE_RESULT_CACHE_SIZE = int(os.environ.get('PRICEWISE_RESULT_CACHE_SIZE', 128))
+# (outlet, method) solutions kept in memory for incremental re-solves
+PRICEWISE_SNAPSHOT_CACHE_SIZE = int(os.environ.get('PRICEWISE_SNAPSHOT_CACHE_SIZE', 64))
+# Constrained-LP solver sessions kept in memory for warm starts (0 = off)
+PRICEWISE_SOLVER_SESSIONS = int(os.environ.get('PRICEWISE_SOLVER_SESSIONS', 16))
+# Rows per page of the menu and result tables
+PRICEWISE_TABLE_PAGE_SIZE = int(os.environ.get('PRICEWISE_TABLE_PAGE_SIZE', 50))
+# Seconds rendered table fragments stay cached (writes invalidate them sooner)
+PRICEWISE_FRAGMENT_CACHE_SECONDS = int(os.environ.get('PRICEWISE_FRAGMENT_CACHE_SECONDS', 600))
+# Threads async views hand CPU-bound menu work to (see feastfairapp/offload.py)
+PRICEWISE_ASYNC_WORKERS = int(os.environ.get('PRICEWISE_ASYNC_WORKERS', 4))
+# Menus above this many items take one of PRICEWISE_ASYNC_LARGE_SLOTS slots, waiting at most
+# PRICEWISE_ASYNC_WAIT_SECONDS for one before the request gets a 503
+PRICEWISE_ASYNC_LARGE_MENU = int(os.environ.get('PRICEWISE_ASYNC_LARGE_MENU', 5000))
+PRICEWISE_ASYNC_LARGE_SLOTS = int(os.environ.get('PRICEWISE_ASYNC_LARGE_SLOTS', 1))
+PRICEWISE_ASYNC_WAIT_SECONDS = float(os.environ.get('PRICEWISE_ASYNC_WAIT_SECONDS', 10))
+# Seconds a job may stay "running" before a worker requeues it
+PRICEWISE_JOB_TIMEOUT = int(os.environ.get('PRICEWISE_JOB_TIMEOUT', 600))
+# Processes that share the item blocks of a Monte Carlo run (1 = in-process)
+PRICEWISE_MONTE_CARLO_WORKERS = int(os.environ.get('PRICEWISE_MONTE_CARLO_WORKERS', 1))
+# Price points per item in the precomputed profit curves
+PRICEWISE_CURVE_POINTS = int(os.environ.get('PRICEWISE_CURVE_POINTS', 64))
+# Rows fetched from the database per round trip when exporting results
+PRICEWISE_EXPORT_CHUNK_SIZE = int(os.environ.get('PRICEWISE_EXPORT_CHUNK_SIZE', 2000))
+# SQLite file holding the /metrics histograms, shared by every process on the host
+PRICEWISE_METRICS_DB = os.environ.get('PRICEWISE_METRICS_DB', os.path.join(tempfile.gettempdir(), 'pricewise-metrics.sqlite3'))
+# Each process writes its metrics to that file once it holds this many observations or this many seconds after the first
+PRICEWISE_METRICS_FLUSH_OBSERVATIONS = int(os.environ.get('PRICEWISE_METRICS_FLUSH_OBSERVATIONS', 1000))
+PRICEWISE_METRICS_FLUSH_SECONDS = float(os.environ.get('PRICEWISE_METRICS_FLUSH_SECONDS', 5))
+# Largest request body and total item count accepted by /api/optimize/
+PRICEWISE_API_MAX_BODY_BYTES = int(os.environ.get('PRICEWISE_API_MAX_BODY_BYTES', 20 * 1024 * 1024))
+PRICEWISE_API_MAX_ITEMS = int(os.environ.get('PRICEWISE_API_MAX_ITEMS', 100000))
+# Where profiled optimization runs save their cProfile stats
+PRICEWISE_PROFILE_DIR = os.environ.get('PRICEWISE_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'pricewise-profiles'))
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
@@ -1,18 +1,95 @@
 # optimizer/admin.py
 
 from django.contrib import admin
-from .models import MenuItem, OptimizationResult, OptimizedMenuItem
+from django.utils.html import format_html, format_html_join
+from . import packed
+from .models import (DailyProfit, ItemDailyStats, ItemRiskProfile, MenuItem, OptimizationResult, OptimizedMenuItem,
+                     OptimizationJob, Outlet, Restaurant, ScenarioResult)
+
+class OutletInline(admin.TabularInline):
+    model = Outlet
+    extra = 0
+
+@admin.register(Restaurant)
+class RestaurantAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+    inlines = [OutletInline]
+
+@admin.register(Outlet)
+class OutletAdmin(admin.ModelAdmin):
+    list_display = ('name', 'restaurant')
+    list_filter = ('restaurant',)
+    list_select_related = ('restaurant',)
+    search_fields = ('name', 'restaurant__name')
 
 class OptimizedMenuItemInline(admin.TabularInline):
     model = OptimizedMenuItem
     extra = 0
+    fields = ('name', 'optimized_price', 'expected_demand', 'item_profit')
     readonly_fields = ('name', 'optimized_price', 'expected_demand', 'item_profit')
 
+class ScenarioResultInline(admin.TabularInline):
+    model = ScenarioResult
+    extra = 0
+    readonly_fields = ('cost_multiplier', 'demand_multiplier', 'elasticity_multiplier',
+                       'total_profit', 'total_demand', 'average_price')
+
 @admin.register(OptimizationResult)
 class OptimizationResultAdmin(admin.ModelAdmin):
-    list_display = ('id', 'date_created', 'total_profit')
-    inlines = [OptimizedMenuItemInline]
+    list_display = ('id', 'outlet', 'date_created', 'total_profit')
+    list_filter = ('outlet__restaurant',)
+    list_select_related = ('outlet__restaurant',)
+    readonly_fields = ('timings', 'item_storage', 'packed_items_table')
+    inlines = [OptimizedMenuItemInline, ScenarioResultInline]
+
+    # Packed runs have no item rows for the inline
+    PACKED_PREVIEW_ITEMS = 200
+
+    @admin.display(description='Packed items')
+    def packed_items_table(self, obj):
+        if obj.pk is None or obj.item_storage != OptimizationResult.PACKED:
+            return '-'
+        items = packed.load(obj.pk).items(obj.pk)
+        shown = items[:self.PACKED_PREVIEW_ITEMS]
+        return format_html(
+            '<p>{} of {} item(s)</p><table><tr><th>Name</th><th>Optimized price</th><th>Expected demand</th>'
+            '<th>Item profit</th></tr>{}</table>',
+            len(shown), len(items),
+            format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>', (
+                (item.name, item.optimized_price, item.expected_demand, item.item_profit) for item in shown)),
+        )
 
 @admin.register(MenuItem)
 class MenuItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity')
\ No newline at end of file
+    list_display = ('name', 'outlet', 'category', 'cost', 'min_price', 'max_price', 'estimated_demand',
+                    'price_elasticity', 'demand_model')
+    list_filter = ('outlet__restaurant', 'demand_model')
+    list_select_related = ('outlet__restaurant',)
+    autocomplete_fields = ('outlet',)
+
+@admin.register(ItemRiskProfile)
+class ItemRiskProfileAdmin(admin.ModelAdmin):
+    list_display = ('optimized_item', 'expected_profit', 'profit_std', 'profit_p10', 'profit_p90', 'loss_probability')
+    list_select_related = ('optimized_item',)
+
+@admin.register(OptimizationJob)
+class OptimizationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'outlet', 'status', 'method', 'created_at', 'started_at', 'finished_at', 'result')
+    list_filter = ('status',)
+    list_select_related = ('outlet__restaurant',)
+
+@admin.register(DailyProfit)
+class DailyProfitAdmin(admin.ModelAdmin):
+    list_display = ('day', 'outlet', 'runs', 'total_profit', 'best_profit')
+    list_filter = ('outlet__restaurant',)
+    list_select_related = ('outlet__restaurant',)
+    date_hierarchy = 'day'
+
+@admin.register(ItemDailyStats)
+class ItemDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'name', 'outlet', 'runs', 'price_sum', 'demand_sum', 'profit_sum')
+    list_filter = ('outlet__restaurant',)
+    list_select_related = ('outlet__restaurant',)
+    search_fields = ('name',)
+    date_hierarchy = 'day'
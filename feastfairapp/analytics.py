@@ -0,0 +1,244 @@
+# optimizer/analytics.py
+
+"""
+Historical analytics over optimization runs.
+
+Two rollup tables summarise the ever-growing OptimizationResult and
+OptimizedMenuItem rows, so dashboards read one row per day instead of
+scanning every run:
+
+* DailyProfit     -- per outlet and day: runs, summed and best total profit;
+* ItemDailyStats  -- per outlet, item name and day: runs and the sums of
+  optimized price, expected demand and profit, so averages are
+  ``sum / runs``.
+
+``record_run`` adds a new run to both tables from the arrays that were just
+saved, in the same transaction, with one upsert statement per table that
+increments the existing counters. ``rebuild`` recomputes rollups from the
+saved rows; it backfills history (``manage.py rebuild_analytics``) and
+repairs the days whose runs were deleted. Days are dates in TIME_ZONE.
+
+Per-run history of single items reads OptimizedMenuItem through its
+(name, optimization) index. Runs with packed items (see packed.py) have no
+item rows; ``rebuild`` and ``item_runs`` unpack them instead, which is
+slower than the SQL they use for row-stored runs.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import packed
+from .exports import PACKED_CHUNK_SIZE, day_start
+from .models import DailyProfit, ItemDailyStats, OptimizationResult, OptimizedMenuItem, Outlet
+
+CENT = Decimal('0.01')
+
+# Most per-run points returned for an item
+MAX_RUN_POINTS = 1000
+
+# Most items one history request may ask for
+MAX_ITEM_NAMES = 20
+
+
+def money(value):
+    return str(Decimal(value).quantize(CENT))
+
+
+def upsert_sql(model, key, increments, greatest=()):
+    """INSERT ... ON CONFLICT statement that adds ``increments`` to an existing
+    row and keeps the larger value of the ``greatest`` columns."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    quote = connection.ops.quote_name
+    columns = [*key, *increments, *greatest]
+    updates = [f"{quote(name)} = {table}.{quote(name)} + excluded.{quote(name)}" for name in increments]
+    updates += [
+        f"{quote(name)} = CASE WHEN excluded.{quote(name)} > {table}.{quote(name)} "
+        f"THEN excluded.{quote(name)} ELSE {table}.{quote(name)} END"
+        for name in greatest
+    ]
+    return (
+        f"INSERT INTO {table} ({', '.join(map(quote, columns))}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(map(quote, key))}) DO UPDATE SET {', '.join(updates)}"
+    )
+
+
+def record_run(optimization, menu, solution):
+    """Add a just-saved run to the rollups.
+
+    Values are rounded the way ResultWriter stores them, so the rollups
+    match a ``rebuild`` from the saved rows. Called inside the writer's
+    transaction.
+    """
+    day = timezone.localdate(optimization.date_created).isoformat()
+    total = money(optimization.total_profit)
+    item_rows = [
+        (optimization.outlet_id, name, day, 1, money(round(price, 2)), money(round(demand, 2)), money(round(profit, 2)))
+        for name, price, demand, profit in zip(
+            menu.names, solution.prices.tolist(), solution.demand.tolist(), solution.profit.tolist())
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            upsert_sql(DailyProfit, ['outlet_id', 'day'], ['runs', 'total_profit'], greatest=['best_profit']),
+            [optimization.outlet_id, day, 1, total, total],
+        )
+        cursor.executemany(
+            upsert_sql(ItemDailyStats, ['outlet_id', 'name', 'day'], ['runs', 'price_sum', 'demand_sum', 'profit_sum']),
+            item_rows,
+        )
+
+
+def rebuild(outlet_id=None, day=None):
+    """Recompute the rollups of one outlet and/or day (everything by default) from the saved runs.
+
+    Returns the number of (daily, item) rollup rows written.
+    """
+    runs = OptimizationResult.objects.annotate(day=TruncDate('date_created'))
+    items = OptimizedMenuItem.objects.annotate(day=TruncDate('optimization__date_created'))
+    daily_rollups = DailyProfit.objects.all()
+    item_rollups = ItemDailyStats.objects.all()
+    if outlet_id is not None:
+        runs = runs.filter(outlet_id=outlet_id)
+        items = items.filter(optimization__outlet_id=outlet_id)
+        daily_rollups = daily_rollups.filter(outlet_id=outlet_id)
+        item_rollups = item_rollups.filter(outlet_id=outlet_id)
+    if day is not None:
+        # A datetime range, so the (outlet, date_created) index is used
+        period = (day_start(day), day_start(day + timedelta(days=1)))
+        runs = runs.filter(date_created__gte=period[0], date_created__lt=period[1])
+        items = items.filter(optimization__date_created__gte=period[0], optimization__date_created__lt=period[1])
+        daily_rollups = daily_rollups.filter(day=day)
+        item_rollups = item_rollups.filter(day=day)
+
+    per_item = {
+        (row['optimization__outlet_id'], row['name'], row['day']): [
+            row['runs'], row['price'], row['demand'], row['profit']]
+        for row in items.values('optimization__outlet_id', 'name', 'day').annotate(
+            runs=Count('pk'), price=Sum('optimized_price'), demand=Sum('expected_demand'),
+            profit=Sum('item_profit')).order_by()
+    }
+    add_packed_items(per_item, runs.filter(item_storage=OptimizationResult.PACKED))
+
+    with transaction.atomic():
+        daily_rollups.delete()
+        item_rollups.delete()
+        daily = DailyProfit.objects.bulk_create([
+            DailyProfit(outlet_id=row['outlet_id'], day=row['day'], runs=row['runs'],
+                        total_profit=row['total'], best_profit=row['best'])
+            for row in runs.values('outlet_id', 'day').annotate(
+                runs=Count('pk'), total=Sum('total_profit'), best=Max('total_profit')).order_by()
+        ], batch_size=1000)
+        item_stats = ItemDailyStats.objects.bulk_create([
+            ItemDailyStats(outlet_id=outlet_id, name=name, day=day, runs=item_runs, price_sum=price,
+                           demand_sum=item_demand, profit_sum=profit)
+            for (outlet_id, name, day), (item_runs, price, item_demand, profit) in per_item.items()
+        ], batch_size=1000)
+    return len(daily), len(item_stats)
+
+
+def add_packed_items(per_item, packed_runs):
+    """Add the items of ``packed_runs`` to the {(outlet, name, day): [runs, price, demand, profit]} sums."""
+    for outlet_id, date_created, blob in packed_runs.values_list(
+            'outlet_id', 'date_created', 'packed_items__data').iterator(chunk_size=PACKED_CHUNK_SIZE):
+        day = timezone.localdate(date_created)
+        for _, _, name, price, item_demand, profit in packed.PackedItems.unpack(blob).rows():
+            sums = per_item.setdefault((outlet_id, name, day), [0, Decimal(0), Decimal(0), Decimal(0)])
+            sums[0] += 1
+            sums[1] += price
+            sums[2] += item_demand
+            sums[3] += profit
+
+
+def rebuild_day_if_outlet_exists(outlet_id, day):
+    # Deleting an outlet deletes its rollups too
+    if Outlet.objects.filter(pk=outlet_id).exists():
+        rebuild(outlet_id, day)
+
+
+def date_filter(queryset, start=None, end=None):
+    if start is not None:
+        queryset = queryset.filter(day__gte=start)
+    if end is not None:
+        queryset = queryset.filter(day__lte=end)
+    return queryset
+
+
+def average(total, runs):
+    return round(float(total) / runs, 2) if runs else None
+
+
+def profit_trend(outlet, start=None, end=None):
+    """One dict per day with runs and the average, best and summed total profit."""
+    rows = date_filter(DailyProfit.objects.filter(outlet=outlet), start, end).order_by('day')
+    return [
+        {
+            'day': day.isoformat(),
+            'runs': runs,
+            'total_profit': float(total),
+            'average_profit': average(total, runs),
+            'best_profit': float(best),
+        }
+        for day, runs, total, best in rows.values_list('day', 'runs', 'total_profit', 'best_profit')
+    ]
+
+
+def item_names(outlet):
+    """Names of every item that appears in the outlet's rollups."""
+    return list(ItemDailyStats.objects.filter(outlet=outlet).order_by('name')
+                .values_list('name', flat=True).distinct())
+
+
+def item_history(outlet, names, start=None, end=None):
+    """{name: one dict per day with runs and the average price, demand and profit}."""
+    history = {name: [] for name in names}
+    rows = date_filter(ItemDailyStats.objects.filter(outlet=outlet, name__in=names), start, end)
+    for name, day, runs, price, item_demand, profit in rows.order_by('name', 'day').values_list(
+            'name', 'day', 'runs', 'price_sum', 'demand_sum', 'profit_sum'):
+        history[name].append({
+            'day': day.isoformat(),
+            'runs': runs,
+            'average_price': average(price, runs),
+            'average_demand': average(item_demand, runs),
+            'average_profit': average(profit, runs),
+        })
+    return history
+
+
+def item_runs(outlet, names, limit=MAX_RUN_POINTS):
+    """{name: one dict per run with its optimized price, demand and profit}, latest ``limit`` runs per item."""
+    packed_runs = packed_item_runs(outlet, names, limit)
+    history = {}
+    for name in names:
+        rows = (OptimizedMenuItem.objects.filter(name=name, optimization__outlet=outlet)
+                .order_by('-optimization_id')
+                .values_list('optimization_id', 'optimization__date_created', 'optimized_price',
+                             'expected_demand', 'item_profit')[:limit])
+        rows = sorted([*rows, *packed_runs[name]], reverse=True)[:limit]
+        history[name] = [
+            {
+                'optimization_id': optimization_id,
+                'date_created': date_created.isoformat(),
+                'optimized_price': float(price),
+                'expected_demand': float(item_demand),
+                'item_profit': float(profit),
+            }
+            for optimization_id, date_created, price, item_demand, profit in rows[::-1]
+        ]
+    return history
+
+
+def packed_item_runs(outlet, names, limit):
+    """{name: [(optimization id, date, price, demand, profit)]} from the outlet's latest ``limit`` packed runs."""
+    found = {name: [] for name in names}
+    runs = (OptimizationResult.objects.filter(outlet=outlet, item_storage=OptimizationResult.PACKED)
+            .order_by('-pk').values_list('pk', 'date_created', 'packed_items__data')[:limit])
+    for pk, date_created, blob in runs.iterator(chunk_size=PACKED_CHUNK_SIZE):
+        for _, _, name, price, item_demand, profit in packed.PackedItems.unpack(blob).rows():
+            if name in found:
+                found[name].append((pk, date_created, price, item_demand, profit))
+    return found
@@ -0,0 +1,253 @@
+# optimizer/api.py
+
+"""
+JSON API for optimizing whole menus in one request.
+
+``POST /api/optimize/`` takes one menu or a batch of menus (e.g. one per
+outlet) and streams back one NDJSON line per menu as soon as it is solved,
+so clients can consume results before the batch is done::
+
+    {"method": "closed_form", "options": {}, "persist": false,
+     "menus": [{"outlet": 3, "items": [{"name": "Tea", "cost": "10", ...}]}]}
+
+A single menu can be sent as ``{"items": [...]}`` instead of ``"menus"``.
+``method``, ``options``, ``outlet`` and ``persist`` given at the top level
+apply to every menu unless the menu sets its own. ``outlet`` is an Outlet
+id.
+
+Menu settings are checked with ApiMenuForm and the method's settings form,
+items with MenuItemRowForm -- the same rules as MenuItemForm. Menus are
+solved straight from the validated values; MenuItem rows are only written
+when ``persist`` is true. The items are then upserted by name into the
+outlet's menu, and the outlet's whole menu -- the items sent and the ones
+already there -- is optimized and saved like any other run, so the
+outlet's latest result and incremental snapshot keep covering every item.
+The line then lists every item of the saved result.
+
+``/api/optimize/`` needs no login, so it is CSRF-exempt, and it never
+saves. Saving goes through ``POST /api/optimize/save/``, which takes the
+same body with ``persist`` defaulting to true. That endpoint is CSRF
+protected like any other form (send the session's token as
+``X-CSRFToken``) and needs a signed-in user allowed to add and change
+menu items (PERSIST_PERMISSIONS).
+
+A menu that fails -- invalid, unsolvable or hitting an unexpected error --
+gets an ``"status": "error"`` line; the rest of the batch still runs.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from . import cache, demand, engine, importers, metrics, packed, pipeline, tables
+from .engine import MenuArrays
+from .forms import ApiMenuForm, method_options_form
+from .models import MenuItem
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BODY_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_ITEMS = 100000
+
+# Permissions needed to save menus through the API
+PERSIST_PERMISSIONS = ('feastfairapp.add_menuitem', 'feastfairapp.change_menuitem')
+
+# Keys that can be set for the whole batch or per menu
+MENU_SETTINGS = ('method', 'options', 'outlet', 'persist')
+
+# Saved items are overwritten with exactly what was sent, so optional
+# fields left out of a row are reset
+ITEM_DEFAULTS = {
+    'demand_model': demand.DEFAULT_MODEL,
+    'category': '',
+    'size_rank': None,
+    'current_price': None,
+}
+
+
+class ApiError(Exception):
+    """Raised when a request can't be processed at all."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class MenuRequest:
+    """One validated menu of a batch."""
+    index: int
+    outlet: object  # Outlet, or None for a menu that is not saved
+    method: str
+    options: dict
+    persist: bool
+    rows: list  # Validated item values, one per distinct name
+
+
+def read_body(request):
+    """Parse the JSON request body, refusing bodies over PRICEWISE_API_MAX_BODY_BYTES."""
+    limit = getattr(settings, 'PRICEWISE_API_MAX_BODY_BYTES', DEFAULT_MAX_BODY_BYTES)
+    body = request.read(limit + 1)
+    if len(body) > limit:
+        raise ApiError(f"Request body is larger than {limit} bytes.", status=413)
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise ApiError("Request body is not valid JSON.")
+
+
+def parse_batch(payload):
+    """Split a request payload into per-menu dicts with the batch settings applied.
+
+    Only the overall shape is checked here; each menu is validated when it
+    is solved so the first results can be streamed right away.
+    """
+    if not isinstance(payload, dict):
+        raise ApiError("Expected a JSON object.")
+    if 'menus' in payload:
+        menus = payload['menus']
+        if not isinstance(menus, list) or not menus:
+            raise ApiError('"menus" must be a non-empty list.')
+    elif 'items' in payload:
+        menus = [{'items': payload['items']}]
+    else:
+        raise ApiError('Send one menu as "items" or several as "menus".')
+
+    total = 0
+    for menu in menus:
+        if not isinstance(menu, dict) or not isinstance(menu.get('items'), list):
+            raise ApiError('Every menu needs an "items" list.')
+        total += len(menu['items'])
+    limit = getattr(settings, 'PRICEWISE_API_MAX_ITEMS', DEFAULT_MAX_ITEMS)
+    if total > limit:
+        raise ApiError(f"A request may hold at most {limit} items; this one has {total}.", status=413)
+
+    defaults = {name: payload[name] for name in MENU_SETTINGS if name in payload}
+    return [{**defaults, **menu} for menu in menus]
+
+
+def validate_menu(index, data, persist_allowed=False):
+    """Return (MenuRequest, None) for a valid menu or (None, errors).
+
+    Errors are dicts with a message and the position of the offending item
+    (None for problems with the menu settings).
+    """
+    form = ApiMenuForm(data)
+    if not form.is_valid():
+        return None, [{'item': None, 'message': importers.format_errors(form)}]
+    if form.cleaned_data['persist'] and not persist_allowed:
+        return None, [{'item': None, 'message': "Menus are only saved through /api/optimize/save/."}]
+    method = form.cleaned_data['method']
+
+    options = data.get('options') or {}
+    if not isinstance(options, dict):
+        return None, [{'item': None, 'message': '"options" must be an object.'}]
+    options_form = method_options_form(method, options)
+    if options_form is None:
+        options = {}
+    elif options_form.is_valid():
+        options = options_form.options()
+    else:
+        return None, [{'item': None, 'message': f"options: {importers.format_errors(options_form)}"}]
+
+    report = importers.ImportReport()
+    rows = {}
+    for values in importers.validate_rows(enumerate(data['items']), report):
+        # A name repeated within the menu keeps its last row, as in file imports
+        rows[values['name']] = {**ITEM_DEFAULTS, **values}
+    if report.error_count:
+        return None, [{'item': position, 'message': message} for position, message in report.errors]
+    if not rows:
+        return None, [{'item': None, 'message': "Please add at least one menu item before optimizing."}]
+
+    return MenuRequest(
+        index=index,
+        outlet=form.cleaned_data['outlet'],
+        method=method,
+        options=options,
+        persist=form.cleaned_data['persist'],
+        rows=list(rows.values()),
+    ), None
+
+
+def save_items(outlet, rows):
+    """Upsert the rows by name into the outlet's menu."""
+    batch_size = getattr(settings, 'PRICEWISE_BULK_BATCH_SIZE', importers.DEFAULT_BATCH_SIZE)
+    report = importers.ImportReport()
+    for start in range(0, len(rows), batch_size):
+        importers.upsert_batch({row['name']: row for row in rows[start:start + batch_size]}, report, outlet)
+    # Bulk writes skip the MenuItem signals
+    cache.invalidate()
+    tables.bump_menu(outlet.pk)
+
+
+def solution_items(menu, solution):
+    return [
+        {'name': name, 'optimized_price': round(price, 2), 'expected_demand': round(item_demand, 2),
+         'item_profit': round(profit, 2)}
+        for name, price, item_demand, profit in zip(
+            menu.names, solution.prices.tolist(), solution.demand.tolist(), solution.profit.tolist())
+    ]
+
+
+def saved_items(optimization):
+    return [
+        {'name': name, 'optimized_price': float(price), 'expected_demand': float(item_demand),
+         'item_profit': float(profit)}
+        for name, price, item_demand, profit in packed.item_values(optimization)
+    ]
+
+
+def error_record(index, outlet, errors):
+    return {'menu': index, 'outlet': outlet, 'status': 'error', 'errors': errors}
+
+
+def solve_menu(index, data, persist_allowed=False):
+    """Validate and optimize one menu; returns its NDJSON record."""
+    recorder = metrics.StageRecorder('api')
+    with recorder.stage('validate', items=len(data['items'])):
+        menu_request, errors = validate_menu(index, data, persist_allowed)
+    if menu_request is None:
+        recorder.flush()
+        return error_record(index, data.get('outlet'), errors)
+
+    outlet = menu_request.outlet
+    record = {'menu': index, 'outlet': outlet.pk if outlet else None, 'status': 'ok'}
+    try:
+        if menu_request.persist:
+            with recorder.stage('save', items=len(menu_request.rows)):
+                save_items(outlet, menu_request.rows)
+            with recorder.stage('load') as stage:
+                menu = MenuArrays.from_queryset(MenuItem.objects.filter(outlet=outlet))
+                stage['items'] = len(menu)
+            optimization = pipeline.optimize_arrays(outlet, menu, menu_request.method,
+                                                    options=menu_request.options, recorder=recorder)
+            record.update(method=optimization.method, total_profit=float(optimization.total_profit),
+                          result_id=optimization.pk, items=saved_items(optimization))
+        else:
+            menu = MenuArrays.from_rows(menu_request.rows)
+            with recorder.stage('solve', items=len(menu)):
+                solution = engine.optimize(menu, menu_request.method,
+                                           pipeline.method_config(menu_request.method, menu_request.options))
+            recorder.flush()
+            record.update(method=solution.label, total_profit=round(solution.total_profit, 2),
+                          result_id=None, items=solution_items(menu, solution))
+    except engine.OptimizationError as exc:
+        logger.warning("API menu %d failed: %s", index, exc)
+        return error_record(index, record['outlet'], [{'item': None, 'message': str(exc)}])
+    return record
+
+
+def stream_results(menus, persist_allowed=False):
+    """Yield one NDJSON line per menu, in request order."""
+    for index, data in enumerate(menus):
+        try:
+            record = solve_menu(index, data, persist_allowed)
+        except Exception:
+            # The response has started, so report the menu instead of failing the batch
+            logger.exception("API menu %d failed", index)
+            record = error_record(index, data.get('outlet'), [
+                {'item': None, 'message': "The menu could not be optimized because of an internal error."}])
+        yield json.dumps(record) + '\n'
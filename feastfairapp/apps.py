@@ -1,2 +1,9 @@
 from django.apps import AppConfig
 
+
+class FeastfairappConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'feastfairapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
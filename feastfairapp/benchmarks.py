@@ -0,0 +1,292 @@
+# optimizer/benchmarks.py
+
+"""
+Stage-by-stage benchmarks of the optimization pipeline.
+
+A synthetic menu of the requested size is inserted, then each stage of an
+optimization run is timed on its own:
+
+* load    -- MenuArrays.from_queryset
+* build   -- the sparse LP (constrained methods only; the other methods
+  have no separate coefficient-building step)
+* solve   -- the solver itself
+* results -- prices, demand and profit from the normalized solution
+* persist -- ResultWriter.write (OptimizationResult + OptimizedMenuItem rows)
+
+Every size runs in its own benchmark outlet inside a transaction that is
+rolled back, so benchmarks leave the database as they found it and the
+rest of the database only affects them through the outlet indexes. Reports are plain JSON and can be
+compared against a stored baseline with ``find_regressions``.
+
+``warm_start_benchmark`` compares cold constrained solves with warm ones
+in a solver session (see solvers.py) after a few items' costs change.
+``storage_benchmark`` compares the write time and database bytes of row
+and packed result storage (see packed.py).
+"""
+
+import platform
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+
+import numpy as np
+from django.db import connection, transaction
+
+from . import demand, engine, solvers
+from .constrained import BACKENDS, PricingConstraints, build_problem
+from .engine import MenuArrays
+from .models import MenuItem, OptimizationResult, OptimizedMenuItem, Outlet, PackedResultItems, Restaurant
+from .persistence import ResultWriter
+
+STAGES = ['insert', 'load', 'build', 'solve', 'results', 'persist']
+
+# Methods whose stages can be timed separately
+METHODS = [engine.CLOSED_FORM, engine.LINPROG, engine.CONSTRAINED_HIGHS, engine.CONSTRAINED_CBC]
+
+# Stages faster than this in both runs are too noisy to flag as regressions
+MIN_COMPARABLE_SECONDS = 0.005
+
+
+class StageTimer:
+    """Collects wall-clock seconds per stage name."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds.setdefault(name, []).append(time.perf_counter() - started)
+
+
+def synthetic_items(outlet, size, seed=0):
+    """Unsaved MenuItems of ``outlet`` with valid, varied prices and demand."""
+    rng = np.random.default_rng(seed)
+    cost = np.round(rng.uniform(20, 300, size), 2)
+    min_price = np.round(cost * rng.uniform(1.05, 1.5, size), 2)
+    max_price = np.round(min_price * rng.uniform(1.2, 3.0, size), 2)
+    demand_at_min = rng.integers(10, 1000, size)
+    elasticity = np.round(rng.uniform(0.1, 2.5, size), 2)
+    models = rng.choice(list(demand.MODELS), size)
+    categories = rng.integers(0, max(1, size // 3), size)
+    size_rank = rng.integers(1, 4, size)
+    return [
+        MenuItem(
+            outlet=outlet,
+            name=f"Item {i}",
+            cost=f"{cost[i]:.2f}",
+            min_price=f"{min_price[i]:.2f}",
+            max_price=f"{max_price[i]:.2f}",
+            estimated_demand=int(demand_at_min[i]),
+            price_elasticity=f"{elasticity[i]:.2f}",
+            demand_model=str(models[i]),
+            category=f"Category {categories[i]}",
+            size_rank=int(size_rank[i]),
+            current_price=f"{(min_price[i] + max_price[i]) / 2:.2f}",
+        )
+        for i in range(size)
+    ]
+
+
+def time_stages(outlet, method, timer, writer):
+    """Run one optimization of the outlet's menu, timing each stage."""
+    with timer.stage('load'):
+        menu = MenuArrays.from_queryset(MenuItem.objects.filter(outlet=outlet))
+
+    if method in engine.CONSTRAINED_METHODS:
+        with timer.stage('build'):
+            c, A_ub, b_ub, bounds, k = build_problem(menu, PricingConstraints())
+        with timer.stage('solve'):
+            x = BACKENDS[engine.CONSTRAINED_METHODS[method]](c, A_ub, b_ub, bounds)
+            normalized = np.clip(x[:len(menu) * k].reshape(len(menu), k).sum(axis=1), 0, 1)
+    else:
+        with timer.stage('solve'):
+            normalized = engine.SOLVERS[method](menu)
+
+    with timer.stage('results'):
+        prices, item_demand, profit = engine.evaluate(menu, normalized)
+        solution = engine.Solution(prices=prices, demand=item_demand, profit=profit, method=method)
+
+    with timer.stage('persist'):
+        writer.write(outlet, menu, solution)
+
+
+def benchmark_size(size, method=engine.DEFAULT_METHOD, repeat=3, seed=0, batch_size=None):
+    """Time every stage ``repeat`` times on a synthetic menu of ``size`` items."""
+    if method not in METHODS:
+        raise ValueError(f"Stages can't be timed separately for method '{method}'.")
+    timer = StageTimer()
+    writer = ResultWriter(batch_size=batch_size)
+    with transaction.atomic():
+        restaurant = Restaurant.objects.create(name=f"Benchmark {size} x {method}")
+        outlet = Outlet.objects.create(restaurant=restaurant, name='Benchmark')
+        items = synthetic_items(outlet, size, seed)
+        with timer.stage('insert'):
+            MenuItem.objects.bulk_create(items, batch_size=writer.batch_size)
+        for _ in range(repeat):
+            time_stages(outlet, method, timer, writer)
+        transaction.set_rollback(True)
+
+    return {
+        'size': size,
+        'method': method,
+        'repeat': repeat,
+        'stages': {
+            name: {
+                'median': statistics.median(values),
+                'min': min(values),
+                'max': max(values),
+            }
+            for name, values in timer.seconds.items()
+        },
+        'total': sum(statistics.median(values) for name, values in timer.seconds.items() if name != 'insert'),
+    }
+
+
+def run_benchmarks(sizes, methods=(engine.DEFAULT_METHOD,), repeat=3, seed=0, batch_size=None):
+    """Benchmark every size x method pair; returns a JSON-serialisable report."""
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'database': connection.vendor,
+            'machine': platform.machine(),
+        },
+        'results': [
+            benchmark_size(size, method, repeat=repeat, seed=seed, batch_size=batch_size)
+            for method in methods
+            for size in sizes
+        ],
+    }
+
+
+def find_regressions(baseline, current, threshold=0.2):
+    """Stages whose best time grew by more than ``threshold`` (0.2 = 20%).
+
+    The fastest of the repeats is compared because it is the least affected
+    by other load on the machine. Returns dicts with size, method, stage, baseline, current and ratio.
+    Runs and stages that only appear in one report are skipped.
+    """
+    previous = {(run['size'], run['method']): run['stages'] for run in baseline['results']}
+    regressions = []
+    for run in current['results']:
+        stages = previous.get((run['size'], run['method']))
+        if stages is None:
+            continue
+        for name, timing in run['stages'].items():
+            if name not in stages:
+                continue
+            before, after = stages[name]['min'], timing['min']
+            if max(before, after) < MIN_COMPARABLE_SECONDS:
+                continue
+            ratio = after / before if before > 0 else float('inf')
+            if ratio > 1 + threshold:
+                regressions.append({
+                    'size': run['size'],
+                    'method': run['method'],
+                    'stage': name,
+                    'baseline': before,
+                    'current': after,
+                    'ratio': ratio,
+                })
+    return regressions
+
+
+def warm_start_benchmark(size, backend='highs', changed_share=0.01, repeat=5, seed=0):
+    """Median cold and warm solve seconds of a constrained menu after cost changes.
+
+    Each repeat re-costs ``changed_share`` of the items by up to 5%; the
+    cold solve builds a new solver model, the warm one updates the
+    session's model from the previous repeat. Nothing touches the database.
+    """
+    rng = np.random.default_rng(seed)
+    items = synthetic_items(None, size, seed)
+    menu = MenuArrays.from_rows([{field: getattr(item, field) for field in (
+        'name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity',
+        'demand_model', 'category', 'size_rank', 'current_price')} for item in items])
+    # Binding but feasible: every price at 60% of its range meets both limits
+    _, demand_at, _ = engine.evaluate(menu, np.full(size, 0.6))
+    constraints = PricingConstraints(capacity=float(demand_at.sum()),
+                                     max_average_change=float(menu.price_range.mean() / 4))
+    session = solvers.SESSIONS[backend]()
+    session.solve(*build_problem(menu, constraints)[:4])
+
+    cold, warm, agree = [], [], True
+    for _ in range(repeat):
+        chosen = rng.choice(size, max(1, int(size * changed_share)), replace=False)
+        cost = menu.cost.copy()
+        cost[chosen] = np.minimum(cost[chosen] * rng.uniform(0.95, 1.05, len(chosen)), menu.min_price[chosen])
+        menu = replace(menu, cost=cost)
+        problem = build_problem(menu, constraints)[:4]
+
+        started = time.perf_counter()
+        cold_x = BACKENDS[backend](*problem)
+        cold.append(time.perf_counter() - started)
+        warm_x = session.solve(*problem)
+        warm.append(session.last_stats.seconds)
+        agree = agree and bool(np.isclose(problem[0] @ cold_x, problem[0] @ warm_x, rtol=1e-6))
+
+    return {
+        'size': size,
+        'backend': backend,
+        'changed_share': changed_share,
+        'repeat': repeat,
+        'cold': statistics.median(cold),
+        'warm': statistics.median(warm),
+        'speedup': statistics.median(cold) / statistics.median(warm),
+        'same_objective': agree,
+    }
+
+
+def table_bytes(models):
+    """Bytes the tables of ``models`` and their indexes take, or None on other databases than SQLite and PostgreSQL."""
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * len(tables))
+            # dbstat needs SQLite built with SQLITE_ENABLE_DBSTAT_VTAB, as Python's usually is
+            cursor.execute(
+                f"SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+                f"(SELECT name FROM sqlite_master WHERE tbl_name IN ({placeholders}))", tables)
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT SUM(pg_total_relation_size(name::regclass)) FROM unnest(%s) AS name", [tables])
+        else:
+            return None
+        return int(cursor.fetchone()[0] or 0)
+
+
+def storage_benchmark(size, runs=20, seed=0):
+    """Median write seconds and database bytes per run of row and packed result storage.
+
+    The same closed-form solution of a synthetic menu is written ``runs``
+    times with each storage, inside a transaction that is rolled back.
+    """
+    report = {'size': size, 'runs': runs}
+    for storage in (OptimizationResult.ROWS, OptimizationResult.PACKED):
+        writer = ResultWriter(storage=storage)
+        seconds = []
+        with transaction.atomic():
+            restaurant = Restaurant.objects.create(name=f"Benchmark {size} x {storage}")
+            outlet = Outlet.objects.create(restaurant=restaurant, name='Benchmark')
+            MenuItem.objects.bulk_create(synthetic_items(outlet, size, seed), batch_size=writer.batch_size)
+            menu = MenuArrays.from_queryset(MenuItem.objects.filter(outlet=outlet))
+            solution = engine.optimize(menu, engine.CLOSED_FORM)
+            before = table_bytes([OptimizedMenuItem, PackedResultItems])
+            for _ in range(runs):
+                writer.write(outlet, menu, solution)
+                seconds.append(writer.last_stats.seconds)
+            after = table_bytes([OptimizedMenuItem, PackedResultItems])
+            transaction.set_rollback(True)
+        report[storage] = {
+            'write_seconds': statistics.median(seconds),
+            'bytes_per_run': None if before is None else (after - before) / runs,
+        }
+    rows, packed_run = report[OptimizationResult.ROWS], report[OptimizationResult.PACKED]
+    report['write_speedup'] = rows['write_seconds'] / packed_run['write_seconds']
+    report['size_ratio'] = (None if rows['bytes_per_run'] is None or not packed_run['bytes_per_run']
+                            else rows['bytes_per_run'] / packed_run['bytes_per_run'])
+    return report
@@ -0,0 +1,124 @@
+# optimizer/cache.py
+
+"""
+Content-addressed cache of optimization results.
+
+A menu is fingerprinted by hashing every item's name, cost, price bounds,
+demand, elasticity, demand model and constraint fields together with the engine version,
+outlet, method and method options. When a
+result with the same fingerprint exists it is reused instead of solving
+again. Lookups go through a bounded in-process LRU in front of the indexed
+OptimizationResult.fingerprint column.
+
+The LRU is per process, and the signals that clear it only reach the
+process that changed the menu or deleted the result. Callers therefore
+load the result behind a hit and ``forget`` the fingerprint when it is gone.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import engine
+from .models import OptimizationResult
+
+DEFAULT_CACHE_SIZE = 128
+
+
+def menu_fingerprint(menu, method, options=None, outlet_id=None):
+    """Stable SHA-256 of an outlet's menu snapshot and the method (and options) used to solve it."""
+    digest = hashlib.sha256()
+    digest.update(f"{engine.ENGINE_VERSION}:{outlet_id}:{method}:{len(menu)}".encode())
+    digest.update(json.dumps(options or {}, sort_keys=True).encode())
+    digest.update('\0'.join(menu.names).encode())
+    digest.update('\0'.join(menu.categories).encode())
+    digest.update('\0'.join(menu.demand_models.tolist()).encode())
+    for column in (menu.cost, menu.min_price, menu.max_price, menu.base_demand, menu.elasticity,
+                   menu.size_rank, menu.current_price):
+        digest.update(column.astype('<f8').tobytes())
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe mapping that drops the least recently used entry when full."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_results = LRUCache(getattr(settings, 'PRICEWISE_RESULT_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+
+
+def lookup(fingerprint):
+    """Return the id of a saved result for ``fingerprint``, or None."""
+    result_id = _results.get(fingerprint)
+    if result_id is None:
+        result_id = (
+            OptimizationResult.objects.filter(fingerprint=fingerprint)
+            .order_by('-pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if result_id is not None:
+            _results.put(fingerprint, result_id)
+    return result_id
+
+
+async def alookup(fingerprint):
+    """``lookup`` for async views."""
+    result_id = _results.get(fingerprint)
+    if result_id is None:
+        result_id = await (
+            OptimizationResult.objects.filter(fingerprint=fingerprint)
+            .order_by('-pk')
+            .values_list('pk', flat=True)
+            .afirst()
+        )
+        if result_id is not None:
+            _results.put(fingerprint, result_id)
+    return result_id
+
+
+def remember(fingerprint, result_id):
+    _results.put(fingerprint, result_id)
+
+
+def forget(fingerprint):
+    """Drop one entry, e.g. after its result was deleted by another process."""
+    _results.pop(fingerprint)
+
+
+def invalidate():
+    """Drop every cached entry; called whenever the menu or results change."""
+    _results.clear()
@@ -0,0 +1,288 @@
+# optimizer/constrained.py
+
+"""
+Menu-wide constrained price optimization.
+
+Each item's profit curve, under its own demand model, is approximated by
+a piecewise-linear function of its normalized price: the price range is
+split into segments and one LP variable per segment carries the slope of
+that segment. The approximation is exact for concave curves, like the
+linear model's; where a constant-elasticity or logit curve is convex the
+LP may fill a later segment first, so those prices are approximate. This
+turns the problem into a linear program whose constraint matrix is
+assembled in sparse form, so large menus with thousands of constraints
+still solve quickly with HiGHS (through highspy) or CBC (through PuLP).
+
+Supported constraints:
+
+* capacity -- total expected demand across the menu may not exceed it
+* ladder_step -- within a category, each item must cost at least this
+  much more than the item with the next lower ``size_rank``
+* max_average_change -- the mean absolute difference between the new
+  price and ``current_price`` (over items that have one) is capped
+"""
+
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from scipy import sparse
+
+from .engine import OptimizationError, demand_limit, evaluate
+
+DEFAULT_SEGMENTS = 8
+
+
+@dataclass
+class PricingConstraints:
+    capacity: float = None
+    ladder_step: float = None
+    max_average_change: float = None
+    segments: int = DEFAULT_SEGMENTS
+
+    @classmethod
+    def from_options(cls, options):
+        """Build from the JSON options stored on an OptimizationJob."""
+        known = {name: options[name] for name in cls.__dataclass_fields__ if options.get(name) is not None}
+        return cls(**known)
+
+    def as_options(self):
+        return {name: value for name, value in asdict(self).items() if value is not None}
+
+
+class ConstraintMatrix:
+    """Accumulates sparse ``A_ub x <= b_ub`` rows in COO form."""
+
+    def __init__(self, num_columns):
+        self.num_columns = num_columns
+        self.rows, self.cols, self.data, self.bounds = [], [], [], []
+        self.num_rows = 0
+
+    def add(self, rows, cols, data, bounds):
+        """Add len(bounds) rows; ``rows`` indexes into the new rows."""
+        self.rows.append(np.asarray(rows) + self.num_rows)
+        self.cols.append(np.asarray(cols))
+        self.data.append(np.asarray(data, dtype=np.float64))
+        self.bounds.append(np.asarray(bounds, dtype=np.float64))
+        self.num_rows += len(self.bounds[-1])
+
+    def build(self):
+        if not self.num_rows:
+            return None, None
+        matrix = sparse.coo_matrix(
+            (np.concatenate(self.data), (np.concatenate(self.rows), np.concatenate(self.cols))),
+            shape=(self.num_rows, self.num_columns),
+        ).tocsr()
+        return matrix, np.concatenate(self.bounds)
+
+
+def segment_entries(rows, items, coefficients, segments):
+    """Expand per-item coefficients onto every segment variable of the item."""
+    offsets = np.tile(np.arange(segments), len(items))
+    return (
+        np.repeat(rows, segments),
+        np.repeat(np.asarray(items) * segments, segments) + offsets,
+        np.repeat(coefficients, segments),
+    )
+
+
+def ladder_pairs(menu):
+    """(lower, higher) item index pairs for consecutive sizes in a category."""
+    has_category = np.array([bool(category) for category in menu.categories], dtype=bool)
+    ranked = np.flatnonzero(has_category & ~np.isnan(menu.size_rank))
+    if len(ranked) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    _, codes = np.unique([menu.categories[i] for i in ranked], return_inverse=True)
+    order = np.lexsort((menu.size_rank[ranked], codes))
+    items, codes = ranked[order], codes[order]
+    ranks = menu.size_rank[items]
+    keep = (codes[:-1] == codes[1:]) & (ranks[1:] > ranks[:-1])
+    return np.column_stack([items[:-1][keep], items[1:][keep]])
+
+
+def build_problem(menu, constraints):
+    """Assemble the piecewise-linear LP.
+
+    Returns (c, A_ub, b_ub, bounds, segments). Columns are the N * K
+    segment variables (item-major) followed by one deviation variable per
+    item with a current price when max_average_change is set.
+    """
+    n, k = len(menu), constraints.segments
+    if k < 1:
+        raise OptimizationError("At least one segment is needed for the piecewise-linear model.")
+
+    # Where demand reaches zero there is no point pricing higher
+    upper = demand_limit(menu)
+    width = upper / k
+    breakpoints = np.linspace(0, 1, k + 1)[:, None] * upper  # (K + 1) x N
+    _, demand, profit = evaluate(menu, breakpoints)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_slopes = np.where(width > 0, np.diff(profit, axis=0) / width, 0).T  # N x K
+        demand_slopes = np.where(width > 0, np.diff(demand, axis=0) / width, 0).T
+
+    has_current = ~np.isnan(menu.current_price)
+    tracked = np.flatnonzero(has_current) if constraints.max_average_change is not None else np.empty(0, dtype=np.int64)
+    num_vars = n * k + len(tracked)
+
+    c = np.concatenate([-profit_slopes.ravel(), np.zeros(len(tracked))])
+    lower = np.zeros(num_vars)
+    upper_bounds = np.concatenate([np.repeat(width, k), np.full(len(tracked), np.inf)])
+
+    matrix = ConstraintMatrix(num_vars)
+    price_range = menu.price_range
+
+    if constraints.capacity is not None:
+        matrix.add(
+            np.zeros(n * k, dtype=np.int64),
+            np.arange(n * k),
+            demand_slopes.ravel(),
+            [constraints.capacity - demand[0].sum()],
+        )
+
+    if constraints.ladder_step is not None:
+        pairs = ladder_pairs(menu)
+        if len(pairs):
+            low, high = pairs[:, 0], pairs[:, 1]
+            rows = np.arange(len(pairs))
+            # min_low + range_low * x_low + step <= min_high + range_high * x_high
+            r1, c1, d1 = segment_entries(rows, low, price_range[low], k)
+            r2, c2, d2 = segment_entries(rows, high, -price_range[high], k)
+            matrix.add(
+                np.concatenate([r1, r2]),
+                np.concatenate([c1, c2]),
+                np.concatenate([d1, d2]),
+                menu.min_price[high] - menu.min_price[low] - constraints.ladder_step,
+            )
+
+    if len(tracked):
+        m = len(tracked)
+        rows = np.arange(m)
+        deviation_cols = n * k + rows
+        offset = menu.current_price[tracked] - menu.min_price[tracked]
+        # price - current <= t  and  current - price <= t
+        r1, c1, d1 = segment_entries(rows, tracked, price_range[tracked], k)
+        matrix.add(
+            np.concatenate([r1, rows]),
+            np.concatenate([c1, deviation_cols]),
+            np.concatenate([d1, -np.ones(m)]),
+            offset,
+        )
+        r2, c2, d2 = segment_entries(rows, tracked, -price_range[tracked], k)
+        matrix.add(
+            np.concatenate([r2, rows]),
+            np.concatenate([c2, deviation_cols]),
+            np.concatenate([d2, -np.ones(m)]),
+            -offset,
+        )
+        matrix.add(np.zeros(m, dtype=np.int64), deviation_cols, np.ones(m), [constraints.max_average_change * m])
+
+    A_ub, b_ub = matrix.build()
+    return c, A_ub, b_ub, np.column_stack([lower, upper_bounds]), k
+
+
+def highs_model(c, A_ub, b_ub, bounds):
+    """A highspy.Highs instance with the LP passed in.
+
+    The model is passed as column-wise sparse arrays. SciPy's linprog
+    wrapper is not used because it post-processes the basis with a
+    per-column Python loop that grows quadratically with the number of
+    variables.
+    """
+    import highspy
+
+    num_cols = len(c)
+    lp = highspy.HighsLp()
+    lp.num_col_ = num_cols
+    lp.col_cost_ = c
+    lp.col_lower_ = bounds[:, 0]
+    lp.col_upper_ = np.where(np.isinf(bounds[:, 1]), highspy.kHighsInf, bounds[:, 1])
+    if A_ub is not None:
+        columns = A_ub.tocsc()
+        lp.num_row_ = columns.shape[0]
+        lp.row_lower_ = np.full(columns.shape[0], -highspy.kHighsInf)
+        lp.row_upper_ = b_ub
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = columns.indptr
+        lp.a_matrix_.index_ = columns.indices
+        lp.a_matrix_.value_ = columns.data
+    else:
+        lp.a_matrix_.start_ = np.zeros(num_cols + 1, dtype=np.int32)
+
+    highs = highspy.Highs()
+    highs.setOptionValue('output_flag', False)
+    highs.passModel(lp)
+    return highs
+
+
+def highs_solution(highs):
+    """Run HiGHS (from its current basis, if it has one) and return the column values."""
+    import highspy
+
+    highs.run()
+    status = highs.getModelStatus()
+    if status != highspy.HighsModelStatus.kOptimal:
+        raise OptimizationError(f"The constraints cannot all be met: {highs.modelStatusToString(status)}")
+    return np.asarray(highs.getSolution().col_value)
+
+
+def solve_highs(c, A_ub, b_ub, bounds):
+    """Solve with the HiGHS Python bindings."""
+    return highs_solution(highs_model(c, A_ub, b_ub, bounds))
+
+
+def cbc_model(c, A_ub, b_ub, bounds):
+    """A PuLP problem for the LP; returns (problem, variables, constraints)."""
+    import pulp
+
+    problem = pulp.LpProblem('menu_prices', pulp.LpMinimize)
+    variables = [
+        pulp.LpVariable(f"v{i}", lowBound=low, upBound=None if np.isinf(high) else high)
+        for i, (low, high) in enumerate(bounds.tolist())
+    ]
+    problem += pulp.LpAffineExpression(
+        (variables[i], value) for i, value in enumerate(c.tolist()) if value
+    )
+    constraints = []
+    if A_ub is not None:
+        for row, bound in enumerate(b_ub.tolist()):
+            start, end = A_ub.indptr[row], A_ub.indptr[row + 1]
+            expression = pulp.LpAffineExpression(
+                zip((variables[i] for i in A_ub.indices[start:end]), A_ub.data[start:end].tolist())
+            )
+            constraint = expression <= bound
+            problem += constraint, f"r{row}"
+            constraints.append(constraint)
+    return problem, variables, constraints
+
+
+def cbc_solution(problem, variables, warm_start=False):
+    """Solve with CBC; ``warm_start`` passes the variables' initial values to CBC."""
+    import pulp
+
+    status = problem.solve(pulp.PULP_CBC_CMD(msg=False, warmStart=warm_start))
+    if pulp.LpStatus[status] != 'Optimal':
+        raise OptimizationError(f"The constraints cannot all be met: CBC status {pulp.LpStatus[status]}")
+    return np.array([variable.varValue or 0.0 for variable in variables])
+
+
+def solve_cbc(c, A_ub, b_ub, bounds):
+    problem, variables, _ = cbc_model(c, A_ub, b_ub, bounds)
+    return cbc_solution(problem, variables)
+
+
+BACKENDS = {
+    'highs': solve_highs,
+    'cbc': solve_cbc,
+}
+
+
+def solve_constrained(menu, constraints, backend='highs'):
+    """Return normalized prices that maximise profit under ``constraints``.
+
+    Menus solved before with the same structure reuse their solver
+    session (see solvers.py) and start from the previous solution.
+    """
+    from . import solvers
+    c, A_ub, b_ub, bounds, k = build_problem(menu, constraints)
+    x = solvers.solve(solvers.session_key(menu, constraints, backend), backend, c, A_ub, b_ub, bounds)
+    normalized = x[:len(menu) * k].reshape(len(menu), k).sum(axis=1)
+    return np.clip(normalized, 0, 1)
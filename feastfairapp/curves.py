@@ -0,0 +1,116 @@
+# optimizer/curves.py
+
+"""
+Precomputed profit curves for price sliders and what-if lookups.
+
+Every item's demand and profit are evaluated at PRICEWISE_CURVE_POINTS
+evenly spaced prices from min_price to max_price, for a whole batch of
+items in one ``engine.evaluate`` call. A curve is stored on the item as a
+float32 blob, demand points followed by profit points, together with the
+item version it was computed for. Prices are not stored: point ``i`` is
+at ``min_price + i / (points - 1) * (max_price - min_price)``.
+
+Curves are computed when an item is saved or imported. Items written in
+other ways (e.g. raw bulk inserts) are noticed by their version when the
+curves are read and recomputed then.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from . import engine
+from .engine import MenuArrays
+from .models import MenuItem
+
+DEFAULT_POINTS = 64
+
+CURVE_DTYPE = np.dtype('<f4')
+
+# MenuItem fields MenuArrays.from_rows needs for a curve
+CURVE_FIELDS = ['name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity', 'demand_model']
+
+
+def curve_points():
+    return getattr(settings, 'PRICEWISE_CURVE_POINTS', DEFAULT_POINTS)
+
+
+def compute(menu, points=None):
+    """float32 array of shape (items, 2, points): demand and profit along each item's price range."""
+    points = points or curve_points()
+    grid = np.linspace(0.0, 1.0, points)[:, np.newaxis]
+    _, demand, profit = engine.evaluate(menu, grid)
+    return np.stack([demand.T, profit.T], axis=1).astype(CURVE_DTYPE)
+
+
+def encode(curve):
+    return curve.astype(CURVE_DTYPE, copy=False).tobytes()
+
+
+def decode(blob):
+    """(demand, profit) arrays from a stored blob."""
+    return np.frombuffer(blob, dtype=CURVE_DTYPE).reshape(2, -1)
+
+
+def is_current(blob, curve_version, version, points=None):
+    """Whether a stored curve matches the item version and the configured number of points."""
+    points = points or curve_points()
+    return curve_version == version and len(blob) == 2 * points * CURVE_DTYPE.itemsize
+
+
+def item_curve(item, points=None):
+    """The encoded curve of one (possibly unsaved) MenuItem."""
+    menu = MenuArrays.from_rows([{name: getattr(item, name) for name in CURVE_FIELDS}])
+    return encode(compute(menu, points)[0])
+
+
+def store(menu, curves):
+    """Save curves for the items in ``menu`` (ids and versions as loaded) with one executemany UPDATE."""
+    table = connection.ops.quote_name(MenuItem._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET profit_curve = %s, curve_version = %s WHERE id = %s AND version = %s",
+            [(encode(curve), version, pk, version)
+             for pk, version, curve in zip(menu.ids.tolist(), menu.versions.tolist(), curves)],
+        )
+
+
+def refresh(queryset, points=None):
+    """Recompute and save the curves of every item in ``queryset``; returns the MenuArrays and curves."""
+    menu = MenuArrays.from_queryset(queryset)
+    curves = compute(menu, points)
+    if len(menu):
+        store(menu, curves)
+    return menu, curves
+
+
+def load(queryset, points=None):
+    """(pk, name, version, min_price, max_price, demand, profit) for each item, ordered by pk.
+
+    Stored curves are used as they are; missing or stale ones are
+    recomputed together in one pass and saved.
+    """
+    points = points or curve_points()
+    rows = list(queryset.order_by('pk').values_list(
+        'pk', 'name', 'version', 'min_price', 'max_price', 'profit_curve', 'curve_version'))
+    stale = [pk for pk, _, version, _, _, blob, curve_version in rows
+             if not is_current(blob, curve_version, version, points)]
+    fresh = {}
+    batch_size = getattr(settings, 'PRICEWISE_BULK_BATCH_SIZE', 1000)
+    for start in range(0, len(stale), batch_size):
+        menu, curves = refresh(MenuItem.objects.filter(pk__in=stale[start:start + batch_size]), points)
+        fresh.update(zip(menu.ids.tolist(), curves))
+    for pk, name, version, min_price, max_price, blob, _ in rows:
+        demand, profit = fresh[pk] if pk in fresh else decode(blob)
+        yield pk, name, version, min_price, max_price, demand, profit
+
+
+def to_list(values, decimals=2):
+    """Rounded plain floats for JSON; float32 values would print with spurious digits."""
+    return np.round(values.astype(np.float64), decimals).tolist()
+
+
+def interpolate(price, min_price, max_price, values):
+    """Linear interpolation of curve ``values`` at ``price`` (clipped to the price range)."""
+    prices = np.linspace(float(min_price), float(max_price), len(values))
+    return float(np.interp(price, prices, values))
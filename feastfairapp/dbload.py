@@ -0,0 +1,177 @@
+# optimizer/dbload.py
+
+"""
+Database concurrency load test.
+
+Several processes, standing in for gunicorn workers, send optimize and
+results requests through Django's test client for a fixed time:
+
+* optimize -- ``POST /api/optimize/save/``: the outlet's items
+  are upserted with fresh costs and a new result is saved, so every
+  request writes. The clients are signed in as a load-test user allowed
+  to save menus;
+* results  -- ``GET /results/<pk>/`` for a saved result.
+
+Requests go through the full request cycle, so connections are opened and
+closed as CONN_MAX_AGE says. Every mode runs with its own database
+environment (see PriceWise/database.py): ``baseline`` is SQLite's defaults
+with a connection per request, ``tuned`` the WAL/busy-timeout/persistent
+connection setup. A request that raises (e.g. "database is locked") or
+answers with a 5xx status counts as an error.
+
+The load runs against a "Load test" outlet and user that are deleted
+afterwards.
+"""
+
+import json
+import random
+import sqlite3
+import statistics
+import time
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from PriceWise import database
+
+from . import api, engine
+from .benchmarks import synthetic_items
+from .models import MenuItem, Outlet, Restaurant
+from .pipeline import optimize_menu
+
+OPTIMIZE = 'optimize'
+RESULTS = 'results'
+ENDPOINTS = [OPTIMIZE, RESULTS]
+
+# Environment each mode's processes set up Django with
+MODES = {
+    'baseline': {
+        'PRICEWISE_SQLITE_TUNING': '0',
+        'PRICEWISE_CONN_MAX_AGE': '0',
+    },
+    'tuned': {
+        'PRICEWISE_SQLITE_TUNING': '1',
+        'PRICEWISE_CONN_MAX_AGE': str(database.DEFAULT_CONN_MAX_AGE),
+    },
+}
+
+LOAD_TEST_RESTAURANT = 'Load test'
+LOAD_TEST_USER = 'pricewise-load-test'
+
+
+def create_outlet(size, seed=0):
+    """A load-test outlet with ``size`` synthetic items and one saved result.
+
+    Also creates the user the clients sign in as. Returns (outlet, result
+    id, item rows for the API).
+    """
+    user, _ = User.objects.get_or_create(username=LOAD_TEST_USER)
+    codenames = [permission.split('.')[1] for permission in api.PERSIST_PERMISSIONS]
+    user.user_permissions.set(Permission.objects.filter(content_type__app_label='feastfairapp',
+                                                        codename__in=codenames))
+    restaurant = Restaurant.objects.create(name=f"{LOAD_TEST_RESTAURANT} {time.time_ns()}")
+    outlet = Outlet.objects.create(restaurant=restaurant, name=LOAD_TEST_RESTAURANT)
+    MenuItem.objects.bulk_create(synthetic_items(outlet, size, seed))
+    result = optimize_menu(outlet)
+    rows = list(MenuItem.objects.filter(outlet=outlet).order_by('pk').values(
+        'name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity'))
+    return outlet, result.pk, [{key: str(value) for key, value in row.items()} for row in rows]
+
+
+def delete_outlet(outlet):
+    outlet.restaurant.delete()
+    User.objects.filter(username=LOAD_TEST_USER).delete()
+
+
+def journal_mode(mode):
+    """Journal mode the SQLite file needs for ``mode``."""
+    return 'WAL' if database.env_flag(MODES[mode], 'PRICEWISE_SQLITE_TUNING') else 'DELETE'
+
+
+def set_journal_mode(journal_mode):
+    """Switch the SQLite file's journal mode and return the previous one.
+
+    WAL is kept in the file, so the baseline has to turn it off again.
+    Returns None without doing anything on other databases.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    connection.close()
+    sqlite_connection = sqlite3.connect(connection.settings_dict['NAME'])
+    try:
+        previous, = sqlite_connection.execute('PRAGMA journal_mode').fetchone()
+        sqlite_connection.execute(f'PRAGMA journal_mode={journal_mode}')
+    finally:
+        sqlite_connection.close()
+    return previous
+
+
+def optimize_payload(outlet_id, rows, rng):
+    """An API request re-costing every item by a few percent, so each one saves a new result."""
+    items = []
+    for row in rows:
+        cost = float(row['cost']) * rng.uniform(0.97, 1.0)
+        items.append({**row, 'cost': f"{cost:.2f}"})
+    return json.dumps({'outlet': outlet_id, 'persist': True, 'method': engine.DEFAULT_METHOD, 'items': items})
+
+
+def send(client, endpoint, outlet_id, result_id, rows, rng):
+    """Send one request; returns True if it succeeded."""
+    if endpoint == OPTIMIZE:
+        response = client.post(reverse('api_save_menus'), optimize_payload(outlet_id, rows, rng),
+                               content_type='application/json')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        return response.status_code == 200 and all(record['status'] == 'ok' for record in records)
+    response = client.get(reverse('results', kwargs={'pk': result_id}))
+    return response.status_code == 200
+
+
+def run_load(outlet_id, result_id, rows, seconds, write_share, seed):
+    """Send requests for ``seconds``; returns {endpoint: {'latencies': [...], 'errors': n}}.
+
+    Runs in a worker process. ``write_share`` is the fraction of requests
+    that are optimize requests.
+    """
+    rng = random.Random(seed)
+    client = Client()
+    client.force_login(User.objects.get(username=LOAD_TEST_USER))
+    client.post(reverse('select_outlet'), {'outlet': outlet_id})
+    stats = {endpoint: {'latencies': [], 'errors': 0} for endpoint in ENDPOINTS}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        endpoint = OPTIMIZE if rng.random() < write_share else RESULTS
+        started = time.perf_counter()
+        try:
+            ok = send(client, endpoint, outlet_id, result_id, rows, rng)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        if ok:
+            stats[endpoint]['latencies'].append(elapsed)
+        else:
+            stats[endpoint]['errors'] += 1
+    return stats
+
+
+def percentile(values, fraction):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[round(fraction * 100) - 1]
+
+
+def summarize(process_stats, seconds):
+    """Merge per-process stats into {endpoint: throughput, latency percentiles and errors}."""
+    summary = {}
+    for endpoint in ENDPOINTS:
+        latencies = [value for stats in process_stats for value in stats[endpoint]['latencies']]
+        errors = sum(stats[endpoint]['errors'] for stats in process_stats)
+        summary[endpoint] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'per_second': len(latencies) / seconds,
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+        }
+    return summary
@@ -0,0 +1,179 @@
+# optimizer/demand.py
+
+"""
+Demand models.
+
+Every model turns prices into expected demand using an item's estimated
+demand (at its minimum price) and price elasticity. Models work
+elementwise on NumPy arrays that broadcast together, so one call prices a
+whole group of items, a scenarios x items matrix or Monte Carlo samples.
+
+Each model also gives the price that maximises ``(price - cost) * demand``
+within the item's bounds, in closed form where one exists. New models are
+added with ``register``.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.special import wrightomega
+
+DEFAULT_MODEL = 'linear'
+
+# Golden-section iterations for models without a closed-form optimum;
+# each one shrinks the bracket by ~38%, so 60 reach float precision.
+SEARCH_ITERATIONS = 60
+
+
+@dataclass
+class DemandParams:
+    """Per-item model inputs as broadcastable arrays."""
+    cost: np.ndarray
+    min_price: np.ndarray
+    max_price: np.ndarray
+    base_demand: np.ndarray  # Demand at min_price
+    elasticity: np.ndarray
+
+    @property
+    def price_range(self):
+        return self.max_price - self.min_price
+
+
+class DemandModel:
+    key = None
+    label = None
+
+    def demand(self, prices, params):
+        raise NotImplementedError
+
+    def profit(self, prices, params):
+        return (prices - params.cost) * self.demand(prices, params)
+
+    def zero_demand_price(self, params):
+        """Lowest price at which demand reaches zero, capped at max_price."""
+        return params.max_price
+
+    def optimal_price(self, params):
+        """Profit-maximising price within [min_price, max_price].
+
+        The default is a golden-section search, which is exact for profit
+        curves with a single peak; subclasses override it with a closed form.
+        """
+        golden = (np.sqrt(5) - 1) / 2
+        low, high = np.broadcast_arrays(params.min_price, params.max_price)
+        low, high = low.astype(np.float64), high.astype(np.float64)
+        for _ in range(SEARCH_ITERATIONS):
+            left = high - golden * (high - low)
+            right = low + golden * (high - low)
+            rising = self.profit(left, params) < self.profit(right, params)
+            low = np.where(rising, left, low)
+            high = np.where(rising, high, right)
+        return self.best_of(params, (low + high) / 2)
+
+    def best_of(self, params, *prices):
+        """The candidate (or price bound) with the highest profit."""
+        candidates = np.stack(np.broadcast_arrays(params.min_price, params.max_price, *prices))
+        best = np.argmax(self.profit(candidates, params), axis=0)
+        return np.take_along_axis(candidates, best[np.newaxis], axis=0)[0]
+
+
+class LinearDemand(DemandModel):
+    """Demand falls linearly with the normalized price and stops at zero:
+    ``base_demand * (1 - elasticity * x)`` with x in [0, 1] across the price range."""
+    key = 'linear'
+    label = 'Linear'
+
+    def normalized(self, prices, params):
+        price_range = params.price_range
+        return np.divide(prices - params.min_price, price_range,
+                         out=np.zeros(np.broadcast_shapes(np.shape(prices), np.shape(price_range))),
+                         where=price_range > 0)
+
+    def demand(self, prices, params):
+        return np.maximum(params.base_demand * (1 - params.elasticity * self.normalized(prices, params)), 0)
+
+    def zero_demand_price(self, params):
+        with np.errstate(divide='ignore'):
+            limit = np.where(params.elasticity > 0, np.minimum(1.0, 1.0 / params.elasticity), 1.0)
+        return params.min_price + limit * params.price_range
+
+    def optimal_price(self, params):
+        # Profit is quadratic in x with its peak at
+        # 1 / (2 * elasticity) - (min_price - cost) / (2 * range)
+        price_range = params.price_range
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stationary = (
+                price_range - params.elasticity * (params.min_price - params.cost)
+            ) / (2 * params.elasticity * price_range)
+        stationary = np.clip(np.nan_to_num(stationary, nan=0.0, posinf=1.0, neginf=0.0), 0, 1)
+        return self.best_of(params, params.min_price + stationary * price_range)
+
+
+class ConstantElasticityDemand(DemandModel):
+    """Power law: ``base_demand * (price / min_price) ** -elasticity``."""
+    key = 'constant_elasticity'
+    label = 'Constant elasticity'
+
+    def demand(self, prices, params):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(params.min_price > 0, prices / params.min_price, 1.0)
+        return params.base_demand * np.power(ratio, -params.elasticity)
+
+    def optimal_price(self, params):
+        # Unconstrained optimum is the markup rule cost * e / (e - 1) for e > 1;
+        # otherwise profit keeps rising with price.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            markup = np.where(params.elasticity > 1, params.cost * params.elasticity / (params.elasticity - 1), np.inf)
+        return self.best_of(params, np.clip(markup, params.min_price, params.max_price))
+
+
+class LogitDemand(DemandModel):
+    """S-shaped demand ``2 * base_demand / (1 + exp(b * (price - min_price)))``.
+
+    ``b = 2 * elasticity / range`` gives the same slope at min_price as the
+    linear model, but demand tails off smoothly instead of hitting zero.
+    """
+    key = 'logit'
+    label = 'Logit'
+
+    def sensitivity(self, params):
+        price_range = params.price_range
+        return np.divide(2 * params.elasticity, price_range,
+                         out=np.zeros(np.broadcast_shapes(np.shape(params.elasticity), np.shape(price_range))),
+                         where=price_range > 0)
+
+    def demand(self, prices, params):
+        # 2 / (1 + exp(z)) written with tanh to avoid overflow
+        z = self.sensitivity(params) * (prices - params.min_price)
+        return params.base_demand * (1 - np.tanh(z / 2))
+
+    def optimal_price(self, params):
+        # First-order condition gives cost + (1 + W(exp(b * (min_price - cost) - 1))) / b,
+        # with W(exp(z)) evaluated as the Wright omega function to avoid overflow
+        b = self.sensitivity(params)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            peak = params.cost + (1 + wrightomega(b * (params.min_price - params.cost) - 1).real) / b
+        peak = np.nan_to_num(peak, nan=np.inf, posinf=np.inf)
+        return self.best_of(params, np.clip(peak, params.min_price, params.max_price))
+
+
+MODELS = {}
+
+
+def register(model):
+    """Make a DemandModel instance selectable by its key."""
+    MODELS[model.key] = model
+    return model
+
+
+for _model in (LinearDemand(), ConstantElasticityDemand(), LogitDemand()):
+    register(_model)
+
+
+def get(key):
+    """Return the registered model for ``key``; raises KeyError if unknown."""
+    return MODELS[key]
+
+
+def choices():
+    return [(key, model.label) for key, model in MODELS.items()]
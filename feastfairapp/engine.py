@@ -0,0 +1,348 @@
+# optimizer/engine.py
+
+"""
+Vectorized pricing engine.
+
+The whole menu is loaded into NumPy arrays once and every item is priced
+with batched array operations. Each item's demand follows its own model
+(see demand.py); items are grouped by model so every group is evaluated in
+one array pass. Items are independent, so the profit of each item
+``(price - cost) * demand(price)`` is maximised on its own with its
+model's optimum and clipped to the item's price bounds. The old linear
+programming surrogate is kept as a selectable fallback. Menu-wide
+constraints and demand uncertainty are handled by the constrained and
+uncertainty modules.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from scipy.optimize import linprog
+
+from . import demand as demand_models
+
+# Bump whenever a change to the engine alters its output, so cached
+# results keyed by menu fingerprint, and the previous solutions that
+# incremental re-solves start from, are not reused across versions.
+ENGINE_VERSION = '1'
+
+CLOSED_FORM = 'closed_form'
+LINPROG = 'linprog'
+CONSTRAINED_HIGHS = 'constrained_highs'
+CONSTRAINED_CBC = 'constrained_cbc'
+MONTE_CARLO = 'monte_carlo'
+
+# Labels stored in OptimizationResult.method for each engine method
+METHOD_LABELS = {
+    CLOSED_FORM: 'Closed-form',
+    LINPROG: 'Simplex',
+    CONSTRAINED_HIGHS: 'Constrained (HiGHS)',
+    CONSTRAINED_CBC: 'Constrained (CBC)',
+    MONTE_CARLO: 'Monte Carlo',
+}
+
+# Menu-wide constrained methods and the LP backend each one uses
+CONSTRAINED_METHODS = {
+    CONSTRAINED_HIGHS: 'highs',
+    CONSTRAINED_CBC: 'cbc',
+}
+
+DEFAULT_METHOD = CLOSED_FORM
+
+# Methods that price every item independently, so unchanged items can
+# keep their previous solution
+SEPARABLE_METHODS = {CLOSED_FORM, LINPROG}
+
+
+class OptimizationError(Exception):
+    """Raised when a solver backend cannot produce a solution."""
+
+
+@dataclass
+class MenuArrays:
+    """Column arrays for a menu, one entry per item."""
+    ids: np.ndarray
+    names: list
+    versions: np.ndarray
+    cost: np.ndarray
+    min_price: np.ndarray
+    max_price: np.ndarray
+    base_demand: np.ndarray
+    elasticity: np.ndarray
+    categories: list
+    size_rank: np.ndarray  # NaN where unset
+    current_price: np.ndarray  # NaN where unset
+    demand_models: np.ndarray  # Demand model key per item
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def price_range(self):
+        return self.max_price - self.min_price
+
+    def params(self, items=slice(None)):
+        """DemandParams for the items at ``items`` along the last axis."""
+        return demand_models.DemandParams(
+            cost=self.cost[..., items],
+            min_price=self.min_price[..., items],
+            max_price=self.max_price[..., items],
+            base_demand=self.base_demand[..., items],
+            elasticity=self.elasticity[..., items],
+        )
+
+    def model_groups(self):
+        """(DemandModel, items) pairs covering the menu, one per model used.
+
+        ``items`` is a slice when every item shares one model, so the common
+        case indexes views instead of copies.
+        """
+        keys = self.demand_models
+        if not len(keys) or (keys == keys[0]).all():
+            key = keys[0] if len(keys) else demand_models.DEFAULT_MODEL
+            return [(model_for(key), slice(None))]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        return [(model_for(key), np.flatnonzero(inverse == i)) for i, key in enumerate(unique)]
+
+    @staticmethod
+    def values(queryset):
+        """The rows of a MenuItem queryset that ``from_values`` takes.
+
+        Decimal columns are cast to floats in SQL so no Decimal objects are
+        built on the Python side.
+        """
+        return queryset.order_by('pk').values_list(
+            'pk',
+            'name',
+            'version',
+            Cast('cost', FloatField()),
+            Cast('min_price', FloatField()),
+            Cast('max_price', FloatField()),
+            Cast('estimated_demand', FloatField()),
+            Cast('price_elasticity', FloatField()),
+            'category',
+            Cast('size_rank', FloatField()),
+            Cast('current_price', FloatField()),
+            'demand_model',
+        )
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Load a MenuItem queryset with a single query."""
+        return cls.from_values(list(cls.values(queryset)))
+
+    @classmethod
+    def from_values(cls, rows):
+        """Build the arrays from ``values`` rows, e.g. fetched with the async ORM."""
+        if not rows:
+            return cls.empty()
+        ids, names, versions, *columns, categories, size_rank, current_price, models = zip(*rows)
+        cost, min_price, max_price, base_demand, elasticity = (
+            np.asarray(column, dtype=np.float64) for column in columns
+        )
+        return cls(
+            ids=np.asarray(ids, dtype=np.int64),
+            names=list(names),
+            versions=np.asarray(versions, dtype=np.int64),
+            cost=cost,
+            min_price=min_price,
+            max_price=max_price,
+            base_demand=base_demand,
+            elasticity=elasticity,
+            categories=list(categories),
+            # None becomes NaN for unset optional columns
+            size_rank=np.asarray(size_rank, dtype=np.float64),
+            current_price=np.asarray(current_price, dtype=np.float64),
+            demand_models=np.asarray(models, dtype=str),
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from validated item values (MenuItemRowForm cleaned data).
+
+        Unsaved items have no pk, so ``ids`` are their positions and
+        ``versions`` are zero; callers that save the items fill both in.
+        """
+        if not rows:
+            return cls.empty()
+
+        def column(name):
+            return np.asarray([np.nan if row.get(name) is None else float(row[name]) for row in rows],
+                              dtype=np.float64)
+
+        return cls(
+            ids=np.arange(len(rows), dtype=np.int64),
+            names=[row['name'] for row in rows],
+            versions=np.zeros(len(rows), dtype=np.int64),
+            cost=column('cost'),
+            min_price=column('min_price'),
+            max_price=column('max_price'),
+            base_demand=column('estimated_demand'),
+            elasticity=column('price_elasticity'),
+            categories=[row.get('category') or '' for row in rows],
+            size_rank=column('size_rank'),
+            current_price=column('current_price'),
+            demand_models=np.asarray([row.get('demand_model') or demand_models.DEFAULT_MODEL for row in rows],
+                                     dtype=str),
+        )
+
+    @classmethod
+    def empty(cls):
+        zeros = np.zeros(0, dtype=np.float64)
+        return cls(
+            ids=np.zeros(0, dtype=np.int64),
+            names=[],
+            versions=np.zeros(0, dtype=np.int64),
+            cost=zeros,
+            min_price=zeros,
+            max_price=zeros,
+            base_demand=zeros,
+            elasticity=zeros,
+            categories=[],
+            size_rank=zeros,
+            current_price=zeros,
+            demand_models=np.zeros(0, dtype=str),
+        )
+
+    def subset(self, mask):
+        """Return a MenuArrays holding only the items selected by ``mask``."""
+        return self.take(np.flatnonzero(mask))
+
+    def take(self, indices):
+        """Return a MenuArrays holding the items at ``indices`` (positions or a slice), in that order."""
+        if isinstance(indices, slice):
+            indices = np.arange(len(self))[indices]
+        return MenuArrays(
+            ids=self.ids[indices],
+            names=[self.names[i] for i in indices],
+            versions=self.versions[indices],
+            cost=self.cost[indices],
+            min_price=self.min_price[indices],
+            max_price=self.max_price[indices],
+            base_demand=self.base_demand[indices],
+            elasticity=self.elasticity[indices],
+            categories=[self.categories[i] for i in indices],
+            size_rank=self.size_rank[indices],
+            current_price=self.current_price[indices],
+            demand_models=self.demand_models[indices],
+        )
+
+
+@dataclass
+class Solution:
+    """Optimized prices with the demand and profit they produce."""
+    prices: np.ndarray
+    demand: np.ndarray
+    profit: np.ndarray
+    method: str
+    variant: str = ''  # Method setting worth showing in the label, e.g. 'P10'
+    risk: object = field(default=None, repr=False)  # uncertainty.RiskStats for Monte Carlo solutions
+
+    @property
+    def total_profit(self):
+        return float(self.profit.sum())
+
+    @property
+    def label(self):
+        label = METHOD_LABELS[self.method]
+        return f"{label} ({self.variant})" if self.variant else label
+
+
+def model_for(key):
+    try:
+        return demand_models.get(key)
+    except KeyError:
+        raise OptimizationError(f"Unknown demand model '{key}'.")
+
+
+def normalize(menu, prices):
+    """Map prices onto [0, 1] across each item's price range."""
+    price_range = menu.price_range
+    return np.divide(prices - menu.min_price, price_range,
+                     out=np.zeros(np.broadcast_shapes(np.shape(prices), np.shape(price_range))),
+                     where=price_range > 0)
+
+
+def evaluate(menu, normalized):
+    """Return (prices, demand, profit) for normalized prices in [0, 1].
+
+    ``normalized`` and the menu columns may have extra leading axes (e.g.
+    candidates or scenarios x items); items are always the last axis.
+    """
+    prices = menu.min_price + normalized * menu.price_range
+    demand = np.empty(np.broadcast_shapes(prices.shape, menu.base_demand.shape))
+    for model, items in menu.model_groups():
+        demand[..., items] = model.demand(prices[..., items], menu.params(items))
+    profit = (prices - menu.cost) * demand
+    return prices, demand, profit
+
+
+def demand_limit(menu):
+    """Normalized price at which each item's demand reaches zero (1 if it never does)."""
+    prices = np.empty(np.shape(menu.max_price))
+    for model, items in menu.model_groups():
+        prices[..., items] = model.zero_demand_price(menu.params(items))
+    return normalize(menu, prices)
+
+
+def solve_closed_form(menu):
+    """Maximise every item's profit with its demand model's optimum.
+
+    The linear, constant-elasticity and logit models all have closed-form
+    optima (see demand.py); other models fall back to a bounded search.
+    The menu columns may have extra leading axes (e.g. scenarios x items);
+    every entry is solved independently.
+    """
+    params = menu.params()
+    shape = np.broadcast_shapes(*(np.shape(column) for column in vars(params).values()))
+    prices = np.empty(shape)
+    for model, items in menu.model_groups():
+        prices[..., items] = model.optimal_price(menu.params(items))
+    return normalize(menu, prices)
+
+
+def solve_linprog(menu):
+    """Legacy linear surrogate solved with SciPy's HiGHS simplex.
+
+    Each item's profit is approximated by the line between its profit at
+    min_price and at max_price, so every price lands on one of its bounds.
+    """
+    _, _, (profit_at_min, profit_at_max) = evaluate(menu, np.array([[0.0], [1.0]]))
+
+    # linprog minimises, so negate the slope of each item's profit line
+    c = -(profit_at_max - profit_at_min)
+    result = linprog(c=c, bounds=(0, 1), method='highs-ds')
+    if not result.success:
+        raise OptimizationError(result.message)
+    return result.x
+
+
+SOLVERS = {
+    CLOSED_FORM: solve_closed_form,
+    LINPROG: solve_linprog,
+}
+
+
+def optimize(menu, method=DEFAULT_METHOD, config=None):
+    """Solve the menu with the selected method and return a Solution.
+
+    ``config`` holds the method's settings: a constrained.PricingConstraints
+    for the constrained methods or an uncertainty.UncertaintySettings for
+    Monte Carlo. Other methods ignore it.
+    """
+    if method == MONTE_CARLO:
+        from . import uncertainty
+        return uncertainty.optimize(menu, config)
+    if method in CONSTRAINED_METHODS:
+        from .constrained import PricingConstraints, solve_constrained
+        normalized = solve_constrained(menu, config or PricingConstraints(), CONSTRAINED_METHODS[method])
+    else:
+        try:
+            solver = SOLVERS[method]
+        except KeyError:
+            raise OptimizationError(f"Unknown optimization method '{method}'.")
+        normalized = solver(menu)
+    prices, demand, profit = evaluate(menu, normalized)
+    return Solution(prices=prices, demand=demand, profit=profit, method=method)
@@ -0,0 +1,197 @@
+# optimizer/exports.py
+
+"""
+Streaming export of optimized prices across runs.
+
+Rows are read from the database as plain tuples (``values_list``) through
+``iterator(chunk_size=...)``, so only one chunk is held in memory however
+many runs and items match. Run columns (date, outlet, method) are read
+once per run rather than converted on every item row. CSV is produced a chunk at a time, for a
+StreamingHttpResponse or a file; Parquet (needs pyarrow) is written one
+row group at a time. Runs with packed items (see packed.py) are unpacked
+one at a time and merged into the row stream in run order.
+"""
+
+import csv
+import heapq
+import itertools
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import packed
+from .models import OptimizationResult, OptimizedMenuItem
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Packed runs fetched per round trip; each holds a whole run's items
+PACKED_CHUNK_SIZE = 20
+
+# Rows per Parquet row group; larger groups compress and scan better
+PARQUET_ROW_GROUP_SIZE = 50000
+
+FORMATS = ('csv', 'parquet')
+
+# Columns that belong to the run, read once per run instead of once per row
+RUN_COLUMNS = [
+    ('date_created', 'date_created'),
+    ('restaurant', 'outlet__restaurant__name'),
+    ('outlet_id', 'outlet_id'),
+    ('outlet', 'outlet__name'),
+    ('method', 'method'),
+]
+ITEM_COLUMNS = [
+    ('menu_item_id', 'menu_item_id'),
+    ('item_version', 'item_version'),
+    ('name', 'name'),
+    ('optimized_price', 'optimized_price'),
+    ('expected_demand', 'expected_demand'),
+    ('item_profit', 'item_profit'),
+]
+HEADER = ['optimization_id'] + [name for name, _ in RUN_COLUMNS + ITEM_COLUMNS]
+
+
+class ExportError(Exception):
+    """Raised when an export cannot be produced."""
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class ExportRows:
+    """Item rows of row-stored runs and of packed runs, merged by run id.
+
+    Iterated only through ``iterator``, like the queryset it wraps.
+    """
+
+    def __init__(self, rows, packed_runs):
+        self.rows = rows
+        self.packed_runs = packed_runs
+
+    def packed_rows(self):
+        for pk, blob in self.packed_runs.values_list('pk', 'packed_items__data').iterator(
+                chunk_size=PACKED_CHUNK_SIZE):
+            for row in packed.PackedItems.unpack(blob).rows():
+                yield pk, *row
+
+    def iterator(self, chunk_size):
+        # A run's items are all in one of the two streams, so merging by
+        # run id keeps every run's items together and in order
+        return heapq.merge(self.rows.iterator(chunk_size=chunk_size), self.packed_rows(), key=lambda row: row[0])
+
+
+def export_rows(outlets=None, start=None, end=None, optimization=None):
+    """(optimization id, *ITEM_COLUMNS) for every optimized item matching the filters.
+
+    ``outlets`` is an iterable or queryset of outlets; ``start`` and
+    ``end`` are dates, both inclusive. Dates are turned into a datetime
+    range so the (outlet, date_created) index can be used.
+    """
+    runs = OptimizationResult.objects.all()
+    if optimization is not None:
+        runs = runs.filter(pk=optimization.pk)
+    if outlets is not None:
+        runs = runs.filter(outlet__in=outlets)
+    if start is not None:
+        runs = runs.filter(date_created__gte=day_start(start))
+    if end is not None:
+        runs = runs.filter(date_created__lt=day_start(end + timedelta(days=1)))
+    # Packed runs have no item rows
+    rows = OptimizedMenuItem.objects.filter(optimization__in=runs.filter(item_storage=OptimizationResult.ROWS))
+    rows = rows.order_by('optimization_id', 'pk').values_list(
+        'optimization_id', *(lookup for _, lookup in ITEM_COLUMNS))
+    return ExportRows(rows, runs.filter(item_storage=OptimizationResult.PACKED).order_by('pk'))
+
+
+def chunks(rows, size):
+    """Lists of up to ``size`` rows."""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def row_chunks(rows, chunk_size=None, iso_dates=False):
+    """Stream ``export_rows`` from the database as lists of HEADER tuples.
+
+    The run columns of each chunk are fetched with one extra query, so
+    only the runs in the current chunk are held in memory.
+    """
+    chunk_size = chunk_size or getattr(settings, 'PRICEWISE_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    for chunk in chunks(rows.iterator(chunk_size=chunk_size), chunk_size):
+        runs = {
+            pk: (date_created.isoformat() if iso_dates else date_created, *columns)
+            for pk, date_created, *columns in OptimizationResult.objects.filter(
+                pk__in={row[0] for row in chunk}).values_list('pk', *(lookup for _, lookup in RUN_COLUMNS))
+        }
+        yield [(row[0], *runs[row[0]], *row[1:]) for row in chunk]
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_text(rows):
+    return ''.join(map(csv.writer(Echo()).writerow, rows))
+
+
+def csv_chunks(rows, chunk_size=None):
+    """Yield the CSV text, header first, one chunk of rows at a time."""
+    yield csv_text([HEADER])
+    for chunk in row_chunks(rows, chunk_size, iso_dates=True):
+        yield csv_text(chunk)
+
+
+def write_csv(rows, output, chunk_size=None):
+    """Write CSV to a text file; returns the number of rows written."""
+    output.write(csv_text([HEADER]))
+    count = 0
+    for chunk in row_chunks(rows, chunk_size, iso_dates=True):
+        output.write(csv_text(chunk))
+        count += len(chunk)
+    return count
+
+
+def arrow_schema(pa):
+    return pa.schema([
+        ('optimization_id', pa.int64()),
+        ('date_created', pa.timestamp('us', tz='UTC')),
+        ('restaurant', pa.string()),
+        ('outlet_id', pa.int64()),
+        ('outlet', pa.string()),
+        ('method', pa.string()),
+        ('menu_item_id', pa.int64()),
+        ('item_version', pa.int64()),
+        ('name', pa.string()),
+        ('optimized_price', pa.decimal128(10, 2)),
+        ('expected_demand', pa.decimal128(10, 2)),
+        ('item_profit', pa.decimal128(10, 2)),
+    ])
+
+
+def write_parquet(rows, output, chunk_size=None):
+    """Write a Parquet file to a path or binary file; returns the number of rows.
+
+    Prices stay exact as decimal columns.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export needs the pyarrow package (pip install pyarrow).")
+
+    schema = arrow_schema(pa)
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for chunk in chunks(itertools.chain.from_iterable(row_chunks(rows, chunk_size)), PARQUET_ROW_GROUP_SIZE):
+            columns = zip(*chunk)
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=column.type) for values, column in zip(columns, schema)],
+                schema=schema,
+            ))
+            count += len(chunk)
+    return count
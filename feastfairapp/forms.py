@@ -1,13 +1,16 @@
 # optimizer/forms.py
 
 from django import forms
-from .models import MenuItem
+from django.core import signing
+from . import demand, engine, tables
+from .models import MenuItem, OptimizedMenuItem, Outlet
 from django.core.exceptions import ValidationError
 
 class MenuItemForm(forms.ModelForm):
     class Meta:
         model = MenuItem
-        fields = ['name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity']
+        fields = ['name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity',
+                  'demand_model', 'category', 'size_rank', 'current_price']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'cost': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
@@ -15,6 +18,10 @@ class MenuItemForm(forms.ModelForm):
             'max_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'estimated_demand': forms.NumberInput(attrs={'class': 'form-control'}),
             'price_elasticity': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+            'demand_model': forms.Select(attrs={'class': 'form-select'}),
+            'category': forms.TextInput(attrs={'class': 'form-control'}),
+            'size_rank': forms.NumberInput(attrs={'class': 'form-control'}),
+            'current_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
         }
         labels = {
             'name': 'Menu Item Name',
@@ -23,33 +30,304 @@ class MenuItemForm(forms.ModelForm):
             'max_price': 'Maximum Price (₹)',
             'estimated_demand': 'Estimated Demand (units at min price)',
             'price_elasticity': 'Price Elasticity Factor',
+            'demand_model': 'Demand Model',
+            'category': 'Category (optional)',
+            'size_rank': 'Size Rank (optional)',
+            'current_price': 'Current Menu Price (₹, optional)',
         }
         help_texts = {
-            'price_elasticity': 'How demand changes with price (Higher value = demand falls faster as price increases)'
+            'price_elasticity': 'How demand changes with price (Higher value = demand falls faster as price increases)',
+            'demand_model': 'Linear: demand falls steadily to zero. Constant elasticity: each 1% price rise loses '
+                            'the same % of demand. Logit: demand tails off smoothly.',
+            'size_rank': 'Within a category, larger sizes get a higher rank and must cost more',
         }
     
     def clean(self):
         cleaned_data = super().clean()
-        min_price = cleaned_data.get('min_price')
-        max_price = cleaned_data.get('max_price')
-        cost = cleaned_data.get('cost')
-        price_elasticity = cleaned_data.get('price_elasticity')
-        estimated_demand = cleaned_data.get('estimated_demand')
-        
-        # Ensure max price is greater than min price
-        if min_price and max_price and min_price >= max_price:
-            raise ValidationError("Maximum price must be greater than minimum price.")
-        
-        # Ensure min price is greater than or equal to cost
-        if min_price and cost and min_price < cost:
-            raise ValidationError("Minimum price should be at least equal to the cost.")
+        check_menu_item_rules(cleaned_data)
+        return cleaned_data
+
+
+def check_menu_item_rules(cleaned_data):
+    """Cross-field rules shared by every way of creating a menu item."""
+    min_price = cleaned_data.get('min_price')
+    max_price = cleaned_data.get('max_price')
+    cost = cleaned_data.get('cost')
+    price_elasticity = cleaned_data.get('price_elasticity')
+    estimated_demand = cleaned_data.get('estimated_demand')
+    
+    # Ensure max price is greater than min price
+    if min_price and max_price and min_price >= max_price:
+        raise ValidationError("Maximum price must be greater than minimum price.")
+    
+    # Ensure min price is greater than or equal to cost
+    if min_price and cost and min_price < cost:
+        raise ValidationError("Minimum price should be at least equal to the cost.")
+    
+    # Validate price elasticity is positive
+    if price_elasticity and price_elasticity <= 0:
+        raise ValidationError("Price elasticity must be a positive number.")
         
-        # Validate price elasticity is positive
-        if price_elasticity and price_elasticity <= 0:
-            raise ValidationError("Price elasticity must be a positive number.")
-            
-        # Validate estimated demand is positive
-        if estimated_demand and estimated_demand <= 0:
-            raise ValidationError("Estimated demand must be a positive number.")
-            
-        return cleaned_data
\ No newline at end of file
+    # Validate estimated demand is positive
+    if estimated_demand and estimated_demand <= 0:
+        raise ValidationError("Estimated demand must be a positive number.")
+
+
+def _model_field(name):
+    return MenuItem._meta.get_field(name).formfield()
+
+
+class MenuItemRowForm(forms.Form):
+    """Validates one menu item given as plain data (an import row or API
+    payload) with the same rules as MenuItemForm, without building a
+    MenuItem instance."""
+    name = _model_field('name')
+    cost = _model_field('cost')
+    min_price = _model_field('min_price')
+    max_price = _model_field('max_price')
+    estimated_demand = _model_field('estimated_demand')
+    price_elasticity = _model_field('price_elasticity')
+    category = _model_field('category')
+    size_rank = _model_field('size_rank')
+    current_price = _model_field('current_price')
+    demand_model = forms.ChoiceField(choices=demand.choices, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_menu_item_rules(cleaned_data)
+        cleaned_data['demand_model'] = cleaned_data.get('demand_model') or demand.DEFAULT_MODEL
+        return cleaned_data
+
+
+class ConstraintsForm(forms.Form):
+    """Optional menu-wide limits for the constrained optimization methods."""
+    capacity = forms.FloatField(
+        required=False,
+        min_value=0,
+        label='Kitchen Capacity (total units)',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'No limit'}),
+    )
+    ladder_step = forms.FloatField(
+        required=False,
+        min_value=0,
+        label='Size Price Step (₹)',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'No ladder'}),
+    )
+    max_average_change = forms.FloatField(
+        required=False,
+        min_value=0,
+        label='Max Average Price Change (₹)',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'No limit'}),
+    )
+
+    def options(self):
+        """The limits that were filled in, as JSON-serialisable job options."""
+        return {name: value for name, value in self.cleaned_data.items() if value is not None}
+
+
+class UncertaintyForm(forms.Form):
+    """Sampling settings for the Monte Carlo method."""
+    OBJECTIVE_CHOICES = [
+        ('', 'Expected profit'),
+        ('50', 'Median (P50) profit'),
+        ('25', 'P25 profit'),
+        ('10', 'P10 profit'),
+        ('5', 'P5 profit'),
+    ]
+
+    samples = forms.IntegerField(
+        initial=1000,
+        min_value=1,
+        max_value=100000,
+        label='Demand Samples',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    demand_cv = forms.FloatField(
+        initial=0.2,
+        min_value=0,
+        label='Demand Uncertainty (CV)',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+    )
+    elasticity_cv = forms.FloatField(
+        initial=0.2,
+        min_value=0,
+        label='Elasticity Uncertainty (CV)',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+    )
+    percentile = forms.TypedChoiceField(
+        choices=OBJECTIVE_CHOICES,
+        coerce=float,
+        empty_value=None,
+        required=False,
+        label='Maximise',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    seed = forms.IntegerField(
+        initial=0,
+        min_value=0,
+        label='Random Seed',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+
+    def options(self):
+        """The settings as JSON-serialisable job options."""
+        return {name: value for name, value in self.cleaned_data.items() if value is not None}
+
+
+class ApiMenuForm(forms.Form):
+    """Settings of one menu sent to the JSON API (see api.py)."""
+    method = forms.ChoiceField(choices=engine.METHOD_LABELS.items, required=False)
+    outlet = forms.ModelChoiceField(queryset=Outlet.objects.all(), required=False)
+    persist = forms.BooleanField(required=False)
+
+    def clean_method(self):
+        return self.cleaned_data['method'] or engine.DEFAULT_METHOD
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('persist') and not cleaned_data.get('outlet') and 'outlet' not in self.errors:
+            raise ValidationError("Saving a menu needs the id of its outlet.")
+        return cleaned_data
+
+
+class OutletChoiceForm(forms.Form):
+    """Picks the outlet whose menu the pages show and optimize."""
+    outlet = forms.ModelChoiceField(
+        queryset=Outlet.objects.select_related('restaurant').order_by('restaurant__name', 'name'),
+        empty_label=None,
+        widget=forms.Select(attrs={'class': 'form-select', 'onchange': 'this.form.submit()'}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The Select widget iterates its choices twice; list them from one query
+        field = self.fields['outlet']
+        field.choices = [(outlet.pk, field.label_from_instance(outlet)) for outlet in field.queryset]
+
+
+def method_options_form(method, options):
+    """Bind ``options`` to the settings form of ``method``; None if it has none.
+
+    Unset fields fall back to the form's initial values, as on the input page.
+    """
+    if method in engine.CONSTRAINED_METHODS:
+        form_class = ConstraintsForm
+    elif method == engine.MONTE_CARLO:
+        form_class = UncertaintyForm
+    else:
+        return None
+    data = {name: field.initial for name, field in form_class.base_fields.items() if field.initial is not None}
+    data.update(options)
+    return form_class(data)
+
+
+class DateRangeForm(forms.Form):
+    """Optional, inclusive date range."""
+    start = forms.DateField(required=False, label='From')
+    end = forms.DateField(required=False, label='To')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise ValidationError("The start date must not be after the end date.")
+        return cleaned_data
+
+
+class ExportForm(DateRangeForm):
+    """Filters for downloading optimized prices."""
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+    ]
+
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        return cleaned_data
+
+
+class AnalyticsForm(DateRangeForm):
+    """Filters for the item history API; item names come from repeated ``name`` parameters."""
+    PER_CHOICES = [
+        ('day', 'Day'),
+        ('run', 'Run'),
+    ]
+
+    per = forms.ChoiceField(choices=PER_CHOICES, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['per'] = cleaned_data.get('per') or 'day'
+        return cleaned_data
+
+
+class MenuImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+
+    file = forms.FileField(
+        label='Menu File',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'}),
+        help_text='One item per row with columns: name, cost, min_price, max_price, estimated_demand, price_elasticity '
+                  'and optionally demand_model, category, size_rank, current_price',
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+
+class TableForm(forms.Form):
+    """Search, sort and page cursor of a table.
+
+    ``COLUMNS`` are its sortable (field, heading) pairs on ``MODEL``.
+    """
+    COLUMNS = []
+    MODEL = None
+
+    q = forms.CharField(required=False, max_length=100)
+    sort = forms.CharField(required=False)
+    after = forms.CharField(required=False)
+
+    def clean_sort(self):
+        sort = self.cleaned_data['sort']
+        if sort and sort.lstrip('-') not in dict(self.COLUMNS):
+            raise ValidationError("Unknown sort column.")
+        return sort
+
+    def clean_after(self):
+        after = self.cleaned_data['after']
+        if after:
+            try:
+                sort, value, pk = tables.decode_cursor(after)
+            except (signing.BadSignature, TypeError, ValueError):
+                raise ValidationError("Invalid page cursor.")
+            # A cursor only makes sense for the sort it was made for
+            if 'sort' not in self.cleaned_data or sort != (self.cleaned_data['sort'] or self.COLUMNS[0][0]):
+                raise ValidationError("The page cursor belongs to another sort.")
+            field = sort.lstrip('-')
+            model_field = self.MODEL._meta.pk if field == 'pk' else self.MODEL._meta.get_field(field)
+            self.cleaned_data['cursor'] = (model_field.to_python(value), pk)
+        return after
+
+    def params(self):
+        """The valid parameters; invalid ones fall back to the first page, default sort, no search."""
+        self.is_valid()
+        return dict(self.cleaned_data)
+
+
+class MenuTableForm(TableForm):
+    COLUMNS = tables.MENU_COLUMNS
+    MODEL = MenuItem
+
+
+class ResultTableForm(TableForm):
+    COLUMNS = tables.RESULT_COLUMNS
+    MODEL = OptimizedMenuItem
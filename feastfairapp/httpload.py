@@ -0,0 +1,291 @@
+# optimizer/httpload.py
+
+"""
+HTTP load test of the web app behind a real server.
+
+Unlike dbload.py, which calls views through Django's test client, this
+sends HTTP requests over sockets to a server process, so worker counts,
+threads and the WSGI/ASGI server itself are part of what is measured.
+Each server in SERVERS is started on a local port with gunicorn:
+
+* wsgi -- ``gunicorn PriceWise.wsgi`` (sync workers, with threads);
+* asgi -- ``gunicorn PriceWise.asgi -k uvicorn.workers.UvicornWorker``
+  (needs uvicorn), without persistent connections, as in Procfile.asgi.
+
+Virtual users are asyncio tasks with their own cookies (session and CSRF
+token). Each one chooses a seeded outlet and then sends requests back to
+back for a fixed time, cycling through the endpoints:
+
+* home             -- ``GET /``;
+* input_menu       -- ``GET /input/``, the paginated menu table;
+* run_optimization -- ``POST /optimize/``. The seeded results were solved
+  with another method, so the lookup misses and a job is enqueued (left
+  pending unless a worker runs);
+* results          -- ``GET /results/<pk>/`` for the outlet's seeded result.
+
+The HTTP client is a minimal HTTP/1.1 one on asyncio streams, with one
+connection per request (``Connection: close``), so the load generator
+needs nothing beyond the standard library. A request that fails, times
+out or answers with an unexpected status counts as an error.
+
+The load runs against "Load test" outlets that are deleted afterwards.
+"""
+
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.urls import reverse
+
+from . import engine
+from .benchmarks import synthetic_items
+from .dbload import LOAD_TEST_RESTAURANT, percentile
+from .models import MenuItem, Outlet, Restaurant
+from .pipeline import optimize_menu
+
+HOME = 'home'
+INPUT_MENU = 'input_menu'
+RUN_OPTIMIZATION = 'run_optimization'
+RESULTS = 'results'
+ENDPOINTS = [HOME, INPUT_MENU, RUN_OPTIMIZATION, RESULTS]
+
+# Status each endpoint answers a successful request with
+EXPECTED_STATUS = {HOME: 200, INPUT_MENU: 200, RUN_OPTIMIZATION: 302, RESULTS: 200}
+
+# Seeded results use this method; optimize requests use the default one
+SEED_METHOD = engine.LINPROG
+
+SERVERS = {
+    'wsgi': ['PriceWise.wsgi'],
+    'asgi': ['PriceWise.asgi', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+
+# Environment each server runs with, as in Procfile and Procfile.asgi
+SERVER_ENVIRON = {
+    'wsgi': {'PRICEWISE_SQLITE_TUNING': '1'},
+    'asgi': {'PRICEWISE_SQLITE_TUNING': '1', 'PRICEWISE_CONN_MAX_AGE': '0'},
+}
+
+DEFAULT_TIMEOUT = 30  # Seconds before a request counts as failed
+STARTUP_SECONDS = 30
+
+
+@dataclass
+class Response:
+    status: int
+    headers: list  # (lower-cased name, value) pairs
+    body: bytes
+
+
+class HttpClient:
+    """HTTP/1.1 over asyncio streams, one connection per request, with a cookie jar."""
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def request(self, method, path, form=None):
+        return await asyncio.wait_for(self.send(method, path, form), self.timeout)
+
+    async def send(self, method, path, form):
+        body = urlencode(form).encode() if form is not None else b''
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: close",
+                 "User-Agent: pricewise-load-test"]
+        if self.cookies:
+            lines.append("Cookie: " + "; ".join(f"{name}={value}" for name, value in self.cookies.items()))
+        if form is not None:
+            lines += ["Content-Type: application/x-www-form-urlencoded", f"Content-Length: {len(body)}"]
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+            await writer.drain()
+            # The server closes the connection after the response
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, response_body = raw.partition(b"\r\n\r\n")
+        status_line, *header_lines = head.decode('latin-1').split("\r\n")
+        headers = [(name.strip().lower(), value.strip())
+                   for name, _, value in (line.partition(':') for line in header_lines)]
+        for name, value in headers:
+            if name == 'set-cookie':
+                cookie_name, _, cookie_value = value.split(';', 1)[0].partition('=')
+                self.cookies[cookie_name] = cookie_value
+        return Response(status=int(status_line.split()[1]), headers=headers, body=response_body)
+
+
+def create_outlets(count, size, seed=0):
+    """``count`` load-test outlets of ``size`` synthetic items with one saved result each.
+
+    Returns (restaurant, {outlet id: result id}).
+    """
+    restaurant = Restaurant.objects.create(name=f"{LOAD_TEST_RESTAURANT} {time.time_ns()}")
+    outlets = {}
+    for index in range(count):
+        outlet = Outlet.objects.create(restaurant=restaurant, name=f"{LOAD_TEST_RESTAURANT} {index + 1}")
+        MenuItem.objects.bulk_create(synthetic_items(outlet, size, seed + index))
+        outlets[outlet.pk] = optimize_menu(outlet, SEED_METHOD).pk
+    return restaurant, outlets
+
+
+class VirtualUser:
+    """One simulated browser working with one outlet."""
+
+    def __init__(self, base_url, outlet_id, result_id, rng, timeout=DEFAULT_TIMEOUT):
+        self.client = HttpClient(base_url, timeout)
+        self.outlet_id = outlet_id
+        self.result_id = result_id
+        self.rng = rng
+
+    def form(self, **fields):
+        return {**fields, 'csrfmiddlewaretoken': self.client.cookies.get(settings.CSRF_COOKIE_NAME, '')}
+
+    async def start(self):
+        """Pick up a CSRF token and choose the outlet, as a browser would."""
+        response = await self.client.request('GET', reverse('input_menu'))
+        if response.status != EXPECTED_STATUS[INPUT_MENU]:
+            raise RuntimeError(f"Loading the menu page answered {response.status}.")
+        response = await self.client.request('POST', reverse('select_outlet'), self.form(outlet=self.outlet_id))
+        if response.status != 302:
+            raise RuntimeError(f"Choosing outlet {self.outlet_id} answered {response.status}.")
+
+    async def send(self, endpoint):
+        """Send one request; returns True if it succeeded."""
+        if endpoint == RUN_OPTIMIZATION:
+            response = await self.client.request('POST', reverse('run_optimization'),
+                                                 self.form(method=engine.DEFAULT_METHOD))
+        elif endpoint == RESULTS:
+            response = await self.client.request('GET', reverse('results', args=[self.result_id]))
+        else:
+            response = await self.client.request('GET', reverse(endpoint))
+        return response.status == EXPECTED_STATUS[endpoint]
+
+
+@dataclass
+class LoadStats:
+    latencies: dict = field(default_factory=lambda: {endpoint: [] for endpoint in ENDPOINTS})
+    errors: dict = field(default_factory=lambda: dict.fromkeys(ENDPOINTS, 0))
+
+
+async def run_user(user, endpoints, deadline, stats):
+    await user.start()
+    # Users start at different endpoints so the mix is even at any moment
+    offset = user.rng.randrange(len(endpoints))
+    sent = 0
+    while time.perf_counter() < deadline:
+        endpoint = endpoints[(offset + sent) % len(endpoints)]
+        sent += 1
+        started = time.perf_counter()
+        try:
+            ok = await user.send(endpoint)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            ok = False
+        if ok:
+            stats.latencies[endpoint].append(time.perf_counter() - started)
+        else:
+            stats.errors[endpoint] += 1
+
+
+async def drive(base_url, outlets, concurrency, seconds, endpoints=ENDPOINTS, seed=0, timeout=DEFAULT_TIMEOUT):
+    """Run ``concurrency`` virtual users for ``seconds``; returns the LoadStats and the seconds taken.
+
+    ``outlets`` is {outlet id: result id}; users are spread over the outlets.
+    """
+    rng = random.Random(seed)
+    outlet_ids = sorted(outlets)
+    users = []
+    for index in range(concurrency):
+        outlet_id = outlet_ids[index % len(outlet_ids)]
+        users.append(VirtualUser(base_url, outlet_id, outlets[outlet_id], random.Random(rng.random()), timeout))
+    stats = LoadStats()
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(user, endpoints, started + seconds, stats) for user in users))
+    return stats, time.perf_counter() - started
+
+
+def run_load(base_url, outlets, concurrency, seconds, endpoints=ENDPOINTS, seed=0, timeout=DEFAULT_TIMEOUT):
+    stats, elapsed = asyncio.run(drive(base_url, outlets, concurrency, seconds, endpoints, seed, timeout))
+    return summarize(stats, elapsed, endpoints)
+
+
+def summarize(stats, seconds, endpoints=ENDPOINTS):
+    """{endpoint: throughput, latency percentiles and errors}, plus an 'all' entry."""
+    summary = {}
+    groups = [(endpoint, stats.latencies[endpoint], stats.errors[endpoint]) for endpoint in endpoints]
+    groups.append(('all', [value for _, latencies, _ in groups for value in latencies],
+                   sum(errors for _, _, errors in groups)))
+    for name, latencies, errors in groups:
+        summary[name] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'per_second': len(latencies) / seconds,
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        }
+    return summary
+
+
+def server_command(kind, port, workers, threads):
+    command = [sys.executable, '-m', 'gunicorn', *SERVERS[kind], '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--log-level', 'warning']
+    if kind == 'wsgi':
+        command += ['--threads', str(threads)]
+    return command
+
+
+def wait_until_ready(base_url, process, timeout=STARTUP_SECONDS):
+    """Wait for the server to answer ``GET /``; raises RuntimeError if it exits or never does."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with status {process.returncode}.")
+        try:
+            response = asyncio.run(HttpClient(base_url, timeout=5).request('GET', reverse('home')))
+            if response.status == 200:
+                return
+        except (OSError, asyncio.TimeoutError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"The server did not answer within {timeout}s.")
+
+
+class Server:
+    """A server process started for the load test and stopped on exit."""
+
+    def __init__(self, kind, port, workers=2, threads=4):
+        self.kind = kind
+        self.base_url = f'http://127.0.0.1:{port}'
+        self.command = server_command(kind, port, workers, threads)
+        self.environ = {**os.environ, **SERVER_ENVIRON[kind]}
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, cwd=settings.BASE_DIR, env=self.environ)
+        try:
+            wait_until_ready(self.base_url, self.process)
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
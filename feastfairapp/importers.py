@@ -0,0 +1,207 @@
+# optimizer/importers.py
+
+"""
+Streaming bulk import of menu items from CSV or JSON Lines.
+
+Files are read one row at a time through generators, each row is checked
+with MenuItemRowForm (the same rules as MenuItemForm), and valid rows are
+upserted by name within one outlet's menu in bulk_create / bulk_update batches. Only one batch is
+held in memory, so memory use does not grow with the file size.
+
+The whole import runs in one transaction: a file that turns out to be
+unreadable part-way (not UTF-8, broken CSV quoting) raises MenuImportError
+with the line number and leaves the menu as it was. Rows that fail
+validation are only reported and skipped.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from . import cache, curves, tables
+from .forms import MenuItemRowForm
+from .models import MenuItem
+
+IMPORT_FIELDS = ['name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity']
+OPTIONAL_FIELDS = ['demand_model', 'category', 'size_rank', 'current_price']  # Only written when the row has them
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000  # Row errors kept in the report; the rest are only counted
+
+FORMATS = ('csv', 'jsonl')
+
+
+class MenuImportError(Exception):
+    """Raised when a file cannot be imported at all."""
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)  # (line number, message) pairs
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def detect_format(filename):
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise MenuImportError(f"Can't tell the format of '{filename}'; choose CSV or JSON Lines.")
+
+
+def read_csv(stream):
+    """Yield (line number, row dict) for each CSV record."""
+    lines_read = [0]
+
+    def lines():
+        # reader.line_num can lag behind on a parse error, so count the lines handed over
+        for lines_read[0], line in enumerate(stream, start=1):
+            yield line
+
+    reader = csv.DictReader(lines())
+    try:
+        missing = set(IMPORT_FIELDS) - set(reader.fieldnames or [])
+        if missing:
+            raise MenuImportError(f"Missing CSV column(s): {', '.join(sorted(missing))}.")
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as exc:
+        raise MenuImportError(f"Line {lines_read[0]}: {exc}.") from None
+
+
+def read_jsonl(stream):
+    """Yield (line number, object) for each non-blank JSON line.
+
+    Lines that are not valid JSON yield None so they are reported as row
+    errors instead of aborting the import.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def open_text(binary_file):
+    """Yield the lines of an uploaded or opened binary file decoded as UTF-8.
+
+    Lines are decoded one at a time, so a line that is not UTF-8 raises
+    MenuImportError with its number.
+    """
+    for line_number, line in enumerate(binary_file, start=1):
+        try:
+            # The first line may start with a byte order mark
+            yield line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise MenuImportError(f"Line {line_number} is not UTF-8 text.") from None
+
+
+def format_errors(form):
+    messages = []
+    for name, errors in form.errors.items():
+        prefix = '' if name == '__all__' else f"{name}: "
+        messages.extend(prefix + str(error) for error in errors)
+    return ' '.join(messages)
+
+
+def validate_rows(rows, report):
+    """Yield the values to save for valid rows; record errors for the rest."""
+    for line_number, data in rows:
+        if not isinstance(data, dict):
+            report.add_error(line_number, "Row is not a valid JSON object.")
+            continue
+        form = MenuItemRowForm(data)
+        if form.is_valid():
+            fields = IMPORT_FIELDS + [name for name in OPTIONAL_FIELDS if name in data]
+            yield {name: form.cleaned_data[name] for name in fields}
+        else:
+            report.add_error(line_number, format_errors(form))
+
+
+def update_items(rows):
+    """Overwrite the fields of existing items and bump their version.
+
+    ``rows`` holds (pk, values) pairs. Rows are grouped by the fields they
+    carry, since optional columns are only written when the file has them,
+    and each group is written with bulk_update.
+    """
+    groups = {}
+    for pk, values in rows:
+        fields = tuple(name for name in values if name != 'name')
+        groups.setdefault(fields, []).append(
+            MenuItem(pk=pk, version=F('version') + 1, **{name: values[name] for name in fields}))
+    for fields, items in groups.items():
+        MenuItem.objects.bulk_update(items, [*fields, 'version'])
+
+
+def upsert_batch(batch, report, outlet):
+    """Insert new names and update existing ones in the outlet for one batch of rows."""
+    with transaction.atomic():
+        existing = list(MenuItem.objects.filter(outlet=outlet, name__in=batch).values_list('pk', 'name'))
+        if existing:
+            update_items([(pk, batch[name]) for pk, name in existing])
+
+        updated_names = {name for _, name in existing}
+        to_create = [MenuItem(outlet=outlet, **values) for name, values in batch.items() if name not in updated_names]
+        MenuItem.objects.bulk_create(to_create, batch_size=len(batch))
+        # Bulk updates and inserts skip MenuItem.save, so the batch's curves are computed here
+        curves.refresh(MenuItem.objects.filter(outlet=outlet, name__in=batch))
+
+    report.updated += len(existing)
+    report.created += len(to_create)
+
+
+def import_rows(rows, outlet, batch_size=None):
+    """Validate and upsert (line number, data) pairs into the outlet's menu; return an ImportReport."""
+    batch_size = batch_size or getattr(settings, 'PRICEWISE_BULK_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    report = ImportReport()
+    batch = {}
+    # A file that can't be read to the end imports nothing
+    with transaction.atomic():
+        for values in validate_rows(rows, report):
+            # A name repeated within the file keeps its last row
+            batch[values['name']] = values
+            if len(batch) >= batch_size:
+                upsert_batch(batch, report, outlet)
+                batch = {}
+        if batch:
+            upsert_batch(batch, report, outlet)
+
+    # Bulk writes skip the MenuItem signals
+    if report.imported:
+        cache.invalidate()
+        tables.bump_menu(outlet.pk)
+    return report
+
+
+def import_file(stream, file_format, outlet, batch_size=None):
+    """Import a text stream in ``file_format`` ('csv' or 'jsonl') into the outlet's menu."""
+    try:
+        reader = READERS[file_format]
+    except KeyError:
+        raise MenuImportError(f"Unsupported format '{file_format}'.")
+    return import_rows(reader(stream), outlet, batch_size=batch_size)
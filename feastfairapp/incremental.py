@@ -0,0 +1,153 @@
+# optimizer/incremental.py
+
+"""
+Incremental re-optimization.
+
+MenuItem.version is bumped on every change and each OptimizedMenuItem
+records the version it was solved for. For methods that price items
+independently, a new run only re-solves items whose (id, version) pair
+is missing from the latest solution; every other item keeps its previous
+price, demand and profit. The latest solution per outlet and method is
+kept in a bounded in-memory LRU (PRICEWISE_SNAPSHOT_CACHE_SIZE entries) and
+loaded from the outlet's newest saved result when it is not cached;
+packed results (see packed.py) give their arrays without a row query.
+Only solutions of the current engine.ENGINE_VERSION are reused, so
+bumping it re-solves every item once.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from . import engine, packed
+from .cache import LRUCache
+from .engine import Solution
+from .models import OptimizationResult, OptimizedMenuItem
+
+
+@dataclass
+class Snapshot:
+    """Per-item solution arrays sorted by MenuItem id."""
+    ids: np.ndarray
+    versions: np.ndarray
+    prices: np.ndarray
+    demand: np.ndarray
+    profit: np.ndarray
+
+    @classmethod
+    def from_columns(cls, ids, versions, prices, demand, profit):
+        order = np.argsort(ids, kind='stable')
+        return cls(
+            ids=np.asarray(ids, dtype=np.int64)[order],
+            versions=np.asarray(versions, dtype=np.int64)[order],
+            prices=np.asarray(prices, dtype=np.float64)[order],
+            demand=np.asarray(demand, dtype=np.float64)[order],
+            profit=np.asarray(profit, dtype=np.float64)[order],
+        )
+
+    @classmethod
+    def from_solution(cls, menu, solution):
+        return cls.from_columns(menu.ids, menu.versions, solution.prices, solution.demand, solution.profit)
+
+    def match(self, menu):
+        """Index into the snapshot for each menu item, or -1 if it is dirty."""
+        if not len(self.ids):
+            return np.full(len(menu), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, menu.ids), len(self.ids) - 1)
+        hit = (self.ids[positions] == menu.ids) & (self.versions[positions] == menu.versions)
+        return np.where(hit, positions, -1)
+
+
+DEFAULT_SNAPSHOT_CACHE_SIZE = 64
+
+_latest = LRUCache(getattr(settings, 'PRICEWISE_SNAPSHOT_CACHE_SIZE', DEFAULT_SNAPSHOT_CACHE_SIZE))
+
+
+def load_snapshot(method, outlet_id=None):
+    """Build a Snapshot from the outlet's newest result for ``method`` saved by this engine version."""
+    latest = (
+        OptimizationResult.objects.filter(outlet_id=outlet_id, method=engine.METHOD_LABELS[method],
+                                          engine_version=engine.ENGINE_VERSION)
+        .order_by('-pk')
+        .values_list('pk', 'item_storage')
+        .first()
+    )
+    if latest is None:
+        return None
+    result_id, storage = latest
+    if storage == OptimizationResult.PACKED:
+        items = packed.load(result_id)
+        # Deleted items keep their ids in the blob but never match a menu item
+        saved = items.item_versions > 0
+        if not saved.any():
+            return None
+        return Snapshot.from_columns(items.menu_item_ids[saved], items.item_versions[saved],
+                                     items.prices[saved], items.demand[saved], items.profit[saved])
+    rows = list(
+        OptimizedMenuItem.objects.filter(
+            optimization_id=result_id,
+            menu_item__isnull=False,
+            item_version__isnull=False,
+        ).values_list(
+            'menu_item_id',
+            'item_version',
+            Cast('optimized_price', FloatField()),
+            Cast('expected_demand', FloatField()),
+            Cast('item_profit', FloatField()),
+        )
+    )
+    if not rows:
+        return None
+    return Snapshot.from_columns(*zip(*rows))
+
+
+def snapshot_key(method, outlet_id):
+    return (engine.ENGINE_VERSION, outlet_id, method)
+
+
+def latest_snapshot(method, outlet_id=None):
+    snapshot = _latest.get(snapshot_key(method, outlet_id))
+    if snapshot is None:
+        snapshot = load_snapshot(method, outlet_id)
+        if snapshot is not None:
+            _latest.put(snapshot_key(method, outlet_id), snapshot)
+    return snapshot
+
+
+def forget():
+    """Drop the in-memory solutions, e.g. after results are deleted."""
+    _latest.clear()
+
+
+def optimize(menu, method, outlet_id=None):
+    """Solve an outlet's ``menu`` re-using its previous solution for unchanged items.
+
+    Returns the Solution and the number of items that were re-solved.
+    """
+    if method not in engine.SEPARABLE_METHODS:
+        raise engine.OptimizationError(f"Method '{method}' couples items and cannot run incrementally.")
+
+    snapshot = latest_snapshot(method, outlet_id)
+    matched = snapshot.match(menu) if snapshot is not None else np.full(len(menu), -1, dtype=np.int64)
+    dirty = matched < 0
+    reused = matched[~dirty]
+
+    prices = np.empty(len(menu))
+    demand = np.empty(len(menu))
+    profit = np.empty(len(menu))
+    if len(reused):
+        prices[~dirty] = snapshot.prices[reused]
+        demand[~dirty] = snapshot.demand[reused]
+        profit[~dirty] = snapshot.profit[reused]
+    if dirty.any():
+        partial = engine.optimize(menu.subset(dirty), method)
+        prices[dirty] = partial.prices
+        demand[dirty] = partial.demand
+        profit[dirty] = partial.profit
+
+    solution = Solution(prices=prices, demand=demand, profit=profit, method=method)
+    _latest.put(snapshot_key(method, outlet_id), Snapshot.from_solution(menu, solution))
+    return solution, int(dirty.sum())
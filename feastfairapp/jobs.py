@@ -0,0 +1,88 @@
+# optimizer/jobs.py
+
+"""
+Database-backed queue of optimization jobs.
+
+Requests only enqueue an OptimizationJob; the ``run_optimization_worker``
+management command claims pending jobs and runs them in a process pool.
+Claiming is a conditional UPDATE so several workers can share one queue.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .models import OptimizationJob
+from .pipeline import optimize_menu
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_TIMEOUT = 600  # Seconds before a running job is considered abandoned
+
+
+def enqueue(outlet, method, options=None, profile=False):
+    """Queue an optimization of the outlet's current menu.
+
+    With ``profile`` the worker runs the job under cProfile.
+    """
+    return OptimizationJob.objects.create(outlet=outlet, method=method, options=options or {}, profile=profile)
+
+
+async def aenqueue(outlet, method, options=None, profile=False):
+    return await OptimizationJob.objects.acreate(outlet=outlet, method=method, options=options or {},
+                                                 profile=profile)
+
+
+def claim_next():
+    """Mark the oldest pending job as running and return it, or None."""
+    while True:
+        job = OptimizationJob.objects.filter(status=OptimizationJob.PENDING).order_by('created_at', 'pk').first()
+        if job is None:
+            return None
+        claimed = OptimizationJob.objects.filter(pk=job.pk, status=OptimizationJob.PENDING).update(
+            status=OptimizationJob.RUNNING,
+            started_at=timezone.now(),
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # Another worker claimed it first; try the next one
+
+
+def requeue_stale(timeout=None):
+    """Return jobs stuck in RUNNING (e.g. after a worker crash) to the queue."""
+    timeout = timeout or getattr(settings, 'PRICEWISE_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return OptimizationJob.objects.filter(status=OptimizationJob.RUNNING, started_at__lt=cutoff).update(
+        status=OptimizationJob.PENDING,
+        started_at=None,
+    )
+
+
+def mark_failed(job_id, error):
+    OptimizationJob.objects.filter(pk=job_id).update(
+        status=OptimizationJob.FAILED,
+        error=error,
+        finished_at=timezone.now(),
+    )
+
+
+def run_job(job_id):
+    """Run a claimed job to completion and record its outcome."""
+    job = OptimizationJob.objects.select_related('outlet').get(pk=job_id)
+    try:
+        with metrics.profiled(job.profile, f"job-{job.pk}"):
+            result = optimize_menu(job.outlet, job.method, options=job.options)
+    except Exception as exc:
+        logger.exception("Optimization job #%s failed", job_id)
+        job.status = OptimizationJob.FAILED
+        job.error = str(exc)
+    else:
+        job.status = OptimizationJob.DONE
+        job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'result', 'finished_at'])
+    return job.status
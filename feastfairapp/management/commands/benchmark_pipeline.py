@@ -0,0 +1,123 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from feastfairapp import benchmarks, engine
+
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+class Command(BaseCommand):
+    help = ("Time each stage of the optimization pipeline on synthetic menus and optionally compare "
+            "against a baseline report. Benchmark data is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int_list, default=[10, 1000, 10000, 100000],
+                            help="Comma-separated menu sizes (default 10,1000,10000,100000).")
+        parser.add_argument('--methods', default=engine.DEFAULT_METHOD,
+                            help=f"Comma-separated methods out of {', '.join(benchmarks.METHODS)}.")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs per size (default 3).")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic menus.")
+        parser.add_argument('--batch-size', type=int,
+                            help="Rows per bulk insert (default PRICEWISE_BULK_BATCH_SIZE).")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--baseline', help="JSON report to compare against.")
+        parser.add_argument('--warm-start', action='store_true',
+                            help="Compare cold and warm solves of the constrained methods instead.")
+        parser.add_argument('--changed-share', type=float, default=0.01,
+                            help="Share of items re-costed between warm-start solves (default 0.01).")
+        parser.add_argument('--storage', action='store_true',
+                            help="Compare the write time and size of row and packed result storage instead.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Relative slowdown that counts as a regression (default 0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        methods = [method.strip() for method in options['methods'].split(',') if method.strip()]
+        unknown = set(methods) - set(benchmarks.METHODS)
+        if unknown:
+            raise CommandError(f"Can't benchmark method(s): {', '.join(sorted(unknown))}.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        if options['warm_start']:
+            return self.warm_start(methods, options)
+        if options['storage']:
+            return self.storage(options)
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Can't read baseline: {exc}")
+
+        report = benchmarks.run_benchmarks(
+            options['sizes'],
+            methods,
+            repeat=options['repeat'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        if baseline is not None:
+            report['regressions'] = benchmarks.find_regressions(baseline, report, options['threshold'])
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+            self.print_summary(report)
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        regressions = report.get('regressions')
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(
+                    f"{regression['method']} @ {regression['size']} items, {regression['stage']}: "
+                    f"{regression['baseline']:.4f}s -> {regression['current']:.4f}s "
+                    f"({regression['ratio']:.2f}x)"
+                )
+            raise CommandError(f"{len(regressions)} stage(s) regressed by more than "
+                               f"{options['threshold']:.0%}.")
+
+    def print_summary(self, report):
+        for run in report['results']:
+            timings = ', '.join(
+                f"{stage} {run['stages'][stage]['median']:.4f}s"
+                for stage in benchmarks.STAGES if stage in run['stages']
+            )
+            self.stdout.write(f"{run['method']} @ {run['size']} items: {timings}")
+
+    def warm_start(self, methods, options):
+        backends = [engine.CONSTRAINED_METHODS[method] for method in methods if method in engine.CONSTRAINED_METHODS]
+        if not backends:
+            raise CommandError("--warm-start needs a constrained method in --methods.")
+        runs = [
+            benchmarks.warm_start_benchmark(size, backend, options['changed_share'],
+                                            repeat=options['repeat'], seed=options['seed'])
+            for backend in backends
+            for size in options['sizes']
+        ]
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'warm_start': runs}, output_file, indent=2)
+        for run in runs:
+            self.stdout.write(f"{run['backend']} @ {run['size']} items: cold {run['cold']:.4f}s, "
+                              f"warm {run['warm']:.4f}s ({run['speedup']:.1f}x)")
+
+    def storage(self, options):
+        runs = [benchmarks.storage_benchmark(size, runs=options['repeat'], seed=options['seed'])
+                for size in options['sizes']]
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'storage': runs}, output_file, indent=2)
+        for run in runs:
+            rows, packed = run['rows'], run['packed']
+            size = ''
+            if rows['bytes_per_run'] is not None:
+                size = (f", {rows['bytes_per_run'] / 1024:.1f} -> {packed['bytes_per_run'] / 1024:.1f} kB/run "
+                        f"({run['size_ratio']:.1f}x smaller)")
+            self.stdout.write(f"{run['size']} items: write {rows['write_seconds']:.4f}s -> "
+                              f"{packed['write_seconds']:.4f}s ({run['write_speedup']:.1f}x){size}")
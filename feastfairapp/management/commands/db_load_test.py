@@ -0,0 +1,66 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from feastfairapp import dbload, workers
+
+
+class Command(BaseCommand):
+    help = ("Measure optimize and results throughput with several worker processes writing to the "
+            "database at once, with SQLite's defaults (baseline) and with the tuned settings.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(dbload.MODES),
+                            help=f"Comma-separated modes out of {', '.join(dbload.MODES)} (default: all).")
+        parser.add_argument('--processes', type=int, default=4,
+                            help="Worker processes sending requests at once (default 4).")
+        parser.add_argument('--seconds', type=float, default=10, help="Duration of each mode (default 10).")
+        parser.add_argument('--items', type=int, default=50, help="Menu items per optimize request (default 50).")
+        parser.add_argument('--write-share', type=float, default=0.5,
+                            help="Fraction of requests that optimize and save (default 0.5).")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(dbload.MODES)
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(sorted(unknown))}.")
+        if options['processes'] < 1 or options['seconds'] <= 0:
+            raise CommandError("--processes and --seconds must be positive.")
+        if not 0 <= options['write_share'] <= 1:
+            raise CommandError("--write-share must be between 0 and 1.")
+
+        outlet, result_id, rows = dbload.create_outlet(options['items'], options['seed'])
+        previous_journal_mode = None
+        try:
+            for mode in modes:
+                journal_mode = dbload.set_journal_mode(dbload.journal_mode(mode))
+                previous_journal_mode = previous_journal_mode or journal_mode
+                summary = self.run_mode(mode, outlet.pk, result_id, rows, options)
+                for endpoint, stats in summary.items():
+                    self.stdout.write(
+                        f"{mode:<8} {endpoint:<8} {stats['per_second']:8.1f} req/s  "
+                        f"p50 {stats['p50'] * 1000:7.1f}ms  p95 {stats['p95'] * 1000:7.1f}ms  "
+                        f"{stats['requests']} ok, {stats['errors']} error(s)"
+                    )
+        finally:
+            dbload.delete_outlet(outlet)
+            if previous_journal_mode:
+                dbload.set_journal_mode(previous_journal_mode)
+
+    def run_mode(self, mode, outlet_id, result_id, rows, options):
+        # Pool processes open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=options['processes'], mp_context=context,
+                                 initializer=workers.init_process_with_environ,
+                                 initargs=(dbload.MODES[mode],)) as pool:
+            futures = [
+                pool.submit(workers.run_database_load, outlet_id, result_id, rows, options['seconds'],
+                            options['write_share'], options['seed'] + process)
+                for process in range(options['processes'])
+            ]
+            process_stats = [future.result() for future in futures]
+        return dbload.summarize(process_stats, options['seconds'])
@@ -0,0 +1,67 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from feastfairapp import exports
+from feastfairapp.models import OptimizationResult, Outlet
+
+
+def iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}'; use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = ("Export optimized prices from saved runs as CSV or Parquet, streaming rows from the "
+            "database so memory use does not grow with the export size.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-',
+                            help="File to write (default: CSV to stdout). A .parquet name selects Parquet.")
+        parser.add_argument('--format', choices=exports.FORMATS,
+                            help="Output format (default: from the --output extension, else CSV).")
+        parser.add_argument('--outlet', type=int, action='append',
+                            help="Only export this outlet id; repeat for several outlets.")
+        parser.add_argument('--restaurant', type=int, help="Only export the outlets of this restaurant id.")
+        parser.add_argument('--start', type=iso_date, help="First day to include (YYYY-MM-DD).")
+        parser.add_argument('--end', type=iso_date, help="Last day to include (YYYY-MM-DD).")
+        parser.add_argument('--result', type=int, help="Only export this optimization id.")
+        parser.add_argument('--chunk-size', type=int,
+                            help="Rows per database round trip (default PRICEWISE_EXPORT_CHUNK_SIZE).")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['format'] or ('parquet' if output.endswith('.parquet') else 'csv')
+        if file_format == 'parquet' and output == '-':
+            raise CommandError("Parquet output needs a file name in --output.")
+
+        outlets = None
+        if options['outlet'] or options['restaurant'] is not None:
+            outlets = Outlet.objects.all()
+            if options['outlet']:
+                outlets = outlets.filter(pk__in=options['outlet'])
+            if options['restaurant'] is not None:
+                outlets = outlets.filter(restaurant_id=options['restaurant'])
+        optimization = None
+        if options['result'] is not None:
+            optimization = OptimizationResult.objects.filter(pk=options['result']).first()
+            if optimization is None:
+                raise CommandError(f"No optimization with id {options['result']}.")
+
+        rows = exports.export_rows(outlets=outlets, start=options['start'], end=options['end'],
+                                   optimization=optimization)
+        try:
+            if file_format == 'parquet':
+                count = exports.write_parquet(rows, output, chunk_size=options['chunk_size'])
+            elif output == '-':
+                self.stdout.ending = ''
+                count = exports.write_csv(rows, self.stdout, chunk_size=options['chunk_size'])
+            else:
+                with open(output, 'w', newline='', encoding='utf-8') as csv_file:
+                    count = exports.write_csv(rows, csv_file, chunk_size=options['chunk_size'])
+        except (OSError, exports.ExportError) as exc:
+            raise CommandError(str(exc))
+
+        self.stderr.write(f"Exported {count} row(s) as {file_format}.")
@@ -0,0 +1,86 @@
+import importlib.util
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from feastfairapp import httpload
+
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+class Command(BaseCommand):
+    help = ("Load-test the home, menu, optimize and results pages over HTTP with concurrent virtual users, "
+            "against locally started WSGI and ASGI servers or a running one, and report throughput and "
+            "p50/p95/p99 latency per endpoint.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default=','.join(httpload.SERVERS),
+                            help=f"Comma-separated servers to start out of {', '.join(httpload.SERVERS)} "
+                                 f"(default: all).")
+        parser.add_argument('--url', help="Load-test the server already running at this URL instead.")
+        parser.add_argument('--concurrency', type=int_list, default=[1, 8, 32],
+                            help="Comma-separated numbers of virtual users, one run each (default 1,8,32).")
+        parser.add_argument('--seconds', type=float, default=10, help="Duration of each run (default 10).")
+        parser.add_argument('--endpoints', default=','.join(httpload.ENDPOINTS),
+                            help=f"Comma-separated endpoints out of {', '.join(httpload.ENDPOINTS)} (default: all).")
+        parser.add_argument('--workers', type=int, default=2, help="Server worker processes (default 2).")
+        parser.add_argument('--threads', type=int, default=4, help="Threads per WSGI worker (default 4).")
+        parser.add_argument('--port', type=int, default=8765, help="Port the servers listen on (default 8765).")
+        parser.add_argument('--outlets', type=int, default=4, help="Seeded outlets (default 4).")
+        parser.add_argument('--items', type=int, default=200, help="Menu items per seeded outlet (default 200).")
+        parser.add_argument('--timeout', type=float, default=httpload.DEFAULT_TIMEOUT,
+                            help=f"Seconds before a request fails (default {httpload.DEFAULT_TIMEOUT}).")
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        servers = [server.strip() for server in options['servers'].split(',') if server.strip()]
+        unknown = set(servers) - set(httpload.SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown server(s): {', '.join(sorted(unknown))}.")
+        if 'asgi' in servers and not options['url'] and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("The asgi server needs uvicorn (pip install uvicorn).")
+        endpoints = [endpoint.strip() for endpoint in options['endpoints'].split(',') if endpoint.strip()]
+        unknown = set(endpoints) - set(httpload.ENDPOINTS)
+        if unknown or not endpoints:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown)) or 'none given'}.")
+        if not options['concurrency'] or min(options['concurrency']) < 1 or options['seconds'] <= 0:
+            raise CommandError("--concurrency and --seconds must be positive.")
+        if options['outlets'] < 1 or options['items'] < 1:
+            raise CommandError("--outlets and --items must be positive.")
+
+        restaurant, outlets = httpload.create_outlets(options['outlets'], options['items'], options['seed'])
+        # The servers open their own connections
+        connections.close_all()
+        runs = []
+        try:
+            if options['url']:
+                runs += self.run_server(options['url'], options['url'], outlets, endpoints, options)
+            else:
+                for kind in servers:
+                    with httpload.Server(kind, options['port'], options['workers'], options['threads']) as server:
+                        runs += self.run_server(kind, server.base_url, outlets, endpoints, options)
+        finally:
+            restaurant.delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'runs': runs}, output_file, indent=2)
+
+    def run_server(self, name, base_url, outlets, endpoints, options):
+        runs = []
+        for concurrency in options['concurrency']:
+            summary = httpload.run_load(base_url, outlets, concurrency, options['seconds'], endpoints,
+                                        seed=options['seed'], timeout=options['timeout'])
+            runs.append({'server': name, 'concurrency': concurrency, 'seconds': options['seconds'],
+                         'endpoints': summary})
+            for endpoint, stats in summary.items():
+                self.stdout.write(
+                    f"{name} x{concurrency:<4} {endpoint:<17} {stats['per_second']:8.1f} req/s  "
+                    f"p50 {stats['p50'] * 1000:7.1f}ms  p95 {stats['p95'] * 1000:7.1f}ms  "
+                    f"p99 {stats['p99'] * 1000:7.1f}ms  {stats['requests']} ok, {stats['errors']} error(s)"
+                )
+        return runs
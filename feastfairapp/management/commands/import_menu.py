@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from feastfairapp import importers
+from feastfairapp.models import Outlet
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSON Lines file of menu items into an outlet's menu, upserting by name."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=importers.FORMATS,
+                            help="File format (detected from the extension by default).")
+        parser.add_argument('--outlet', type=int, help="Outlet id to import into (default: the default outlet).")
+        parser.add_argument('--batch-size', type=int,
+                            help="Rows per bulk insert/update (default PRICEWISE_BULK_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        try:
+            outlet = Outlet.objects.get_or_default(options['outlet'])
+        except Outlet.DoesNotExist:
+            raise CommandError(f"No outlet with id {options['outlet']}.")
+        try:
+            file_format = options['format'] or importers.detect_format(options['path'])
+            with open(options['path'], 'rb') as binary_file:
+                report = importers.import_file(
+                    importers.open_text(binary_file),
+                    file_format,
+                    outlet,
+                    batch_size=options['batch_size'],
+                )
+        except (OSError, importers.MenuImportError) as exc:
+            raise CommandError(str(exc))
+
+        for line_number, message in report.errors:
+            self.stderr.write(f"Line {line_number}: {message}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"... and {report.error_count - len(report.errors)} more error(s).")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.imported} item(s) into {outlet}: {report.created} created, {report.updated} updated, "
+            f"{report.error_count} row(s) rejected."
+        ))
@@ -0,0 +1,65 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Exists, OuterRef
+
+from feastfairapp import engine, workers
+from feastfairapp.models import MenuItem, Outlet
+
+
+class Command(BaseCommand):
+    help = ("Optimize the menu of every outlet (or every outlet of one restaurant), "
+            "spreading outlets over a pool of worker processes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=list(engine.METHOD_LABELS), default=engine.DEFAULT_METHOD)
+        parser.add_argument('--restaurant', type=int, help="Only optimize the outlets of this restaurant id.")
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help="Number of worker processes (1 runs in this process).")
+
+    def handle(self, *args, **options):
+        outlets = Outlet.objects.order_by('pk')
+        if options['restaurant'] is not None:
+            outlets = outlets.filter(restaurant_id=options['restaurant'])
+        has_items = Exists(MenuItem.objects.filter(outlet=OuterRef('pk')))
+        outlet_ids = list(outlets.filter(has_items).values_list('pk', flat=True))
+        if not outlet_ids:
+            raise CommandError("No outlet has any menu items to optimize.")
+
+        started = time.perf_counter()
+        failed = 0
+        if options['workers'] > 1 and len(outlet_ids) > 1:
+            # Pool processes open their own connections
+            connections.close_all()
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context,
+                                     initializer=workers.init_process) as pool:
+                futures = {
+                    pool.submit(workers.optimize_outlet, outlet_id, options['method'], {}): outlet_id
+                    for outlet_id in outlet_ids
+                }
+                for future in as_completed(futures):
+                    failed += not self.report(futures[future], future.result)
+        else:
+            for outlet_id in outlet_ids:
+                failed += not self.report(outlet_id, partial(workers.optimize_outlet, outlet_id, options['method'], {}))
+
+        elapsed = time.perf_counter() - started
+        summary = f"Optimized {len(outlet_ids) - failed} of {len(outlet_ids)} outlet(s) in {elapsed:.2f}s."
+        if failed:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def report(self, outlet_id, outcome):
+        """Print one outlet's outcome; ``outcome`` returns it or raises."""
+        try:
+            result_id, items, seconds = outcome()
+        except Exception as exc:
+            self.stderr.write(f"Outlet #{outlet_id} failed: {exc}")
+            return False
+        self.stdout.write(f"Outlet #{outlet_id}: {items} item(s) in {seconds:.3f}s -> optimization #{result_id}")
+        return True
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from feastfairapp import analytics
+from feastfairapp.models import Outlet
+
+
+def iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}'; use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = ("Recompute the daily and per-item analytics rollups from the saved optimization runs, "
+            "e.g. to backfill history recorded before the rollups existed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--outlet', type=int, help="Only rebuild this outlet id.")
+        parser.add_argument('--day', type=iso_date, help="Only rebuild this day (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        if options['outlet'] is not None and not Outlet.objects.filter(pk=options['outlet']).exists():
+            raise CommandError(f"No outlet with id {options['outlet']}.")
+        daily, items = analytics.rebuild(options['outlet'], options['day'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {daily} daily and {items} item rollup row(s)."))
@@ -0,0 +1,58 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from feastfairapp import jobs, workers
+
+
+class Command(BaseCommand):
+    help = "Claim queued optimization jobs and run them in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help="Number of worker processes.")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait between queue polls when idle.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is empty instead of polling forever.")
+
+    def handle(self, *args, **options):
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        running = {}
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context,
+                                 initializer=workers.init_process) as pool:
+            self.stdout.write(f"Worker started with {options['workers']} process(es).")
+            while True:
+                while len(running) < options['workers']:
+                    job = jobs.claim_next()
+                    if job is None:
+                        break
+                    self.stdout.write(f"Running job #{job.pk} ({job.method})")
+                    running[pool.submit(workers.run_job, job.pk)] = job.pk
+                # Don't hold the SQLite connection open while idle
+                connections.close_all()
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception as exc:
+                        # The pool process died before it could record the outcome
+                        jobs.mark_failed(job_id, f"Worker process crashed: {exc}")
+                        self.stderr.write(f"Job #{job_id} crashed: {exc}")
+                    else:
+                        self.stdout.write(f"Job #{job_id} {status}")
@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from feastfairapp import engine, scenarios
+from feastfairapp.engine import MenuArrays
+from feastfairapp.models import MenuItem, Outlet
+from feastfairapp.pipeline import method_config, optimize_arrays
+
+# Options of each kind of method, as job options take them
+CONSTRAINT_OPTIONS = ('capacity', 'ladder_step', 'max_average_change')
+MONTE_CARLO_OPTIONS = ('samples', 'demand_cv', 'elasticity_cv', 'percentile', 'seed')
+
+
+def multipliers(value):
+    try:
+        return [float(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise CommandError(f"Invalid multiplier list '{value}'; use e.g. 0.9,1,1.1")
+
+
+class Command(BaseCommand):
+    help = ("Optimize an outlet's menu, then evaluate every combination of cost, demand and elasticity "
+            "multipliers and store the scenario summaries on the result.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--outlet', type=int, help="Outlet id (default: the default outlet).")
+        parser.add_argument('--method', choices=list(engine.METHOD_LABELS), default=engine.DEFAULT_METHOD)
+        parser.add_argument('--cost', type=multipliers, default=[1.0],
+                            help="Comma-separated cost multipliers, e.g. 1,1.05,1.1,1.2")
+        parser.add_argument('--demand', type=multipliers, default=[1.0],
+                            help="Comma-separated estimated demand multipliers.")
+        parser.add_argument('--elasticity', type=multipliers, default=[1.0],
+                            help="Comma-separated price elasticity multipliers.")
+        parser.add_argument('--capacity', type=float, help="Kitchen capacity for constrained methods.")
+        parser.add_argument('--ladder-step', type=float, help="Size price step for constrained methods.")
+        parser.add_argument('--max-average-change', type=float,
+                            help="Max average price change for constrained methods.")
+        parser.add_argument('--samples', type=int, help="Demand samples for the Monte Carlo method.")
+        parser.add_argument('--demand-cv', type=float, help="Demand uncertainty (CV) for the Monte Carlo method.")
+        parser.add_argument('--elasticity-cv', type=float,
+                            help="Elasticity uncertainty (CV) for the Monte Carlo method.")
+        parser.add_argument('--percentile', type=float,
+                            help="Profit percentile the Monte Carlo method maximises (default: expected profit).")
+        parser.add_argument('--seed', type=int, help="Random seed for the Monte Carlo method.")
+        parser.add_argument('--workers', type=int, help="Process pool size for non closed-form methods.")
+
+    def handle(self, *args, **options):
+        method = options['method']
+        names = (CONSTRAINT_OPTIONS if method in engine.CONSTRAINED_METHODS
+                 else MONTE_CARLO_OPTIONS if method == engine.MONTE_CARLO else ())
+        method_options = {name: options[name] for name in names if options[name] is not None}
+        if options['samples'] is not None and options['samples'] < 1:
+            raise CommandError("--samples must be at least 1.")
+        if any(options[name] is not None and options[name] < 0 for name in ('demand_cv', 'elasticity_cv')):
+            raise CommandError("--demand-cv and --elasticity-cv can't be negative.")
+        if options['percentile'] is not None and not 0 < options['percentile'] < 100:
+            raise CommandError("--percentile must be between 0 and 100.")
+        try:
+            outlet = Outlet.objects.get_or_default(options['outlet'])
+        except Outlet.DoesNotExist:
+            raise CommandError(f"No outlet with id {options['outlet']}.")
+        menu = MenuArrays.from_queryset(MenuItem.objects.filter(outlet=outlet))
+        try:
+            optimization = optimize_arrays(outlet, menu, method, options=method_options)
+        except engine.OptimizationError as exc:
+            raise CommandError(str(exc))
+
+        grid = scenarios.scenario_grid(options['cost'], options['demand'], options['elasticity'])
+        started = time.perf_counter()
+        try:
+            summaries = scenarios.sweep(
+                menu, grid, method,
+                constraints=method_config(method, method_options),
+                max_workers=options['workers'],
+            )
+        except engine.OptimizationError as exc:
+            raise CommandError(f"A scenario could not be solved: {exc}")
+        elapsed = time.perf_counter() - started
+        scenarios.save_scenarios(optimization, grid, summaries)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Evaluated {len(grid)} scenario(s) over {len(menu)} item(s) in {elapsed:.2f}s; "
+            f"saved on optimization #{optimization.pk}."
+        ))
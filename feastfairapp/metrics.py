@@ -0,0 +1,312 @@
+# optimizer/metrics.py
+
+"""
+Stage timings and Prometheus metrics for optimization runs.
+
+A StageRecorder times named stages of one run (an optimization, a results
+page, ...) and records wall time, the number of database queries and the
+number of items handled in each. The timings are saved with the run and,
+when the run is done, folded into histograms kept in a small SQLite file
+(PRICEWISE_METRICS_DB). Every gunicorn worker and job worker process on
+the host writes to the same file, so ``/metrics`` reports totals across
+processes instead of only the process that serves the scrape.
+
+Runs are not written one by one: each process sums its observations in
+memory and writes them in one transaction once it holds
+PRICEWISE_METRICS_FLUSH_OBSERVATIONS of them, PRICEWISE_METRICS_FLUSH_SECONDS
+after the first one, when it serves a scrape, or when it exits. Other
+processes' latest runs may therefore show up a few seconds late.
+
+``profiled`` wraps a single run in cProfile when asked to and saves the
+stats under PRICEWISE_PROFILE_DIR.
+"""
+
+import atexit
+import cProfile
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_DB = os.path.join(tempfile.gettempdir(), 'pricewise-metrics.sqlite3')
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'pricewise-profiles')
+DEFAULT_FLUSH_SECONDS = 5
+DEFAULT_FLUSH_OBSERVATIONS = 1000
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'pricewise_stage_seconds': ('histogram', 'Wall time of each stage of a run.', SECONDS_BUCKETS),
+    'pricewise_stage_queries': ('histogram', 'Database queries issued by each stage of a run.', QUERY_BUCKETS),
+    'pricewise_stage_items_total': ('counter', 'Menu items handled by each stage.', None),
+    'pricewise_runs_total': ('counter', 'Completed runs.', None),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    upper REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (name, labels, upper)
+);
+CREATE TABLE IF NOT EXISTS series (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+
+def format_labels(labels):
+    return ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """Histograms and counters persisted in a SQLite file shared by processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+        # Observations not written yet: (name, labels, upper) -> count, (name, labels) -> [count, total]
+        self._buckets = {}
+        self._series = {}
+        self._pending = 0
+        self._timer = None
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        if not self._ready:
+            with self._lock:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(SCHEMA)
+                self._ready = True
+        return db
+
+    def record(self, observations):
+        """Add (name, labels, value) observations; they are written in batches (see ``flush``)."""
+        with self._lock:
+            for name, labels, value in observations:
+                kind, _, buckets = METRICS[name]
+                key = format_labels(labels)
+                if kind == 'histogram':
+                    upper = next((bound for bound in buckets if value <= bound), math.inf)
+                    self._buckets[name, key, upper] = self._buckets.get((name, key, upper), 0) + 1
+                series = self._series.setdefault((name, key), [0, 0.0])
+                series[0] += 1
+                series[1] += value
+                self._pending += 1
+            seconds = getattr(settings, 'PRICEWISE_METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+            due = (self._pending >= getattr(settings, 'PRICEWISE_METRICS_FLUSH_OBSERVATIONS',
+                                            DEFAULT_FLUSH_OBSERVATIONS) or seconds <= 0)
+            if not due and self._timer is None:
+                self._timer = threading.Timer(seconds, self.flush_quietly)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending observations in one transaction."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            buckets, series = self._buckets, self._series
+            self._buckets, self._series, self._pending = {}, {}, 0
+        if not series:
+            return
+
+        try:
+            db = self.connect()
+            try:
+                db.execute('BEGIN IMMEDIATE')
+                db.executemany(
+                    'INSERT INTO bucket (name, labels, upper, count) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (name, labels, upper) DO UPDATE SET count = count + excluded.count',
+                    [(*key, count) for key, count in buckets.items()],
+                )
+                db.executemany(
+                    'INSERT INTO series (name, labels, count, total) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET count = count + excluded.count, '
+                    'total = total + excluded.total',
+                    [(*key, count, total) for key, (count, total) in series.items()],
+                )
+                db.execute('COMMIT')
+            finally:
+                db.close()
+        except sqlite3.Error:
+            # Keep the observations for the next attempt
+            with self._lock:
+                for key, count in buckets.items():
+                    self._buckets[key] = self._buckets.get(key, 0) + count
+                for key, (count, total) in series.items():
+                    pending = self._series.setdefault(key, [0, 0.0])
+                    pending[0] += count
+                    pending[1] += total
+                    self._pending += count
+            raise
+
+    def flush_quietly(self):
+        try:
+            self.flush()
+        except sqlite3.Error:
+            logger.warning("Could not write metrics to %s", self.path, exc_info=True)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        self.flush_quietly()
+        db = self.connect()
+        try:
+            buckets = {}
+            for name, labels, upper, count in db.execute('SELECT name, labels, upper, count FROM bucket'):
+                buckets.setdefault((name, labels), {})[upper] = count
+            series = {}
+            for name, labels, count, total in db.execute('SELECT name, labels, count, total FROM series'):
+                series.setdefault(name, []).append((labels, count, total))
+        finally:
+            db.close()
+
+        lines = []
+        for name, (kind, help_text, bounds) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, count, total in sorted(series.get(name, [])):
+                prefix = f'{labels},' if labels else ''
+                if kind == 'histogram':
+                    counts = buckets.get((name, labels), {})
+                    cumulative = 0
+                    for bound in bounds + (math.inf,):
+                        cumulative += counts.get(bound, 0)
+                        lines.append(f'{name}_bucket{{{prefix}le="{format_value(bound)}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{labels}}} {format_value(total)}')
+                    lines.append(f'{name}_count{{{labels}}} {count}')
+                else:
+                    lines.append(f'{name}{{{labels}}} {format_value(total)}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._buckets, self._series, self._pending = {}, {}, 0
+        db = self.connect()
+        try:
+            db.execute('DELETE FROM bucket')
+            db.execute('DELETE FROM series')
+        finally:
+            db.close()
+
+
+_registries = {}
+
+
+def registry():
+    """The registry for the configured PRICEWISE_METRICS_DB path."""
+    path = getattr(settings, 'PRICEWISE_METRICS_DB', DEFAULT_METRICS_DB)
+    if path not in _registries:
+        _registries[path] = MetricsRegistry(path)
+        atexit.register(_registries[path].flush_quietly)
+    return _registries[path]
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class StageRecorder:
+    """Times the stages of one run.
+
+    ``timings`` maps each stage to its seconds, queries and items; it is
+    JSON-serialisable so it can be stored with the run.
+    """
+
+    def __init__(self, run):
+        self.run = run
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name, items=None):
+        """Time a block; set ``['items']`` on the yielded dict if only known inside it."""
+        timing = {'seconds': 0.0, 'queries': 0, 'items': items}
+        queries = QueryCounter()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                yield timing
+        finally:
+            timing['seconds'] = round(time.perf_counter() - started, 6)
+            timing['queries'] = queries.count
+            self.timings[name] = timing
+
+    @property
+    def total_seconds(self):
+        return sum(timing['seconds'] for timing in self.timings.values())
+
+    def observations(self):
+        for name, timing in self.timings.items():
+            labels = {'run': self.run, 'stage': name}
+            yield 'pricewise_stage_seconds', labels, timing['seconds']
+            yield 'pricewise_stage_queries', labels, timing['queries']
+            if timing['items'] is not None:
+                yield 'pricewise_stage_items_total', labels, timing['items']
+        yield 'pricewise_runs_total', {'run': self.run}, 1
+
+    def flush(self):
+        """Add this run to the shared histograms; never fails the run itself.
+
+        The run is buffered with others and reaches the shared file later,
+        see MetricsRegistry.flush.
+        """
+        try:
+            registry().record(list(self.observations()))
+        except sqlite3.Error:
+            logger.warning("Could not record %s metrics", self.run, exc_info=True)
+
+
+@contextmanager
+def profiled(enabled, label):
+    """Run the block under cProfile when ``enabled`` and save the stats.
+
+    Stats go to PRICEWISE_PROFILE_DIR/<label>-<timestamp>.prof and can be
+    read with ``python -m pstats`` or snakeviz.
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        directory = getattr(settings, 'PRICEWISE_PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        logger.info("Saved profile of %s to %s", label, path)
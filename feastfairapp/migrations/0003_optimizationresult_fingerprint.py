@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0002_optimizationjob'),
+    ]
+
+    operations = [
+        # Results saved before the method column had a default hold NULL,
+        # which SQLite's table rebuild below would reject.
+        migrations.RunSQL(
+            "UPDATE feastfairapp_optimizationresult SET method = 'Simplex' WHERE method IS NULL",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='optimizationresult',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
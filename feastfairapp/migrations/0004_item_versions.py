@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0003_optimizationresult_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='optimizedmenuitem',
+            name='item_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='optimizedmenuitem',
+            name='menu_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='optimized_items', to='feastfairapp.menuitem'),
+        ),
+    ]
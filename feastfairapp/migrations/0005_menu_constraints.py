@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0004_item_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='category',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='current_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='size_rank',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='options',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0005_menu_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScenarioResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost_multiplier', models.DecimalField(decimal_places=3, max_digits=6)),
+                ('demand_multiplier', models.DecimalField(decimal_places=3, max_digits=6)),
+                ('elasticity_multiplier', models.DecimalField(decimal_places=3, max_digits=6)),
+                ('total_profit', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('total_demand', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('average_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('optimization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scenarios', to='feastfairapp.optimizationresult')),
+            ],
+            options={
+                'ordering': ['cost_multiplier', 'demand_multiplier', 'elasticity_multiplier'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0006_scenarioresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemRiskProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_profit', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('profit_std', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('profit_p10', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('profit_p50', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('profit_p90', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('loss_probability', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('optimized_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='risk', to='feastfairapp.optimizedmenuitem')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0007_itemriskprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='demand_model',
+            field=models.CharField(choices=[('linear', 'Linear'), ('constant_elasticity', 'Constant elasticity'), ('logit', 'Logit')], default='linear', max_length=30),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0008_menuitem_demand_model'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='optimizationresult',
+            name='total_profit',
+            field=models.DecimalField(decimal_places=2, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='optimizedmenuitem',
+            name='expected_demand',
+            field=models.DecimalField(decimal_places=2, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='optimizedmenuitem',
+            name='item_profit',
+            field=models.DecimalField(decimal_places=2, max_digits=14),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0009_widen_total_profit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='profile',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='optimizationresult',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
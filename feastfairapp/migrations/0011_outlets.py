@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0010_run_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Outlet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Restaurant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='outlet',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='menu_items', to='feastfairapp.outlet'),
+        ),
+        migrations.AddField(
+            model_name='optimizationjob',
+            name='outlet',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='feastfairapp.outlet'),
+        ),
+        migrations.AddField(
+            model_name='optimizationresult',
+            name='outlet',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='results', to='feastfairapp.outlet'),
+        ),
+        migrations.AddField(
+            model_name='outlet',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outlets', to='feastfairapp.restaurant'),
+        ),
+        migrations.AddConstraint(
+            model_name='outlet',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'name'), name='unique_outlet_per_restaurant'),
+        ),
+    ]
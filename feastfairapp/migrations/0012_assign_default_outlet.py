@@ -0,0 +1,26 @@
+from django.db import migrations
+
+MODELS = ['MenuItem', 'OptimizationResult', 'OptimizationJob']
+
+
+def assign_default_outlet(apps, schema_editor):
+    """Put everything that existed before outlets into one default outlet."""
+    if not any(apps.get_model('feastfairapp', name).objects.exists() for name in MODELS):
+        return
+    Restaurant = apps.get_model('feastfairapp', 'Restaurant')
+    Outlet = apps.get_model('feastfairapp', 'Outlet')
+    restaurant, _ = Restaurant.objects.get_or_create(name='My Restaurant')
+    outlet, _ = Outlet.objects.get_or_create(restaurant=restaurant, name='Main')
+    for name in MODELS:
+        apps.get_model('feastfairapp', name).objects.filter(outlet__isnull=True).update(outlet=outlet)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0011_outlets'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_default_outlet, migrations.RunPython.noop),
+    ]
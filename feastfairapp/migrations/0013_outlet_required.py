@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0012_assign_default_outlet'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='menuitem',
+            name='outlet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='menu_items', to='feastfairapp.outlet'),
+        ),
+        migrations.AlterField(
+            model_name='optimizationjob',
+            name='outlet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='feastfairapp.outlet'),
+        ),
+        migrations.AlterField(
+            model_name='optimizationresult',
+            name='outlet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='results', to='feastfairapp.outlet'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['outlet', 'name'], name='menuitem_outlet_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optimizationresult',
+            index=models.Index(fields=['outlet', 'date_created'], name='result_outlet_created_idx'),
+        ),
+    ]
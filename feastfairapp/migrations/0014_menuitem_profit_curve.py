@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0013_outlet_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='curve_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='profit_curve',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0014_menuitem_profit_curve'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProfit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('total_profit', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('best_profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ItemDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('day', models.DateField()),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('demand_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('profit_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='optimizedmenuitem',
+            index=models.Index(fields=['name', 'optimization'], name='optitem_name_run_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyprofit',
+            name='outlet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_profits', to='feastfairapp.outlet'),
+        ),
+        migrations.AddField(
+            model_name='itemdailystats',
+            name='outlet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='item_daily_stats', to='feastfairapp.outlet'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyprofit',
+            constraint=models.UniqueConstraint(fields=('outlet', 'day'), name='unique_daily_profit'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemdailystats',
+            constraint=models.UniqueConstraint(fields=('outlet', 'name', 'day'), name='unique_item_daily_stats'),
+        ),
+    ]
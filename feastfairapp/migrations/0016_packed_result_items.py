@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0015_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackedResultItems',
+            fields=[
+                ('optimization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='packed_items', serialize=False, to='feastfairapp.optimizationresult')),
+                ('item_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='optimizationresult',
+            name='item_storage',
+            field=models.CharField(choices=[('rows', 'One row per item'), ('packed', 'Packed blob')], default='rows', editable=False, max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feastfairapp', '0016_packed_result_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optimizationresult',
+            name='engine_version',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+    ]
@@ -2,45 +2,267 @@
 
 from django.db import models
 
+from . import demand
+
+# Used when no outlet has been chosen, e.g. a single-restaurant install
+DEFAULT_RESTAURANT = 'My Restaurant'
+DEFAULT_OUTLET = 'Main'
+
+class Restaurant(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    
+    def __str__(self):
+        return self.name
+
+class OutletManager(models.Manager):
+    def default(self):
+        """The outlet used when none is selected, created on first use."""
+        restaurant, _ = Restaurant.objects.get_or_create(name=DEFAULT_RESTAURANT)
+        outlet, _ = self.get_or_create(restaurant=restaurant, name=DEFAULT_OUTLET)
+        return outlet
+
+    async def adefault(self):
+        restaurant, _ = await Restaurant.objects.aget_or_create(name=DEFAULT_RESTAURANT)
+        outlet, _ = await self.aget_or_create(restaurant=restaurant, name=DEFAULT_OUTLET)
+        return outlet
+    
+    def get_or_default(self, pk=None):
+        """The outlet with ``pk``, or the default outlet when ``pk`` is None."""
+        return self.default() if pk is None else self.select_related('restaurant').get(pk=pk)
+
+class Outlet(models.Model):
+    """One location of a restaurant. Menus, results and jobs belong to an outlet."""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='outlets')
+    name = models.CharField(max_length=100)
+    
+    objects = OutletManager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'name'], name='unique_outlet_per_restaurant'),
+        ]
+    
+    def __str__(self):
+        return f"{self.restaurant.name} / {self.name}"
+
 class MenuItem(models.Model):
+    # Indexed through (outlet, name) below
+    outlet = models.ForeignKey(Outlet, on_delete=models.CASCADE, related_name='menu_items', db_index=False)
     name = models.CharField(max_length=100)
     cost = models.DecimalField(max_digits=10, decimal_places=2)  # Cost to produce
     min_price = models.DecimalField(max_digits=10, decimal_places=2)  # Minimum acceptable price
     max_price = models.DecimalField(max_digits=10, decimal_places=2)  # Maximum acceptable price
     estimated_demand = models.IntegerField()  # Estimated demand at minimum price
     price_elasticity = models.DecimalField(max_digits=5, decimal_places=2, default=1.0)  # How demand changes with price
+    category = models.CharField(max_length=50, blank=True)  # Items in a category form a size ladder
+    size_rank = models.PositiveSmallIntegerField(null=True, blank=True)  # Larger sizes must cost more
+    current_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # Price on the menu today
+    demand_model = models.CharField(max_length=30, choices=demand.choices(), default=demand.DEFAULT_MODEL)  # How demand responds to price
+    version = models.PositiveIntegerField(default=1, editable=False)  # Bumped on every change, marks items dirty
+    profit_curve = models.BinaryField(default=b'', editable=False)  # float32 demand and profit points, see curves.py
+    curve_version = models.PositiveIntegerField(default=0, editable=False)  # Version profit_curve was computed for
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['outlet', 'name'], name='menuitem_outlet_name_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        from . import curves
+        if self.pk is not None:
+            self.version += 1
+        self.profit_curve = curves.item_curve(self)
+        self.curve_version = self.version
+        super().save(*args, **kwargs)
+    
     def price_range(self):
         return float(self.max_price) - float(self.min_price)
     
+    def demand_params(self):
+        """This item's inputs for its demand model, converted once."""
+        return demand.DemandParams(
+            cost=float(self.cost),
+            min_price=float(self.min_price),
+            max_price=float(self.max_price),
+            base_demand=float(self.estimated_demand),
+            elasticity=float(self.price_elasticity),
+        )
+    
     def calculate_demand(self, price):
-        """Calculate demand at a given price based on elasticity"""
-        normalized_price = (float(price) - float(self.min_price)) / self.price_range() if self.price_range() > 0 else 0
-        demand = self.estimated_demand * (1 - float(self.price_elasticity) * normalized_price)
-        return max(0, demand)  # Ensure demand doesn't go negative
+        """Calculate demand at a given price with the item's demand model"""
+        return float(demand.get(self.demand_model).demand(float(price), self.demand_params()))
     
     def calculate_profit(self, price):
         """Calculate profit at a given price"""
-        demand = self.calculate_demand(price)
-        return (float(price) - float(self.cost)) * demand
+        return float(demand.get(self.demand_model).profit(float(price), self.demand_params()))
     
 class OptimizationResult(models.Model):
+    ROWS = 'rows'
+    PACKED = 'packed'
+    STORAGE_CHOICES = [
+        (ROWS, 'One row per item'),
+        (PACKED, 'Packed blob'),
+    ]
+
+    # Indexed through (outlet, date_created) below
+    outlet = models.ForeignKey(Outlet, on_delete=models.CASCADE, related_name='results', db_index=False)
     date_created = models.DateTimeField(auto_now_add=True)
-    total_profit = models.DecimalField(max_digits=10, decimal_places=2)
+    total_profit = models.DecimalField(max_digits=14, decimal_places=2)
     method = models.CharField(max_length=50, default="Simplex")  # Store the optimization method used
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)  # Hash of the menu snapshot and method
+    engine_version = models.CharField(max_length=20, blank=True, editable=False)  # engine.ENGINE_VERSION that solved it
+    timings = models.JSONField(default=dict, blank=True)  # Seconds, queries and items per pipeline stage
+    item_storage = models.CharField(max_length=10, choices=STORAGE_CHOICES, default=ROWS, editable=False)  # Where the items are, see packed.py
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['outlet', 'date_created'], name='result_outlet_created_idx'),
+        ]
     
     def __str__(self):
         return f"Optimization #{self.id} - {self.date_created.strftime('%Y-%m-%d %H:%M')}"
 
 class OptimizedMenuItem(models.Model):
     optimization = models.ForeignKey(OptimizationResult, on_delete=models.CASCADE, related_name='menu_items')
+    menu_item = models.ForeignKey(MenuItem, null=True, blank=True, on_delete=models.SET_NULL, related_name='optimized_items')
+    item_version = models.PositiveIntegerField(null=True, blank=True)  # MenuItem.version this row was solved for
     name = models.CharField(max_length=100)
     optimized_price = models.DecimalField(max_digits=10, decimal_places=2)
-    expected_demand = models.DecimalField(max_digits=10, decimal_places=2)  # Changed to decimal for precision
-    item_profit = models.DecimalField(max_digits=10, decimal_places=2)
+    expected_demand = models.DecimalField(max_digits=14, decimal_places=2)  # Changed to decimal for precision
+    item_profit = models.DecimalField(max_digits=14, decimal_places=2)
+    
+    class Meta:
+        indexes = [
+            # Per-item history across runs
+            models.Index(fields=['name', 'optimization'], name='optitem_name_run_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} - ₹{self.optimized_price}"
+
+class PackedResultItems(models.Model):
+    """All optimized items of a packed run in one blob; see packed.py."""
+    optimization = models.OneToOneField(OptimizationResult, on_delete=models.CASCADE, primary_key=True,
+                                        related_name='packed_items')
+    item_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    def __str__(self):
+        return f"{self.item_count} packed item(s) of optimization #{self.optimization_id}"
+
+class DailyProfit(models.Model):
+    """Per-outlet, per-day rollup of optimization runs, maintained by analytics.py."""
+    # Indexed through the (outlet, day) constraint below
+    outlet = models.ForeignKey(Outlet, on_delete=models.CASCADE, related_name='daily_profits', db_index=False)
+    day = models.DateField()
+    runs = models.PositiveIntegerField(default=0)
+    total_profit = models.DecimalField(max_digits=18, decimal_places=2, default=0)  # Sum over the day's runs
+    best_profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Highest run total of the day
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'day'], name='unique_daily_profit'),
+        ]
+    
+    def __str__(self):
+        return f"{self.outlet_id} {self.day}: {self.runs} run(s)"
+
+class ItemDailyStats(models.Model):
+    """Per-outlet, per-item, per-day sums over optimization runs, maintained by analytics.py."""
+    # Indexed through the (outlet, name, day) constraint below
+    outlet = models.ForeignKey(Outlet, on_delete=models.CASCADE, related_name='item_daily_stats', db_index=False)
+    name = models.CharField(max_length=100)
+    day = models.DateField()
+    runs = models.PositiveIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    demand_sum = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    profit_sum = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'name', 'day'], name='unique_item_daily_stats'),
+        ]
     
     def __str__(self):
-        return f"{self.name} - ₹{self.optimized_price}"
\ No newline at end of file
+        return f"{self.name} {self.day}: {self.runs} run(s)"
+
+class ItemRiskProfile(models.Model):
+    """Profit distribution of an optimized item under demand uncertainty."""
+    optimized_item = models.OneToOneField(OptimizedMenuItem, on_delete=models.CASCADE, related_name='risk')
+    expected_profit = models.DecimalField(max_digits=12, decimal_places=2)
+    profit_std = models.DecimalField(max_digits=12, decimal_places=2)
+    profit_p10 = models.DecimalField(max_digits=12, decimal_places=2)
+    profit_p50 = models.DecimalField(max_digits=12, decimal_places=2)
+    profit_p90 = models.DecimalField(max_digits=12, decimal_places=2)
+    loss_probability = models.DecimalField(max_digits=5, decimal_places=4)  # Share of samples with negative profit
+
+    def __str__(self):
+        return f"Risk for {self.optimized_item.name}"
+
+class ScenarioResult(models.Model):
+    """Summary of the optimal menu under one what-if scenario."""
+    optimization = models.ForeignKey(OptimizationResult, on_delete=models.CASCADE, related_name='scenarios')
+    cost_multiplier = models.DecimalField(max_digits=6, decimal_places=3)
+    demand_multiplier = models.DecimalField(max_digits=6, decimal_places=3)
+    elasticity_multiplier = models.DecimalField(max_digits=6, decimal_places=3)
+    total_profit = models.DecimalField(max_digits=14, decimal_places=2)
+    total_demand = models.DecimalField(max_digits=14, decimal_places=2)
+    average_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['cost_multiplier', 'demand_multiplier', 'elasticity_multiplier']
+
+    def __str__(self):
+        return (f"Scenario cost x{self.cost_multiplier}, demand x{self.demand_multiplier}, "
+                f"elasticity x{self.elasticity_multiplier}")
+
+    @property
+    def profit_change_percent(self):
+        """Change in total profit relative to the parent optimization."""
+        base = self.optimization.total_profit
+        return (self.total_profit - base) / base * 100 if base else None
+
+
+class OptimizationJob(models.Model):
+    """An optimization run queued for the background worker."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    outlet = models.ForeignKey(Outlet, on_delete=models.CASCADE, related_name='jobs')  # Whose menu to optimize
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    method = models.CharField(max_length=50)  # Engine method key, e.g. "closed_form"
+    options = models.JSONField(default=dict, blank=True)  # Method options such as constraint limits
+    profile = models.BooleanField(default=False)  # Save a cProfile of the run (see metrics.profiled)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.ForeignKey(OptimizationResult, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Job #{self.id} ({self.status})"
+
+    @property
+    def queue_seconds(self):
+        """Time spent waiting for a worker."""
+        if self.started_at is None:
+            return None
+        return (self.started_at - self.created_at).total_seconds()
+
+    @property
+    def run_seconds(self):
+        """Time spent solving and saving."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
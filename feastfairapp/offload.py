@@ -0,0 +1,93 @@
+# optimizer/offload.py
+
+"""
+Bounded offloading of CPU-bound work from async views.
+
+Async views must not block their event loop, so work such as building a
+menu's arrays or fingerprinting it runs in a process-wide pool of
+PRICEWISE_ASYNC_WORKERS threads (``run``). NumPy releases the GIL for
+most array work, so the threads do overlap. Functions run here must not
+use the database; async views fetch their rows with the async ORM first.
+
+One large menu must not starve other requests, so work on menus of more
+than PRICEWISE_ASYNC_LARGE_MENU items first takes one of
+PRICEWISE_ASYNC_LARGE_SLOTS slots. Large menus then queue behind each
+other, and the remaining threads stay free for small ones. A request that
+waits more than PRICEWISE_ASYNC_WAIT_SECONDS for a slot gets ``Busy``,
+which views answer with 503 and Retry-After.
+
+Slots belong to an event loop. Under uvicorn that loop is the whole
+worker process. Under WSGI each async request runs in a loop of its own,
+and the worker's threads bound concurrency instead.
+"""
+
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+DEFAULT_WORKERS = 4
+DEFAULT_LARGE_MENU = 5000
+DEFAULT_LARGE_SLOTS = 1
+DEFAULT_WAIT_SECONDS = 10
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Event loop -> asyncio.Semaphore of its large-menu slots
+_large_slots = weakref.WeakKeyDictionary()
+
+
+class Busy(Exception):
+    """No large-menu slot came free in time."""
+
+    def __init__(self, seconds):
+        super().__init__(f"No slot for a large menu came free within {seconds:g}s.")
+        self.seconds = seconds
+
+
+def large_menu():
+    return getattr(settings, 'PRICEWISE_ASYNC_LARGE_MENU', DEFAULT_LARGE_MENU)
+
+
+def wait_seconds():
+    return getattr(settings, 'PRICEWISE_ASYNC_WAIT_SECONDS', DEFAULT_WAIT_SECONDS)
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PRICEWISE_ASYNC_WORKERS', DEFAULT_WORKERS),
+                thread_name_prefix='pricewise-offload',
+            )
+    return _executor
+
+
+def large_slots():
+    loop = asyncio.get_running_loop()
+    slots = _large_slots.get(loop)
+    if slots is None:
+        slots = _large_slots[loop] = asyncio.Semaphore(
+            getattr(settings, 'PRICEWISE_ASYNC_LARGE_SLOTS', DEFAULT_LARGE_SLOTS))
+    return slots
+
+
+async def run(function, *args, items=0):
+    """``function(*args)`` run in the pool; ``items`` is the size of the menu it works on."""
+    loop = asyncio.get_running_loop()
+    if items <= large_menu():
+        return await loop.run_in_executor(executor(), function, *args)
+
+    slots = large_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), wait_seconds())
+    except asyncio.TimeoutError:
+        raise Busy(wait_seconds()) from None
+    try:
+        return await loop.run_in_executor(executor(), function, *args)
+    finally:
+        slots.release()
@@ -0,0 +1,170 @@
+# optimizer/packed.py
+
+"""
+Packed storage of a run's optimized items.
+
+With PRICEWISE_RESULT_STORAGE=packed a run is saved as one
+PackedResultItems row instead of one OptimizedMenuItem row per item: the
+per-item vectors go into a single zlib-compressed blob laid out as
+
+    magic b'PWP1', uint32 item count,
+    int64[count]  menu item ids, as saved (deleting an item does not clear
+                  its id here, unlike OptimizedMenuItem.menu_item),
+    uint32[count] item versions (0 for none),
+    int64[count]  optimized prices, expected demand and item profit, each
+                  in hundredths, the precision the row fields keep,
+    the item names, UTF-8 and separated by NUL bytes.
+
+That saves the per-row overhead, the repeated names and the three row
+indexes, and writing a run is one INSERT. Monte Carlo runs keep row
+storage because their risk profiles are rows that point at the items.
+
+Code that reads items goes through ``load``/``PackedItems`` for packed
+runs: the results page, the admin, exports, the analytics rebuild, the
+API and incremental re-solves. ``StoredItem`` stands in for an
+OptimizedMenuItem where a model instance would be used.
+"""
+
+import struct
+import zlib
+from dataclasses import dataclass
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from .models import OptimizationResult, PackedResultItems
+
+MAGIC = b'PWP1'
+HEADER = struct.Struct('<4sI')
+
+# Fast: most of the size saving comes from the layout, not the compression level
+COMPRESSION_LEVEL = 1
+
+
+def storage_mode():
+    return getattr(settings, 'PRICEWISE_RESULT_STORAGE', OptimizationResult.ROWS)
+
+
+def hundredths(values):
+    """int64 hundredths of ``values``, rounded like ResultWriter rounds row values."""
+    return np.rint(np.array([round(value, 2) for value in values.tolist()]) * 100).astype('<i8')
+
+
+def pack(menu, solution):
+    """The blob for a solved menu."""
+    item_ids = menu.ids.astype('<i8')
+    names = '\0'.join(menu.names).encode()
+    payload = b''.join([
+        HEADER.pack(MAGIC, len(menu)),
+        item_ids.tobytes(),
+        menu.versions.astype('<u4').tobytes(),
+        hundredths(solution.prices).tobytes(),
+        hundredths(solution.demand).tobytes(),
+        hundredths(solution.profit).tobytes(),
+        names,
+    ])
+    return zlib.compress(payload, COMPRESSION_LEVEL)
+
+
+@dataclass
+class StoredItem:
+    """One optimized item of a packed run, with OptimizedMenuItem's attributes."""
+    pk: int  # Position in the run, from 1
+    optimization_id: int
+    menu_item_id: int
+    item_version: int
+    name: str
+    optimized_price: Decimal
+    expected_demand: Decimal
+    item_profit: Decimal
+
+    @property
+    def id(self):
+        return self.pk
+
+
+def money(values):
+    return [Decimal(value).scaleb(-2) for value in values.tolist()]
+
+
+@dataclass
+class PackedItems:
+    """The unpacked vectors of one run, in menu order."""
+    menu_item_ids: np.ndarray
+    item_versions: np.ndarray
+    names: list
+    price_hundredths: np.ndarray
+    demand_hundredths: np.ndarray
+    profit_hundredths: np.ndarray
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def unpack(cls, blob):
+        payload = zlib.decompress(blob)
+        magic, count = HEADER.unpack_from(payload)
+        if magic != MAGIC:
+            raise ValueError("Not a packed result blob.")
+        offset = HEADER.size
+
+        def take(dtype):
+            nonlocal offset
+            values = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+            offset += values.nbytes
+            return values
+
+        item_ids, versions = take('<i8'), take('<u4')
+        prices, demand, profit = take('<i8'), take('<i8'), take('<i8')
+        names = payload[offset:].decode().split('\0') if count else []
+        return cls(item_ids, versions, names, prices, demand, profit)
+
+    @property
+    def prices(self):
+        return self.price_hundredths / 100
+
+    @property
+    def demand(self):
+        return self.demand_hundredths / 100
+
+    @property
+    def profit(self):
+        return self.profit_hundredths / 100
+
+    def rows(self):
+        """(menu item id, item version, name, price, demand, profit) tuples, as the row fields hold them."""
+        versions = [version or None for version in self.item_versions.tolist()]
+        return zip(self.menu_item_ids.tolist(), versions, self.names, money(self.price_hundredths),
+                   money(self.demand_hundredths), money(self.profit_hundredths))
+
+    def items(self, optimization_id):
+        return [StoredItem(position, optimization_id, *row) for position, row in enumerate(self.rows(), start=1)]
+
+
+def load(optimization_id):
+    """PackedItems of a packed run, with one query."""
+    return PackedItems.unpack(PackedResultItems.objects.values_list('data', flat=True).get(pk=optimization_id))
+
+
+def save(optimization, menu, solution):
+    return PackedResultItems.objects.create(optimization=optimization, item_count=len(menu),
+                                            data=pack(menu, solution))
+
+
+def item_count(optimization):
+    if optimization.item_storage == OptimizationResult.PACKED:
+        return PackedResultItems.objects.values_list('item_count', flat=True).get(pk=optimization.pk)
+    return optimization.menu_items.count()
+
+
+def item_values(optimization):
+    """(name, price, demand, profit) floats per item, in menu order, for either storage."""
+    if optimization.item_storage == OptimizationResult.PACKED:
+        items = load(optimization.pk)
+        return list(zip(items.names, items.prices.tolist(), items.demand.tolist(), items.profit.tolist()))
+    return [
+        (name, float(price), float(item_demand), float(profit))
+        for name, price, item_demand, profit in optimization.menu_items.order_by('pk').values_list(
+            'name', 'optimized_price', 'expected_demand', 'item_profit')
+    ]
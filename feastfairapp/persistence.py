@@ -0,0 +1,128 @@
+# optimizer/persistence.py
+
+"""
+Writes optimization output to the database.
+
+All OptimizedMenuItem rows are built in memory and inserted with batched
+bulk_create inside one transaction, together with their OptimizationResult
+header, instead of one INSERT and autocommit per item. Monte Carlo
+solutions also get one ItemRiskProfile row per item. The analytics rollups
+are updated in the same transaction.
+
+With PRICEWISE_RESULT_STORAGE=packed the items are saved as one packed
+blob instead (see packed.py), except for runs with risk profiles.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+from . import analytics, engine, packed, tables
+from .models import ItemRiskProfile, OptimizationResult, OptimizedMenuItem
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class WriteStats:
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+
+class ResultWriter:
+    """Persists a Solution for a menu as one OptimizationResult."""
+
+    def __init__(self, batch_size=None, storage=None):
+        self.batch_size = batch_size or getattr(settings, 'PRICEWISE_BULK_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.storage = storage or packed.storage_mode()
+        self.last_stats = None
+
+    def build_rows(self, optimization, menu, solution):
+        return [
+            OptimizedMenuItem(
+                optimization=optimization,
+                menu_item_id=item_id,
+                item_version=version,
+                name=name,
+                optimized_price=round(price, 2),
+                expected_demand=round(demand, 2),
+                item_profit=round(profit, 2),
+            )
+            for item_id, version, name, price, demand, profit in zip(
+                menu.ids.tolist(),
+                menu.versions.tolist(),
+                menu.names,
+                solution.prices.tolist(),
+                solution.demand.tolist(),
+                solution.profit.tolist(),
+            )
+        ]
+
+    def build_risk_rows(self, rows, risk):
+        p10, p50, p90 = risk.percentiles.tolist()
+        return [
+            ItemRiskProfile(
+                optimized_item=row,
+                expected_profit=round(expected, 2),
+                profit_std=round(std, 2),
+                profit_p10=round(low, 2),
+                profit_p50=round(median, 2),
+                profit_p90=round(high, 2),
+                loss_probability=round(loss, 4),
+            )
+            for row, expected, std, low, median, high, loss in zip(
+                rows,
+                risk.expected_profit.tolist(),
+                risk.profit_std.tolist(),
+                p10,
+                p50,
+                p90,
+                risk.loss_probability.tolist(),
+            )
+        ]
+
+    def write(self, outlet, menu, solution, fingerprint=''):
+        """Insert the outlet's result header and all items atomically."""
+        started = time.perf_counter()
+        # Risk profiles are rows that point at item rows
+        storage = OptimizationResult.ROWS if solution.risk is not None else self.storage
+        with transaction.atomic():
+            optimization = OptimizationResult.objects.create(
+                outlet=outlet,
+                total_profit=round(solution.total_profit, 2),
+                method=solution.label,
+                fingerprint=fingerprint,
+                engine_version=engine.ENGINE_VERSION,
+                item_storage=storage,
+            )
+            if storage == OptimizationResult.PACKED:
+                packed.save(optimization, menu, solution)
+            else:
+                rows = self.build_rows(optimization, menu, solution)
+                OptimizedMenuItem.objects.bulk_create(rows, batch_size=self.batch_size)
+                if solution.risk is not None:
+                    # bulk_create has set the row pks on SQLite and PostgreSQL
+                    ItemRiskProfile.objects.bulk_create(self.build_risk_rows(rows, solution.risk),
+                                                        batch_size=self.batch_size)
+            analytics.record_run(optimization, menu, solution)
+        tables.bump_result(optimization.pk)
+
+        self.last_stats = WriteStats(rows=len(menu), seconds=time.perf_counter() - started)
+        logger.info(
+            "Saved optimization #%s: %d items (%s) in %.3fs (%.0f items/s)",
+            optimization.pk,
+            self.last_stats.rows,
+            storage,
+            self.last_stats.seconds,
+            self.last_stats.rows_per_second,
+        )
+        return optimization
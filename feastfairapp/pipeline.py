@@ -0,0 +1,96 @@
+# optimizer/pipeline.py
+
+"""
+End-to-end optimization of a menu: load, solve and persist.
+
+Shared by the background worker and anything else that needs to produce
+an OptimizationResult outside of a request.
+"""
+
+import logging
+import time
+
+from . import cache, engine, incremental, metrics, packed
+from .constrained import PricingConstraints
+from .engine import MenuArrays
+from .models import MenuItem, OptimizationResult, Outlet
+from .persistence import ResultWriter
+from .uncertainty import UncertaintySettings
+
+logger = logging.getLogger(__name__)
+
+
+def optimize_menu(outlet, method=engine.DEFAULT_METHOD, writer=None, options=None):
+    """Optimize the outlet's menu and save the result.
+
+    ``options`` holds the method's settings: the limits for the constrained
+    methods (see constrained.PricingConstraints) or the sampling settings
+    for Monte Carlo (see uncertainty.UncertaintySettings).
+
+    If the outlet's menu was already solved unchanged with the same method,
+    the existing OptimizationResult is returned and nothing is written.
+    Methods that price items independently only re-solve items changed
+    since the outlet's latest solution.
+
+    Each stage is timed; the timings are saved on the result and added to
+    the /metrics histograms.
+    """
+    recorder = metrics.StageRecorder('optimize')
+    with recorder.stage('load') as stage:
+        menu = MenuArrays.from_queryset(MenuItem.objects.filter(outlet=outlet))
+        stage['items'] = len(menu)
+    return optimize_arrays(outlet, menu, method, writer=writer, options=options, recorder=recorder)
+
+
+def method_config(method, options):
+    """Build the engine config for ``method`` from JSON job options."""
+    if method == engine.MONTE_CARLO:
+        return UncertaintySettings.from_options(options or {})
+    if method in engine.CONSTRAINED_METHODS:
+        return PricingConstraints.from_options(options or {})
+    return None
+
+
+def optimize_arrays(outlet, menu, method=engine.DEFAULT_METHOD, writer=None, options=None, recorder=None):
+    """Like optimize_menu, for an outlet's menu that is already loaded."""
+    if not len(menu):
+        raise engine.OptimizationError("Please add at least one menu item before optimizing.")
+    recorder = recorder or metrics.StageRecorder('optimize')
+
+    with recorder.stage('lookup'):
+        fingerprint = cache.menu_fingerprint(menu, method, options, outlet_id=outlet.pk)
+        cached_id = cache.lookup(fingerprint)
+        optimization = OptimizationResult.objects.filter(pk=cached_id).first() if cached_id is not None else None
+        if cached_id is not None and optimization is None:
+            cache.forget(fingerprint)
+    if optimization is not None:
+        recorder.flush()
+        return optimization
+
+    with recorder.stage('solve') as stage:
+        if method in engine.SEPARABLE_METHODS:
+            solution, resolved = incremental.optimize(menu, method, outlet_id=outlet.pk)
+        else:
+            solution, resolved = engine.optimize(menu, method, method_config(method, options)), len(menu)
+        stage['items'] = resolved
+    logger.info("Re-solved %d of %d menu items", resolved, len(menu))
+
+    with recorder.stage('persist', items=len(menu)):
+        optimization = (writer or ResultWriter()).write(outlet, menu, solution, fingerprint=fingerprint)
+    cache.remember(fingerprint, optimization.pk)
+
+    optimization.timings = recorder.timings
+    OptimizationResult.objects.filter(pk=optimization.pk).update(timings=recorder.timings)
+    recorder.flush()
+    return optimization
+
+
+def optimize_outlet(outlet_id, method=engine.DEFAULT_METHOD, options=None):
+    """Optimize one outlet by id for the optimize_outlets command.
+
+    Returns (result id, item count, seconds), which is cheap to send back
+    from a pool process.
+    """
+    started = time.perf_counter()
+    optimization = optimize_menu(Outlet.objects.get(pk=outlet_id), method, options=options)
+    return optimization.pk, packed.item_count(optimization), time.perf_counter() - started
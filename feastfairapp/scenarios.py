@@ -0,0 +1,123 @@
+# optimizer/scenarios.py
+
+"""
+What-if scenario sweeps.
+
+A sweep applies every combination of multipliers on cost, estimated demand
+and price elasticity to the menu and records how the optimal menu's total
+profit, demand and average price move. For the closed-form method all
+scenarios are solved together as a scenarios x items matrix in chunks;
+other methods (e.g. the constrained LP) solve one scenario per task in a
+process pool. Each scenario is stored as one ScenarioResult row linked to
+the parent OptimizationResult.
+"""
+
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+
+import numpy as np
+from django.db import transaction
+
+from . import engine, tables, workers
+from .models import ScenarioResult
+
+# Upper bound on scenarios x items entries solved in one batched pass
+CHUNK_ELEMENTS = 2_000_000
+
+
+def scenario_grid(cost_multipliers=(1.0,), demand_multipliers=(1.0,), elasticity_multipliers=(1.0,)):
+    """Every combination of the multipliers as an S x 3 array."""
+    return np.array(
+        list(itertools.product(cost_multipliers, demand_multipliers, elasticity_multipliers)),
+        dtype=np.float64,
+    ).reshape(-1, 3)
+
+
+def scale_menu(menu, multipliers):
+    """Apply (cost, demand, elasticity) multipliers to a menu.
+
+    ``multipliers`` is either one row of three values, giving a 1-D menu,
+    or an S x 3 array, giving menu columns of shape S x N.
+    """
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    cost, demand, elasticity = (multipliers[..., i, np.newaxis] for i in range(3))
+    shape = np.broadcast_shapes(cost.shape[:-1] + (len(menu),), menu.cost.shape)
+    return replace(
+        menu,
+        cost=menu.cost * cost,
+        min_price=np.broadcast_to(menu.min_price, shape),
+        max_price=np.broadcast_to(menu.max_price, shape),
+        base_demand=menu.base_demand * demand,
+        elasticity=menu.elasticity * elasticity,
+    )
+
+
+def summarize(solution, axis=-1):
+    """(total profit, total demand, average price) along the items axis."""
+    return np.stack([
+        solution.profit.sum(axis=axis),
+        solution.demand.sum(axis=axis),
+        solution.prices.mean(axis=axis),
+    ], axis=-1)
+
+
+def sweep_closed_form(menu, grid):
+    """Solve every scenario in batched array passes; returns S x 3 summaries."""
+    chunk = max(1, CHUNK_ELEMENTS // max(len(menu), 1))
+    summaries = []
+    for start in range(0, len(grid), chunk):
+        scaled = scale_menu(menu, grid[start:start + chunk])
+        normalized = engine.solve_closed_form(scaled)
+        prices, demand, profit = engine.evaluate(scaled, normalized)
+        summaries.append(summarize(engine.Solution(prices, demand, profit, engine.CLOSED_FORM)))
+    return np.concatenate(summaries)
+
+
+def solve_scenario(menu, multipliers, method, constraints):
+    """Summary for one scenario solved with any engine method."""
+    solution = engine.optimize(scale_menu(menu, multipliers), method, constraints)
+    return summarize(solution)
+
+
+def sweep_parallel(menu, grid, method, constraints=None, max_workers=None):
+    """Solve scenarios one per task across a process pool."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=workers.init_process) as pool:
+        futures = [
+            pool.submit(workers.solve_scenario, menu, multipliers, method, constraints)
+            for multipliers in grid
+        ]
+        return np.array([future.result() for future in futures]).reshape(-1, 3)
+
+
+def sweep(menu, grid, method=engine.DEFAULT_METHOD, constraints=None, max_workers=None):
+    """S x 3 array of (total profit, total demand, average price) per scenario."""
+    if not len(grid):
+        return np.empty((0, 3))
+    if method == engine.CLOSED_FORM:
+        return sweep_closed_form(menu, grid)
+    return sweep_parallel(menu, grid, method, constraints, max_workers)
+
+
+def save_scenarios(optimization, grid, summaries):
+    """Replace the scenarios stored for ``optimization``."""
+    rows = [
+        ScenarioResult(
+            optimization=optimization,
+            cost_multiplier=round(cost, 3),
+            demand_multiplier=round(demand, 3),
+            elasticity_multiplier=round(elasticity, 3),
+            total_profit=round(profit, 2),
+            total_demand=round(total_demand, 2),
+            average_price=round(price, 2),
+        )
+        for (cost, demand, elasticity), (profit, total_demand, price) in zip(grid.tolist(), summaries.tolist())
+    ]
+    with transaction.atomic():
+        optimization.scenarios.all().delete()
+        ScenarioResult.objects.bulk_create(rows, batch_size=1000)
+    tables.bump_result(optimization.pk)
+    return rows
@@ -0,0 +1,58 @@
+# optimizer/signals.py
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import analytics, cache, incremental, tables
+from .models import ItemRiskProfile, MenuItem, OptimizationResult, OptimizedMenuItem, Outlet
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=OptimizationResult)
+def invalidate_result_cache(sender, **kwargs):
+    cache.invalidate()
+
+
+@receiver(post_delete, sender=OptimizationResult)
+def forget_latest_solutions(sender, **kwargs):
+    incremental.forget()
+
+
+@receiver(post_delete, sender=OptimizationResult)
+def rebuild_rollups(sender, instance, **kwargs):
+    # After commit, once cascades (possibly of the whole outlet) are done
+    day = timezone.localdate(instance.date_created)
+    transaction.on_commit(partial(analytics.rebuild_day_if_outlet_exists, instance.outlet_id, day))
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_tables(sender, instance, **kwargs):
+    tables.bump_menu(instance.outlet_id)
+
+
+@receiver(post_save, sender=Outlet)
+def start_menu_version(sender, instance, created, **kwargs):
+    # A reused outlet id must not pick up an old outlet's fragments
+    if created:
+        tables.bump_menu(instance.pk)
+
+
+# Results are written once with bulk_create (ResultWriter bumps their
+# version); these catch later edits, e.g. in the admin. There is no
+# post_delete receiver for the rows: it would stop Django from deleting a
+# result's rows in one statement.
+@receiver(post_save, sender=OptimizedMenuItem)
+def invalidate_result_tables(sender, instance, **kwargs):
+    tables.bump_result(instance.optimization_id)
+
+
+@receiver(post_save, sender=ItemRiskProfile)
+def invalidate_risk_tables(sender, instance, **kwargs):
+    tables.bump_result(OptimizedMenuItem.objects.filter(pk=instance.optimized_item_id)
+                       .values_list('optimization_id', flat=True).first())
@@ -0,0 +1,232 @@
+# optimizer/solvers.py
+
+"""
+Solver sessions for repeated constrained optimizations.
+
+Consecutive constrained runs of a menu usually change a few costs, prices
+or demand figures and keep its shape: the same items, categories, size
+ladder and kinds of limits. Such runs share a session key (see
+``session_key``), and the session keeps the solver model of the previous
+run. The new LP is assembled as usual (build_problem is vectorized and
+cheap) and compared with the previous one, and only the coefficients,
+bounds and right-hand sides that differ are changed in the kept model:
+
+* HiGHS keeps its simplex basis across the changes, so the next solve
+  starts from the previous optimum instead of from scratch;
+* CBC's PuLP model is updated in place instead of being rebuilt variable
+  by variable, and the previous solution is passed as a warm start.
+
+Sessions live in a bounded per-process LRU (PRICEWISE_SOLVER_SESSIONS
+entries, 0 turns them off). A session is used by one thread at a time;
+a run that finds its session busy solves cold. A failed solve drops the
+session.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+
+from .cache import LRUCache
+from .constrained import cbc_model, cbc_solution, highs_model, highs_solution
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSIONS = 16
+
+# Above this share of changed matrix entries the HiGHS model is passed
+# again in one go, keeping only the previous basis
+MAX_CHANGED_SHARE = 0.2
+
+
+def session_key(menu, constraints, backend):
+    """Hash of everything that fixes the LP's shape, but not its coefficients."""
+    digest = hashlib.sha256()
+    digest.update(f"{backend}:{len(menu)}:{constraints.segments}:".encode())
+    digest.update(''.join('1' if getattr(constraints, name) is not None else '0'
+                          for name in ('capacity', 'ladder_step', 'max_average_change')).encode())
+    digest.update('\0'.join(menu.names).encode())
+    digest.update('\0'.join(menu.categories).encode())
+    digest.update(menu.size_rank.astype('<f8').tobytes())
+    digest.update(np.isnan(menu.current_price).tobytes())
+    return digest.hexdigest()
+
+
+@dataclass
+class SolveStats:
+    warm: bool
+    seconds: float
+    changed: int  # Coefficients, bounds and right-hand sides changed in the kept model
+
+
+class SolverSession:
+    """The solver model of one menu shape and the LP it was last given.
+
+    Subclasses build a model, update it in place and run it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.problem = None  # (c, A_ub, b_ub, bounds) of the last run
+        self.model = None
+        self.last_stats = None
+
+    def same_shape(self, A_ub, bounds):
+        _, previous, _, previous_bounds = self.problem
+        if previous_bounds.shape != bounds.shape or (previous is None) != (A_ub is None):
+            return False
+        return A_ub is None or (
+            previous.shape == A_ub.shape
+            and np.array_equal(previous.indptr, A_ub.indptr)
+            and np.array_equal(previous.indices, A_ub.indices)
+        )
+
+    def changes(self, c, A_ub, b_ub, bounds):
+        """Indices of the changed (costs, column bounds, matrix entries, row bounds) since the last run."""
+        previous_c, previous_A, previous_b, previous_bounds = self.problem
+        columns = np.flatnonzero(c != previous_c).astype(np.int32)
+        bounded = np.flatnonzero((bounds != previous_bounds).any(axis=1)).astype(np.int32)
+        if A_ub is None:
+            return columns, bounded, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        entries = np.flatnonzero(A_ub.data != previous_A.data)
+        rows = np.flatnonzero(b_ub != previous_b).astype(np.int32)
+        return columns, bounded, entries, rows
+
+    def solve(self, c, A_ub, b_ub, bounds):
+        started = time.perf_counter()
+        warm = self.problem is not None and self.same_shape(A_ub, bounds)
+        if warm:
+            changed = self.update(c, A_ub, b_ub, bounds, *self.changes(c, A_ub, b_ub, bounds))
+        else:
+            changed = 0
+            self.model = self.build(c, A_ub, b_ub, bounds)
+        x = self.run(warm)
+        self.problem = (c, A_ub, b_ub, bounds)
+        self.last_stats = SolveStats(warm=warm, seconds=time.perf_counter() - started, changed=changed)
+        return x
+
+    def build(self, c, A_ub, b_ub, bounds):
+        raise NotImplementedError
+
+    def update(self, c, A_ub, b_ub, bounds, columns, bounded, entries, rows):
+        """Apply the changes to the model; returns how many were made."""
+        raise NotImplementedError
+
+    def run(self, warm):
+        raise NotImplementedError
+
+
+def entry_rows(A_ub):
+    """Row index of every stored entry of a CSR matrix."""
+    return np.repeat(np.arange(A_ub.shape[0]), np.diff(A_ub.indptr))
+
+
+class HighsSession(SolverSession):
+    def build(self, c, A_ub, b_ub, bounds):
+        return highs_model(c, A_ub, b_ub, bounds)
+
+    def update(self, c, A_ub, b_ub, bounds, columns, bounded, entries, rows):
+        import highspy
+
+        highs = self.model
+        if A_ub is not None and len(entries) > MAX_CHANGED_SHARE * A_ub.nnz:
+            # Cheaper to pass the model again; the old basis still fits it
+            basis = highs.getBasis()
+            self.model = highs_model(c, A_ub, b_ub, bounds)
+            self.model.setBasis(basis)
+            return len(columns) + len(bounded) + len(entries) + len(rows)
+
+        if len(entries):
+            matrix_rows = entry_rows(A_ub)
+            for entry in entries.tolist():
+                highs.changeCoeff(int(matrix_rows[entry]), int(A_ub.indices[entry]), float(A_ub.data[entry]))
+        if len(rows):
+            highs.changeRowsBounds(len(rows), rows, np.full(len(rows), -highspy.kHighsInf), b_ub[rows])
+        if len(columns):
+            highs.changeColsCost(len(columns), columns, c[columns])
+        if len(bounded):
+            upper = np.where(np.isinf(bounds[bounded, 1]), highspy.kHighsInf, bounds[bounded, 1])
+            highs.changeColsBounds(len(bounded), bounded, bounds[bounded, 0].copy(), upper)
+        return len(columns) + len(bounded) + len(entries) + len(rows)
+
+    def run(self, warm):
+        # HiGHS starts from the basis it kept, if any
+        return highs_solution(self.model)
+
+
+class CbcSession(SolverSession):
+    def build(self, c, A_ub, b_ub, bounds):
+        return cbc_model(c, A_ub, b_ub, bounds)
+
+    def update(self, c, A_ub, b_ub, bounds, columns, bounded, entries, rows):
+        problem, variables, constraints = self.model
+        for column in columns.tolist():
+            problem.objective[variables[column]] = float(c[column])
+        for column in bounded.tolist():
+            low, high = bounds[column].tolist()
+            variables[column].lowBound = low
+            variables[column].upBound = None if np.isinf(high) else high
+        if len(entries):
+            matrix_rows = entry_rows(A_ub)
+            for entry in entries.tolist():
+                constraints[matrix_rows[entry]].expr[variables[A_ub.indices[entry]]] = float(A_ub.data[entry])
+        for row in rows.tolist():
+            constraints[row].changeRHS(float(b_ub[row]))
+        return len(columns) + len(bounded) + len(entries) + len(rows)
+
+    def run(self, warm):
+        problem, variables, _ = self.model
+        if warm:
+            for variable in variables:
+                # CBC's values may overshoot a bound by its tolerance
+                variable.setInitialValue(variable.varValue or 0.0, check=False)
+        return cbc_solution(problem, variables, warm_start=warm)
+
+
+SESSIONS = {
+    'highs': HighsSession,
+    'cbc': CbcSession,
+}
+
+
+_sessions = LRUCache(getattr(settings, 'PRICEWISE_SOLVER_SESSIONS', DEFAULT_SESSIONS))
+
+
+def enabled():
+    return _sessions.maxsize > 0
+
+
+def solve(key, backend, c, A_ub, b_ub, bounds):
+    """Solve the LP in the session for ``key``, creating it if needed; returns the column values."""
+    if not enabled():
+        return SESSIONS[backend]().solve(c, A_ub, b_ub, bounds)
+
+    session = _sessions.get(key)
+    if session is None:
+        session = SESSIONS[backend]()
+        _sessions.put(key, session)
+    if not session.lock.acquire(blocking=False):
+        return SESSIONS[backend]().solve(c, A_ub, b_ub, bounds)
+    try:
+        x = session.solve(c, A_ub, b_ub, bounds)
+    except Exception:
+        forget(key)
+        raise
+    finally:
+        session.lock.release()
+    stats = session.last_stats
+    logger.info("Solved with %s in %.3fs (%s, %d change(s))", backend, stats.seconds,
+                'warm' if stats.warm else 'cold', stats.changed)
+    return x
+
+
+def forget(key=None):
+    """Drop one session, or all of them."""
+    if key is None:
+        _sessions.clear()
+    else:
+        _sessions.pop(key)
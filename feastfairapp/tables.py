@@ -0,0 +1,287 @@
+# optimizer/tables.py
+
+"""
+Paginated, sortable and searchable menu and result tables.
+
+Pages are keyset-paginated: rows are ordered by the sort column and then
+the primary key, and the next page starts after the (value, pk) of the
+last row shown, carried in a signed ``after`` cursor that also names the
+sort it was made for, so a page never
+reads and throws away the rows before it as OFFSET paging does. Only two
+orders have an index to walk: menus by name ((outlet, name)) and results
+in menu order (the optimization foreign key). Every other sort, the menu's
+default order included, filters the outlet's or run's rows and sorts them
+for each page, which is cheap at menu sizes but grows with the menu. Only
+the rendered columns are selected, so e.g. the items' profit-curve blobs
+are never loaded.
+Runs with packed items (see packed.py) are paged the same way in memory.
+
+Rendered tables are cached as template fragments (``{% cache %}``) in
+Django's cache, keyed by the page parameters and a version token:
+
+* menu tables by the outlet's menu version, replaced whenever one of its
+  items is saved, deleted or imported;
+* result tables by the result's version, replaced when the result is
+  written, its scenarios are saved or its rows are edited.
+
+The page query runs inside the cached fragment, so a cache hit costs no
+query at all. Tokens are random rather than counters, so a reused outlet
+or result id (e.g. after the database is reset) never meets old fragments.
+"""
+
+import secrets
+from functools import cached_property
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+from . import packed
+from .models import MenuItem, OptimizationResult
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_FRAGMENT_SECONDS = 600
+
+CURSOR_SALT = 'pricewise.tables.cursor'
+
+# (field, heading) of the sortable columns; the first, the order items were
+# added in, is the default sort and has no column of its own
+MENU_COLUMNS = [
+    ('pk', 'Added'),
+    ('name', 'Name'),
+    ('cost', 'Cost'),
+    ('min_price', 'Min Price'),
+    ('max_price', 'Max Price'),
+    ('estimated_demand', 'Est. Demand'),
+    ('price_elasticity', 'Elasticity'),
+]
+RESULT_COLUMNS = [
+    ('pk', 'Menu order'),
+    ('name', 'Menu Item'),
+    ('optimized_price', 'Optimized Price'),
+    ('expected_demand', 'Expected Demand'),
+    ('item_profit', 'Item Profit'),
+]
+
+# Columns the templates render; result rows also need the foreign key the
+# related manager checks on every row
+MENU_FIELDS = ['name', 'cost', 'min_price', 'max_price', 'estimated_demand', 'price_elasticity', 'demand_model']
+RESULT_FIELDS = ['optimization', 'name', 'optimized_price', 'expected_demand', 'item_profit']
+RISK_FIELDS = ['risk__profit_std', 'risk__profit_p10', 'risk__profit_p50', 'risk__profit_p90',
+               'risk__loss_probability']
+
+
+def page_size():
+    return getattr(settings, 'PRICEWISE_TABLE_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+
+
+def fragment_seconds():
+    return getattr(settings, 'PRICEWISE_FRAGMENT_CACHE_SECONDS', DEFAULT_FRAGMENT_SECONDS)
+
+
+def encode_cursor(sort, value, pk):
+    return signing.dumps([sort, str(value), pk], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    """(sort, value, pk) from a cursor; raises signing.BadSignature if it was not made here.
+
+    ``value`` is the string form of the sort column's value; TableForm
+    converts it back with the model field.
+    """
+    sort, value, pk = signing.loads(cursor, salt=CURSOR_SALT)
+    return sort, value, int(pk)
+
+
+def version_key(kind, pk):
+    return f"pricewise:{kind}-version:{pk}"
+
+
+def version(kind, pk):
+    """The current version token of an outlet's menu (``kind='menu'``) or a result (``'result'``)."""
+    key = version_key(kind, pk)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, secrets.token_hex(8), None)
+        token = cache.get(key)
+    return token
+
+
+async def aversion(kind, pk):
+    """``version`` for async views."""
+    key = version_key(kind, pk)
+    token = await cache.aget(key)
+    if token is None:
+        await cache.aadd(key, secrets.token_hex(8), None)
+        token = await cache.aget(key)
+    return token
+
+
+def bump(kind, pk):
+    """Give the menu or result a new version, so its cached fragments are no longer used."""
+    cache.set(version_key(kind, pk), secrets.token_hex(8), None)
+
+
+def bump_menu(outlet_id):
+    bump('menu', outlet_id)
+
+
+def bump_result(result_id):
+    bump('result', result_id)
+
+
+def menu_size(outlet_id):
+    """Number of items on the outlet's menu, cached per menu version."""
+    key = f"pricewise:menu-size:{outlet_id}:{version('menu', outlet_id)}"
+    return cache.get_or_set(key, lambda: MenuItem.objects.filter(outlet_id=outlet_id).count(), fragment_seconds())
+
+
+async def amenu_size(outlet_id):
+    """``menu_size`` for async views."""
+    key = f"pricewise:menu-size:{outlet_id}:{await aversion('menu', outlet_id)}"
+    size = await cache.aget(key)
+    if size is None:
+        size = await MenuItem.objects.filter(outlet_id=outlet_id).acount()
+        await cache.aset(key, size, fragment_seconds())
+    return size
+
+
+async def ahas_risk(optimization):
+    """Whether the run's items have risk profiles (Monte Carlo runs), cached per result version."""
+    if optimization.item_storage == OptimizationResult.PACKED:
+        return False
+    key = f"pricewise:result-risk:{optimization.pk}:{await aversion('result', optimization.pk)}"
+    has_risk = await cache.aget(key)
+    if has_risk is None:
+        has_risk = await optimization.menu_items.filter(risk__isnull=False).aexists()
+        await cache.aset(key, has_risk, fragment_seconds())
+    return has_risk
+
+
+class KeysetTable:
+    """One page of ``queryset`` for the search, sort and cursor in ``params``.
+
+    ``params`` are TableForm.params(): ``after`` is the signed cursor and
+    ``cursor`` the (value, pk) decoded from it for this sort. Nothing is
+    queried until ``rows`` (or anything derived from it) is used.
+    """
+
+    def __init__(self, queryset, columns, params, size=None):
+        self.queryset = queryset
+        self.columns = columns
+        self.query = params.get('q') or ''
+        self.sort = params.get('sort') or columns[0][0]
+        self.after = params.get('after') or ''
+        self.size = size or page_size()
+        self.field = self.sort.lstrip('-')
+        self.descending = self.sort.startswith('-')
+        self.cursor = params.get('cursor') if self.after else None
+
+    def fetch(self, limit):
+        """The first ``limit`` matching rows after the cursor."""
+        queryset = self.queryset
+        if self.query:
+            queryset = queryset.filter(name__icontains=self.query)
+        if self.cursor:
+            value, pk = self.cursor
+            beyond = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(Q(**{f'{self.field}__{beyond}': value}) |
+                                       Q(**{self.field: value, f'pk__{beyond}': pk}))
+        return list(queryset.order_by(self.sort, '-pk' if self.descending else 'pk')[:limit])
+
+    @cached_property
+    def _fetched(self):
+        # One row more than a page tells whether there is a next page
+        return self.fetch(self.size + 1)
+
+    @property
+    def rows(self):
+        return self._fetched[:self.size]
+
+    @property
+    def has_next(self):
+        return len(self._fetched) > self.size
+
+    @property
+    def loaded_rows(self):
+        """Rows on the page if it was queried, None if it came from the cache."""
+        return len(self.rows) if '_fetched' in self.__dict__ else None
+
+    def url(self, **params):
+        params = {'sort': self.sort, 'q': self.query, **params}
+        return '?' + urlencode({key: value for key, value in params.items() if value})
+
+    @property
+    def next_url(self):
+        last = self.rows[-1]
+        return self.url(after=encode_cursor(self.sort, getattr(last, self.field), last.pk))
+
+    @property
+    def first_url(self):
+        return self.url()
+
+    @property
+    def headers(self):
+        """(heading, url, arrow) per sortable column; a sorted column's link reverses it."""
+        headers = []
+        for field, heading in self.columns[1:]:
+            arrow = '▲' if self.sort == field else '▼' if self.sort == f'-{field}' else ''
+            headers.append((heading, self.url(sort=f'-{field}' if self.sort == field else field), arrow))
+        return headers
+
+    @property
+    def sorted(self):
+        """Whether the rows are sorted by a column instead of in the default order."""
+        return self.sort != self.columns[0][0]
+
+    @property
+    def default_order_url(self):
+        return self.url(sort='')
+
+    @property
+    def cache_key(self):
+        """Page parameters for the fragment cache key."""
+        return f"{self.sort}:{self.query}:{self.after}"
+
+
+class PackedTable(KeysetTable):
+    """A KeysetTable over the items of a packed run, searched and sorted in memory.
+
+    ``items`` is called for the run's StoredItems only when the page is
+    rendered.
+    """
+
+    def __init__(self, items, columns, params, size=None):
+        super().__init__(None, columns, params, size)
+        self.items = items
+
+    def fetch(self, limit):
+        items = self.items()
+        if self.query:
+            query = self.query.casefold()
+            items = [item for item in items if query in item.name.casefold()]
+
+        def key(item):
+            return getattr(item, self.field), item.pk
+
+        items.sort(key=key, reverse=self.descending)
+        if self.cursor and items:
+            value, pk = self.cursor
+            cursor = (type(getattr(items[0], self.field))(value), pk)
+            items = [item for item in items if (key(item) < cursor if self.descending else key(item) > cursor)]
+        return items[:limit]
+
+
+def menu_table(outlet, params):
+    return KeysetTable(MenuItem.objects.filter(outlet=outlet).only(*MENU_FIELDS), MENU_COLUMNS, params)
+
+
+def result_table(optimization, has_risk, params):
+    if optimization.item_storage == OptimizationResult.PACKED:
+        return PackedTable(lambda: packed.load(optimization.pk).items(optimization.pk), RESULT_COLUMNS, params)
+    items = optimization.menu_items.only(*RESULT_FIELDS)
+    if has_risk:
+        items = items.select_related('risk').only(*RESULT_FIELDS, *RISK_FIELDS)
+    return KeysetTable(items, RESULT_COLUMNS, params)
@@ -0,0 +1,236 @@
+# optimizer/uncertainty.py
+
+"""
+Monte Carlo pricing under demand uncertainty.
+
+Estimated demand and price elasticity are treated as the means of
+log-normal distributions with the given coefficients of variation. For
+every item, samples x candidate prices profit matrices are evaluated with
+array broadcasting, and the candidate with the best expected profit (or
+the best chosen percentile of profit, e.g. P10) is picked, first on a
+coarse price grid and then on a finer one around the coarse winner. Items are
+processed in blocks sized so one block's matrix holds at most
+CHUNK_ELEMENTS entries, which bounds memory regardless of menu size.
+
+Every item draws its samples from its own generator, keyed by the seed and
+the item's id, so results only depend on the seed and settings -- not on
+the block size, the item's position in the menu, or how many processes the
+blocks are spread over (PRICEWISE_MONTE_CARLO_WORKERS).
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from django.conf import settings as django_settings
+
+from . import demand as demand_models
+from . import engine, workers
+
+# Upper bound on samples x candidates x items entries evaluated at once
+CHUNK_ELEMENTS = 2_000_000
+
+# Percentiles of each item's profit stored with the result
+RISK_PERCENTILES = (10, 50, 90)
+
+
+@dataclass
+class UncertaintySettings:
+    samples: int = 1000
+    demand_cv: float = 0.2  # Standard deviation / mean of estimated demand
+    elasticity_cv: float = 0.2  # Standard deviation / mean of price elasticity
+    percentile: float = None  # Profit percentile to maximise; None maximises expected profit
+    candidates: int = 9  # Candidate prices per item in each of the coarse and fine searches
+    seed: int = 0
+
+    @classmethod
+    def from_options(cls, options):
+        """Build from the JSON options stored on an OptimizationJob."""
+        known = {name: options[name] for name in cls.__dataclass_fields__ if options.get(name) is not None}
+        return cls(**known)
+
+    def as_options(self):
+        return {name: value for name, value in asdict(self).items() if value is not None}
+
+    @property
+    def objective(self):
+        """Short label for what is maximised, e.g. 'mean' or 'P10'."""
+        return 'mean' if self.percentile is None else f"P{self.percentile:g}"
+
+
+@dataclass
+class RiskStats:
+    """Per-item profit distribution at the chosen prices."""
+    expected_profit: np.ndarray
+    profit_std: np.ndarray
+    percentiles: np.ndarray  # len(RISK_PERCENTILES) x N
+    loss_probability: np.ndarray
+
+
+def standard_normals(ids, settings):
+    """N x 2 x S standard normal draws (demand, elasticity) per item."""
+    draws = np.empty((len(ids), 2, settings.samples))
+    for row, item_id in enumerate(ids.tolist()):
+        rng = np.random.default_rng(np.random.SeedSequence(settings.seed, spawn_key=(item_id,)))
+        rng.standard_normal(out=draws[row])
+    return draws
+
+
+def lognormal_factors(normals, cv):
+    """Multiplicative noise with mean 1 and coefficient of variation ``cv``."""
+    if not cv:
+        return np.ones_like(normals)
+    sigma = np.sqrt(np.log1p(cv ** 2))
+    return np.exp(normals * sigma - sigma ** 2 / 2)
+
+
+def candidate_prices(menu, count):
+    """Normalized candidates: an even grid plus the deterministic optimum."""
+    grid = np.linspace(0, 1, count)[:, np.newaxis] * np.ones(len(menu))
+    return np.concatenate([grid, engine.solve_closed_form(menu)[np.newaxis]])
+
+
+def refined_prices(centers, count):
+    """``count`` candidates spanning one coarse grid step either side of ``centers``."""
+    step = 1 / (count - 1)
+    offsets = np.linspace(-step, step, count)[:, np.newaxis]
+    return np.clip(np.concatenate([centers[np.newaxis], centers + offsets]), 0, 1)
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile along the last axis.
+
+    Same result as ``np.percentile(values, q, axis=-1)`` but uses a
+    partial sort on the two neighbouring ranks only, which is several
+    times faster on large sample axes.
+    """
+    q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+    positions = q / 100 * (values.shape[-1] - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, values.shape[-1] - 1)
+    ranks = np.unique(np.concatenate([lower, upper]))
+    ordered = np.partition(values, ranks, axis=-1)
+    low, high = ordered[..., lower], ordered[..., upper]
+    result = low + (high - low) * (positions - lower)
+    return np.moveaxis(result, -1, 0)  # len(q) x values.shape[:-1]
+
+
+def evaluate_samples(model, menu, candidates, params, settings):
+    """Profit and demand for K x N candidates over every sample (K x N x S)."""
+    prices = (menu.min_price + candidates * menu.price_range)[..., np.newaxis]
+    demand = model.demand(prices, params)
+    profit = demand * (prices - params.cost)
+    if settings.percentile is None:
+        scores = profit.mean(axis=-1)
+    else:
+        scores = percentile(profit, settings.percentile)[0]
+    return profit, demand, np.argmax(scores, axis=0)
+
+
+def solve_block(menu, settings):
+    """Pick prices for one block of items sharing a demand model; returns
+    (normalized, stats rows).
+
+    Candidates are searched on a coarse grid first and then on a finer grid
+    around the best coarse price, reusing the same samples for both.
+
+    ``stats`` is an N x (4 + len(RISK_PERCENTILES)) array of expected
+    demand, expected profit, profit standard deviation, loss probability
+    and the profit percentiles.
+    """
+    # Samples run along the last axis so reductions over them are contiguous
+    normals = standard_normals(menu.ids, settings)
+    params = demand_models.DemandParams(
+        cost=menu.cost[:, np.newaxis],
+        min_price=menu.min_price[:, np.newaxis],
+        max_price=menu.max_price[:, np.newaxis],
+        base_demand=menu.base_demand[:, np.newaxis] * lognormal_factors(normals[:, 0], settings.demand_cv),
+        elasticity=menu.elasticity[:, np.newaxis] * lognormal_factors(normals[:, 1], settings.elasticity_cv),
+    )  # N x S samples
+    model = engine.model_for(menu.demand_models[0])
+    items = np.arange(len(menu))
+
+    coarse = candidate_prices(menu, settings.candidates)  # K x N
+    *_, best = evaluate_samples(model, menu, coarse, params, settings)
+    fine = refined_prices(coarse[best, items], settings.candidates)
+    profit, demand, best = evaluate_samples(model, menu, fine, params, settings)
+    chosen_profit = profit[best, items]  # N x S
+    chosen_demand = demand[best, items]
+
+    stats = np.column_stack([
+        chosen_demand.mean(axis=-1),
+        chosen_profit.mean(axis=-1),
+        chosen_profit.std(axis=-1),
+        (chosen_profit < 0).mean(axis=-1),
+        percentile(chosen_profit, RISK_PERCENTILES).T,
+    ])
+    return fine[best, items], stats
+
+
+def item_blocks(menu, settings):
+    """Split item positions into blocks of one demand model each.
+
+    A block is a slice when the whole menu shares one model, else an array
+    of positions.
+    """
+    per_item = settings.samples * (settings.candidates + 1)  # Matrix entries per item in one search
+    size = max(1, CHUNK_ELEMENTS // max(per_item, 1))
+    blocks = []
+    for _, items in menu.model_groups():
+        if isinstance(items, slice):
+            blocks.extend(slice(start, start + size) for start in range(0, len(menu), size))
+        else:
+            blocks.extend(items[start:start + size] for start in range(0, len(items), size))
+    return blocks
+
+
+def solve_monte_carlo(menu, settings, max_workers=None):
+    """Return (normalized prices, expected demand, RiskStats) for the whole menu."""
+    if settings.samples < 1 or settings.candidates < 2:
+        raise engine.OptimizationError("Monte Carlo needs at least one sample and two candidate prices.")
+    if max_workers is None:
+        max_workers = getattr(django_settings, 'PRICEWISE_MONTE_CARLO_WORKERS', 1)
+
+    positions = item_blocks(menu, settings)
+    blocks = [menu.take(part) for part in positions]
+
+    if max_workers > 1 and len(blocks) > 1:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                 initializer=workers.init_process) as pool:
+            results = list(pool.map(workers.solve_uncertainty_block, blocks, [settings] * len(blocks)))
+    else:
+        results = [solve_block(block, settings) for block in blocks]
+
+    normalized = np.empty(len(menu))
+    stats = np.empty((len(menu), 4 + len(RISK_PERCENTILES)))
+    for part, (block_normalized, block_stats) in zip(positions, results):
+        normalized[part] = block_normalized
+        stats[part] = block_stats
+    risk = RiskStats(
+        expected_profit=stats[:, 1],
+        profit_std=stats[:, 2],
+        percentiles=stats[:, 4:].T,
+        loss_probability=stats[:, 3],
+    )
+    return normalized, stats[:, 0], risk
+
+
+def optimize(menu, settings=None, max_workers=None):
+    """Solve the menu under uncertainty and return an engine.Solution.
+
+    The solution's demand and profit are the expected values over the
+    samples; the distribution of each item's profit is in ``solution.risk``.
+    """
+    settings = settings or UncertaintySettings()
+    normalized, expected_demand, risk = solve_monte_carlo(menu, settings, max_workers)
+    prices = menu.min_price + normalized * menu.price_range
+    return engine.Solution(
+        prices=prices,
+        demand=expected_demand,
+        profit=risk.expected_profit,
+        method=engine.MONTE_CARLO,
+        variant=settings.objective,
+        risk=risk,
+    )
@@ -6,7 +6,20 @@ from . import views
 urlpatterns = [
     path('', views.home_view, name='home'),
     path('input/', views.input_menu_view, name='input_menu'),
+    path('outlet/', views.select_outlet, name='select_outlet'),
+    path('import/', views.import_menu_view, name='import_menu'),
     path('delete/<int:pk>/', views.delete_menu_item, name='delete_item'),
     path('optimize/', views.run_optimization, name='run_optimization'),
     path('results/<int:pk>/', views.results_view, name='results'),
+    path('results/<int:pk>/export/', views.export_results, name='export_result'),
+    path('export/', views.export_results, name='export_results'),
+    path('analytics/', views.analytics_view, name='analytics'),
+    path('api/analytics/profit/', views.analytics_profit, name='analytics_profit'),
+    path('api/analytics/items/', views.analytics_items, name='analytics_items'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/progress/', views.job_progress_view, name='job_progress'),
+    path('api/optimize/', views.api_optimize, name='api_optimize'),
+    path('api/optimize/save/', views.api_save_menus, name='api_save_menus'),
+    path('api/curves/', views.profit_curves, name='profit_curves'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,31 +1,98 @@
 # optimizer/views.py
 
-from django.shortcuts import render, redirect
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, CreateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (FileResponse, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, Http404,
+                         JsonResponse, StreamingHttpResponse)
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.forms import modelformset_factory
 
-from .models import MenuItem, OptimizationResult, OptimizedMenuItem
-from .forms import MenuItemForm
+from .models import MenuItem, OptimizationResult, OptimizedMenuItem, OptimizationJob, Outlet
+from .forms import (MenuItemForm, MenuImportForm, ConstraintsForm, UncertaintyForm, OutletChoiceForm, ExportForm,
+                    DateRangeForm, AnalyticsForm, MenuTableForm, ResultTableForm)
+from . import analytics, api, cache, curves, engine, exports, importers, jobs, metrics, offload, tables
+from .engine import MenuArrays
+
+def current_outlet(request):
+    """The outlet chosen in this session; the default outlet if none is."""
+    outlet_id = request.session.get('outlet_id')
+    outlet = Outlet.objects.select_related('restaurant').filter(pk=outlet_id).first() if outlet_id else None
+    if outlet is None:
+        outlet = Outlet.objects.default()
+        request.session['outlet_id'] = outlet.pk
+    return outlet
+
+async def acurrent_outlet(request):
+    """``current_outlet`` for async views."""
+    outlet_id = await request.session.aget('outlet_id')
+    outlet = await Outlet.objects.select_related('restaurant').filter(pk=outlet_id).afirst() if outlet_id else None
+    if outlet is None:
+        outlet = await Outlet.objects.adefault()
+        await request.session.aset('outlet_id', outlet.pk)
+    return outlet
+
+def busy_response(exc):
+    response = HttpResponse(f"{exc} Please try again shortly.", status=503, content_type='text/plain')
+    response['Retry-After'] = str(round(exc.seconds))
+    return response
 
-import numpy as np
-from scipy.optimize import linprog
+def streamed(request, chunks):
+    """``chunks`` as a StreamingHttpResponse body that is streamed under WSGI and ASGI alike.
+
+    Under ASGI Django reads a sync iterator to the end before sending
+    anything, so there the chunks are pulled one at a time from a thread.
+    """
+    return pull_chunks(chunks) if isinstance(request, ASGIRequest) else chunks
+
+async def pull_chunks(chunks):
+    iterator = iter(chunks)
+    pull = sync_to_async(next)
+    try:
+        while (chunk := await pull(iterator, None)) is not None:
+            yield chunk
+    finally:
+        # A client that disconnects leaves the generator (and its cursor) open
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
 
 def home_view(request):
     """Home page view with the 'OPTIMIZE MENU' button."""
     return render(request, 'home.html')
 
-def input_menu_view(request):
-    """View for adding menu items for optimization."""
-    # Get existing menu items
-    menu_items = MenuItem.objects.all()
+def select_outlet(request):
+    """Switch the outlet whose menu the pages show."""
+    if request.method == 'POST':
+        form = OutletChoiceForm(request.POST)
+        if form.is_valid():
+            request.session['outlet_id'] = form.cleaned_data['outlet'].pk
+        else:
+            messages.error(request, "Please choose a valid outlet.")
+    return redirect('input_menu')
+
+async def input_menu_view(request):
+    """View for adding menu items for optimization.
+
+    The items table is paginated, sortable and searchable (``?q=``,
+    ``?sort=``, ``?after=``) and cached per menu version; see tables.py.
+    The template, with its cached fragments and their queries, is rendered
+    in a thread.
+    """
+    outlet = await acurrent_outlet(request)
     
     if request.method == 'POST':
         form = MenuItemForm(request.POST)
-        if form.is_valid():
-            form.save()
+        # Validation runs the model's unique checks
+        if await sync_to_async(form.is_valid)():
+            item = form.save(commit=False)
+            item.outlet = outlet
+            await item.asave()
             messages.success(request, "Menu item added successfully!")
             return redirect('input_menu')
     else:
@@ -33,153 +100,319 @@ def input_menu_view(request):
         
     context = {
         'form': form,
-        'menu_items': menu_items,
+        'outlet': outlet,
+        'outlet_form': await sync_to_async(OutletChoiceForm)(initial={'outlet': outlet}),
+        'menu_size': await tables.amenu_size(outlet.pk),
+        'menu_version': await tables.aversion('menu', outlet.pk),
+        'table': tables.menu_table(outlet, MenuTableForm(request.GET).params()),
+        'fragment_seconds': tables.fragment_seconds(),
+        'methods': engine.METHOD_LABELS.items(),
+        'default_method': engine.DEFAULT_METHOD,
+        'constraints_form': ConstraintsForm(),
+        'uncertainty_form': UncertaintyForm(),
     }
-    return render(request, 'input_menu.html', context)
+    return await sync_to_async(render)(request, 'input_menu.html', context)
+
+def import_menu_view(request):
+    """Bulk import menu items from an uploaded CSV or JSON Lines file."""
+    outlet = current_outlet(request)
+    report = None
+    if request.method == 'POST':
+        form = MenuImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                file_format = form.cleaned_data['format'] or importers.detect_format(upload.name)
+                report = importers.import_file(importers.open_text(upload.file), file_format, outlet)
+            except importers.MenuImportError as exc:
+                messages.error(request, f"Import failed: {exc}")
+            else:
+                if report.imported:
+                    messages.success(request, f"Imported {report.imported} menu item(s): "
+                                              f"{report.created} added, {report.updated} updated.")
+                if report.error_count:
+                    messages.warning(request, f"{report.error_count} row(s) were rejected.")
+    else:
+        form = MenuImportForm()
+    
+    context = {
+        'form': form,
+        'outlet': outlet,
+        'report': report,
+    }
+    return render(request, 'import_menu.html', context)
 
 def delete_menu_item(request, pk):
     """Delete a menu item."""
-    item = MenuItem.objects.get(pk=pk)
+    item = get_object_or_404(MenuItem, pk=pk, outlet=current_outlet(request))
     item.delete()
     messages.success(request, f"Menu item '{item.name}' deleted successfully!")
     return redirect('input_menu')
 
-def run_optimization(request):
-    """Run the simplex optimization and show results."""
+async def run_optimization(request):
+    """Queue an optimization of the outlet's menu and show its progress page.
+
+    The menu is read with the async ORM; building its arrays and
+    fingerprint is CPU-bound and runs in the bounded pool of offload.py.
+    """
     if request.method == 'POST':
-        menu_items = MenuItem.objects.all()
+        outlet = await acurrent_outlet(request)
+        recorder = metrics.StageRecorder('request')
+        try:
+            with recorder.stage('load') as stage:
+                rows = [row async for row in MenuArrays.values(MenuItem.objects.filter(outlet=outlet))]
+                menu = await offload.run(MenuArrays.from_values, rows, items=len(rows))
+                stage['items'] = len(menu)
+        except offload.Busy as exc:
+            return busy_response(exc)
         
-        if not menu_items:
+        if not len(menu):
             messages.error(request, "Please add at least one menu item before optimizing.")
             return redirect('input_menu')
         
-        # Set up the linear programming problem
-        num_items = len(menu_items)
-        
-        # Since simplex method is for linear problems, we need to linearize our problem
-        # We'll use price variables normalized between 0 and 1 for each item
-        
-        # Objective: Maximize profit (or minimize negative profit for linprog)
-        # For each item i: profit_i = (price_i - cost_i) * demand_i
-        # Where demand_i = base_demand_i * (1 - elasticity_i * normalized_price_i)
-        
-        # Bounds for variables: 0 <= x_i <= 1 for all i
-        bounds = [(0, 1) for _ in range(num_items)]
-        
-        # For linprog, we want to minimize c^T * x
-        # Since we want to maximize profit, we'll use negative coefficients
-        c = []
-        
-        # Build the objective function coefficients
-        for i, item in enumerate(menu_items):
-            min_price = float(item.min_price)
-            max_price = float(item.max_price)
-            cost = float(item.cost)
-            base_demand = item.estimated_demand
-            elasticity = float(item.price_elasticity)
-            price_range = max_price - min_price
-            
-            # Linearized approximation of our profit function
-            # We'll use two coefficients to approximate the quadratic profit function
-            # Based on the first derivative at x=0 and x=1
-            
-            # At x=0: price = min_price, demand = base_demand
-            profit_at_min = (min_price - cost) * base_demand
-            
-            # At x=1: price = max_price, demand = base_demand * (1 - elasticity)
-            demand_at_max = base_demand * (1 - elasticity)
-            if demand_at_max < 0:
-                demand_at_max = 0
-            profit_at_max = (max_price - cost) * demand_at_max
-            
-            # Linear coefficient (negative for minimization)
-            linear_coef = -(profit_at_max - profit_at_min)
-            c.append(linear_coef)
-        
-        # Add constant term to the objective value later (not part of linprog input)
-        constant_term = sum((float(item.min_price) - float(item.cost)) * item.estimated_demand 
-                          for item in menu_items)
-        
-        # No inequality constraints needed for this basic formulation
-        A_ub = None
-        b_ub = None
+        method = request.POST.get('method', engine.DEFAULT_METHOD)
+        if method not in engine.METHOD_LABELS:
+            messages.error(request, f"Optimization failed: Unknown optimization method '{method}'.")
+            return redirect('input_menu')
         
-        # No equality constraints
-        A_eq = None
-        b_eq = None
+        options = {}
+        if method in engine.CONSTRAINED_METHODS:
+            constraints_form = ConstraintsForm(request.POST)
+            if not constraints_form.is_valid():
+                messages.error(request, "Please enter valid, non-negative constraint limits.")
+                return redirect('input_menu')
+            options = constraints_form.options()
+        elif method == engine.MONTE_CARLO:
+            uncertainty_form = UncertaintyForm(request.POST)
+            if not uncertainty_form.is_valid():
+                messages.error(request, "Please enter valid Monte Carlo settings.")
+                return redirect('input_menu')
+            options = uncertainty_form.options()
         
-        # Solve the linear program using simplex method
-        result = linprog(
-            c=c,
-            A_ub=A_ub,
-            b_ub=b_ub,
-            A_eq=A_eq,
-            b_eq=b_eq,
-            bounds=bounds,
-            method='simplex'  # Explicitly use simplex method
-        )
+        # An unchanged menu reuses its saved result without solving again
+        try:
+            with recorder.stage('lookup'):
+                fingerprint = await offload.run(cache.menu_fingerprint, menu, method, options, outlet.pk,
+                                                items=len(menu))
+                cached_id = await cache.alookup(fingerprint)
+                if cached_id is not None and not await OptimizationResult.objects.filter(pk=cached_id).aexists():
+                    # Deleted in another process, whose signals don't clear this one's cache
+                    cache.forget(fingerprint)
+                    cached_id = None
+        except offload.Busy as exc:
+            return busy_response(exc)
+        if cached_id is not None:
+            await sync_to_async(recorder.flush)()
+            messages.info(request, "The menu hasn't changed since this optimization, so its results were reused.")
+            return redirect('results', pk=cached_id)
         
-        if result.success:
-            # Extract optimized values
-            opt_normalized_prices = result.x
-            
-            # Calculate actual prices and expected demand/profit for each item
-            for i, item in enumerate(menu_items):
-                min_price = float(item.min_price)
-                max_price = float(item.max_price)
-                cost = float(item.cost)
-                base_demand = item.estimated_demand
-                elasticity = float(item.price_elasticity)
-                price_range = max_price - min_price
-                
-                # Convert normalized price (0-1) to actual price
-                normalized_price = opt_normalized_prices[i]
-                item.optimized_price = min_price + normalized_price * price_range
-                
-                # Calculate expected demand at this price
-                item.expected_demand = base_demand * (1 - elasticity * normalized_price)
-                if item.expected_demand < 0:
-                    item.expected_demand = 0
-                
-                # Calculate profit
-                item.profit = (item.optimized_price - cost) * item.expected_demand
-            
-            # Create optimization result - CHANGE THIS LINE
-            total_profit = sum(getattr(item, 'profit', 0) for item in menu_items)
-            optimization = OptimizationResult.objects.create(
-                total_profit=total_profit,
-                method="Simplex"  # Explicitly set the method
-            )
-            
-            # Store optimized menu items - FIXED INDENTATION HERE
-            for item in menu_items:
-                OptimizedMenuItem.objects.create(
-                    optimization=optimization,
-                    name=item.name,
-                    optimized_price=round(getattr(item, 'optimized_price', 0), 2),
-                    expected_demand=round(getattr(item, 'expected_demand', 0), 2),
-                    item_profit=round(getattr(item, 'profit', 0), 2)
-                )
-            
-            return redirect('results', pk=optimization.pk)
-        else:
-            # Optimization failed
-            messages.error(request, f"Optimization failed: {result.message}")
-            return redirect('input_menu')
+        # Staff can ask for a cProfile of the run
+        profile = bool(request.POST.get('profile')) and (await request.auser()).is_staff
+        with recorder.stage('enqueue'):
+            job = await jobs.aenqueue(outlet, method, options, profile=profile)
+        await sync_to_async(recorder.flush)()
+        return redirect('job_progress', pk=job.pk)
     else:
         return redirect('input_menu')
+
+def job_status(request, pk):
+    """JSON status of an optimization job, polled by the progress page."""
+    job = get_object_or_404(OptimizationJob, pk=pk, outlet=current_outlet(request))
+    data = {
+        'id': job.pk,
+        'status': job.status,
+        'method': engine.METHOD_LABELS.get(job.method, job.method),
+        'queue_seconds': job.queue_seconds,
+        'run_seconds': job.run_seconds,
+        'error': job.error,
+        'results_url': reverse('results', kwargs={'pk': job.result_id}) if job.result_id else None,
+    }
+    return JsonResponse(data)
+
+def job_progress_view(request, pk):
+    """Page that waits for an optimization job and then opens its results."""
+    job = get_object_or_404(OptimizationJob, pk=pk, outlet=current_outlet(request))
+    if job.status == OptimizationJob.DONE and job.result_id:
+        return redirect('results', pk=job.result_id)
+    return render(request, 'job_progress.html', {'job': job})
     
-def results_view(request, pk):
-    """Display the optimization results for the specified optimization."""
+async def results_view(request, pk):
+    """Display the optimization results for the specified optimization.
+
+    Items are paginated like the menu table and cached per result version.
+    """
+    outlet = await acurrent_outlet(request)
+    recorder = metrics.StageRecorder('results')
     try:
-        optimization = OptimizationResult.objects.get(pk=pk)
-        optimized_items = optimization.menu_items.all()  # This is correct - gets all items
+        with recorder.stage('query'):
+            optimization = await OptimizationResult.objects.select_related('outlet__restaurant').aget(
+                pk=pk, outlet=outlet)
+            has_risk = await tables.ahas_risk(optimization)
         
+        # The item page and scenarios are queried while rendering, and only
+        # when their fragments are not cached
+        table = tables.result_table(optimization, has_risk, ResultTableForm(request.GET).params())
         context = {
             'optimization': optimization,
-            'optimized_items': optimized_items,  # Correctly passing all items to template
+            'table': table,
+            'has_risk': has_risk,
+            'scenarios': optimization.scenarios.all(),
+            'result_version': await tables.aversion('result', optimization.pk),
+            'fragment_seconds': tables.fragment_seconds(),
         }
-        return render(request, 'results.html', context)
+        with recorder.stage('render') as stage:
+            response = await sync_to_async(render)(request, 'results.html', context)
+            stage['items'] = table.loaded_rows
+        await sync_to_async(recorder.flush)()
+        return response
     except OptimizationResult.DoesNotExist:
         messages.error(request, "Optimization results not found.")
-        return redirect('home_view')
\ No newline at end of file
+        return redirect('home')
+
+def export_results(request, pk=None):
+    """Download optimized prices as streamed CSV or as Parquet.
+
+    With ``pk`` one run is exported; otherwise every run of the outlet,
+    optionally limited with ``?start=`` and ``?end=`` dates.
+    """
+    outlet = current_outlet(request)
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(importers.format_errors(form))
+    
+    if pk is not None:
+        optimization = get_object_or_404(OptimizationResult, pk=pk, outlet=outlet)
+        rows = exports.export_rows(optimization=optimization)
+        filename = f"pricewise-optimization-{pk}"
+    else:
+        rows = exports.export_rows(outlets=[outlet], start=form.cleaned_data['start'], end=form.cleaned_data['end'])
+        filename = f"pricewise-outlet-{outlet.pk}-history"
+    
+    if form.cleaned_data['format'] == 'parquet':
+        # Parquet writes its footer last, so the file is built on disk and then streamed
+        output = tempfile.TemporaryFile()
+        try:
+            exports.write_parquet(rows, output)
+        except exports.ExportError as exc:
+            output.close()
+            return HttpResponseBadRequest(str(exc))
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f"{filename}.parquet",
+                            content_type='application/vnd.apache.parquet')
+    
+    response = StreamingHttpResponse(streamed(request, exports.csv_chunks(rows)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+def analytics_view(request):
+    """Profit trend across runs and per-item history, read from the rollup tables."""
+    outlet = current_outlet(request)
+    context = {
+        'outlet': outlet,
+        'outlet_form': OutletChoiceForm(initial={'outlet': outlet}),
+        'profit_trend': analytics.profit_trend(outlet),
+        'item_names': analytics.item_names(outlet),
+    }
+    return render(request, 'analytics.html', context)
+
+def analytics_profit(request):
+    """Daily runs and total profit of the outlet as JSON, optionally between ``?start=`` and ``?end=``."""
+    outlet = current_outlet(request)
+    form = DateRangeForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': importers.format_errors(form)}, status=400)
+    return JsonResponse({
+        'outlet': outlet.pk,
+        'days': analytics.profit_trend(outlet, form.cleaned_data['start'], form.cleaned_data['end']),
+    })
+
+def analytics_items(request):
+    """Optimized price, demand and profit over time of the items named in ``?name=``, as JSON.
+
+    ``?per=day`` (the default) reads daily averages from the rollups;
+    ``?per=run`` lists the latest runs one by one. Without names, the
+    outlet's item names are returned.
+    """
+    outlet = current_outlet(request)
+    form = AnalyticsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': importers.format_errors(form)}, status=400)
+    names = request.GET.getlist('name')
+    if not names:
+        return JsonResponse({'outlet': outlet.pk, 'names': analytics.item_names(outlet)})
+    if len(names) > analytics.MAX_ITEM_NAMES:
+        return JsonResponse({'error': f"Ask for at most {analytics.MAX_ITEM_NAMES} items at a time."}, status=400)
+    
+    if form.cleaned_data['per'] == 'run':
+        history = analytics.item_runs(outlet, names)
+    else:
+        history = analytics.item_history(outlet, names, form.cleaned_data['start'], form.cleaned_data['end'])
+    return JsonResponse({'outlet': outlet.pk, 'per': form.cleaned_data['per'], 'items': history})
+
+def metrics_view(request):
+    """Stage histograms across all processes, in Prometheus text format."""
+    return HttpResponse(metrics.registry().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def api_response(request, persist_allowed):
+    try:
+        menus = api.parse_batch(api.read_body(request))
+    except api.ApiError as exc:
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    if persist_allowed:
+        menus = [{'persist': True, **menu} for menu in menus]
+    return StreamingHttpResponse(streamed(request, api.stream_results(menus, persist_allowed)),
+                                 content_type='application/x-ndjson')
+
+@csrf_exempt
+@require_POST
+def api_optimize(request):
+    """Optimize the menus in a JSON body and stream one NDJSON line per menu, without saving."""
+    return api_response(request, persist_allowed=False)
+
+@require_POST
+def api_save_menus(request):
+    """Like api_optimize, saving the menus; CSRF protected and only for users who may edit menus."""
+    if not request.user.has_perms(api.PERSIST_PERMISSIONS):
+        return JsonResponse({'error': "Saving menus needs a signed-in user allowed to edit menu items."},
+                            status=403)
+    return api_response(request, persist_allowed=True)
+
+def profit_curves(request):
+    """Precomputed demand and profit curves of the outlet's items as JSON.
+
+    ``?items=1,2,3`` limits the response to those item ids. Curves are
+    only served for the session's outlet; ``?outlet=<id>`` naming any
+    other outlet is a 404.
+    Point ``i`` of every curve is at
+    ``min_price + i / (points - 1) * (max_price - min_price)``.
+    """
+    try:
+        outlet_id = request.GET.get('outlet')
+        outlet_id = int(outlet_id) if outlet_id else None
+        item_ids = [int(part) for part in request.GET.get('items', '').split(',') if part.strip()]
+    except ValueError:
+        return JsonResponse({'error': "Outlet and item ids must be integers."}, status=400)
+    outlet = current_outlet(request)
+    if outlet_id is not None and outlet_id != outlet.pk:
+        raise Http404("No curves for that outlet.")
+    
+    items = MenuItem.objects.filter(outlet=outlet)
+    if item_ids:
+        items = items.filter(pk__in=item_ids)
+    data = {
+        'outlet': outlet.pk,
+        'points': curves.curve_points(),
+        'items': [
+            {
+                'id': pk,
+                'name': name,
+                'version': version,
+                'min_price': float(min_price),
+                'max_price': float(max_price),
+                'demand': curves.to_list(demand),
+                'profit': curves.to_list(profit),
+            }
+            for pk, name, version, min_price, max_price, demand, profit in curves.load(items)
+        ],
+    }
+    return JsonResponse(data)
@@ -0,0 +1,48 @@
+# optimizer/workers.py
+
+"""
+Entry points for worker processes.
+
+Pool processes are started with the ``spawn`` method, so these functions
+must be importable before Django is set up: app modules are imported
+lazily, after ``init_process`` has run.
+"""
+
+import os
+
+
+def init_process():
+    """Process pool initializer: set up Django in the child process."""
+    import django
+    django.setup()
+
+
+def init_process_with_environ(environ):
+    """Like ``init_process``, with extra environment variables read by the settings."""
+    os.environ.update(environ)
+    init_process()
+
+
+def run_job(job_id):
+    from .jobs import run_job
+    return run_job(job_id)
+
+
+def solve_scenario(menu, multipliers, method, constraints):
+    from .scenarios import solve_scenario
+    return solve_scenario(menu, multipliers, method, constraints)
+
+
+def solve_uncertainty_block(menu, settings):
+    from .uncertainty import solve_block
+    return solve_block(menu, settings)
+
+
+def optimize_outlet(outlet_id, method, options):
+    from .pipeline import optimize_outlet
+    return optimize_outlet(outlet_id, method, options)
+
+
+def run_database_load(outlet_id, result_id, rows, seconds, write_share, seed):
+    from .dbload import run_load
+    return run_load(outlet_id, result_id, rows, seconds, write_share, seed)